@@ -1,15 +1,26 @@
 """
 Updated Flask Application - Two separate buttons for ranking and final POST
 """
+import hmac
+import logging
+import os
 import time
 import traceback
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, Response, g, jsonify, request, send_from_directory, stream_with_context
 #from flask_cors import CORS
 from config.settings import Config
-from database.db_handler import DatabaseHandler
+from database.db_handler import DatabaseHandler, create_db_handler
 from services.ranking_service import RankingService
 from services.final_service import FinalService
-from utils.logger import setup_logger
+from services.job_manager import JobManager
+from utils.event_stream import EventStream, FORMAT_NDJSON, FORMAT_SSE
+from utils.http_cache import ResponseCache, dataset_fingerprint, static_body
+from utils.logger import setup_logger, get_log_buffer
+from utils.metrics import REGISTRY, HTTP_SERVER_SECONDS
+from utils.partition import ALL, Partition
+from utils.profiling import ProfilerBusyError, RunProfiler
+from utils.run_coordinator import RunCoordinator
+from utils.sampling_profiler import SamplingProfiler, clear_current_thread_tag, tag_current_thread
 from constants import LogMessages
 #from flask_cors import CORS, cross_origin
 # Initialize Flask app
@@ -37,7 +48,7 @@ class AppInitializer:
             logger.info("✅ Configuration validated for debug UI")
             
             # Initialize services
-            db_handler = DatabaseHandler()
+            db_handler = create_db_handler()
             ranking_service = RankingService(db_handler)
             final_service = FinalService(db_handler)
             
@@ -51,10 +62,13 @@ class AppInitializer:
 class APIEndpoints:
     """Handles API endpoint logic"""
     
-    def __init__(self, db_handler: DatabaseHandler, ranking_service: RankingService, final_service: FinalService):
+    def __init__(self, db_handler: DatabaseHandler, ranking_service: RankingService, final_service: FinalService,
+                 coordinator: RunCoordinator = None):
         self.db_handler = db_handler
         self.ranking_service = ranking_service
         self.final_service = final_service
+        # Single-flight per pipeline; with RUN_LOCK_DIR also across gunicorn workers and the CLI
+        self.coordinator = coordinator or RunCoordinator()
     
     def health_check(self) -> dict:
         """Health check endpoint logic"""
@@ -92,61 +106,65 @@ class APIEndpoints:
             start_time = time.time()
             questions = self.db_handler.fetch_all_questions()
             fetch_time = round(time.time() - start_time, 2)
-            
-            # Analyze questions
-            questions_with_answers = sum(1 for q in questions if q.get('answers'))
-            input_questions = sum(1 for q in questions if q.get('questionType', '').lower() == 'input')
-            mcq_questions = sum(1 for q in questions if q.get('questionType', '').lower() == 'mcq')
-            
-            return {
-                "status": "success",
-                "results": {
-                    "total_questions": len(questions),
-                    "questions_with_answers": questions_with_answers,
-                    "input_questions": input_questions,
-                    "mcq_questions": mcq_questions,
-                    "processing_time": f"{fetch_time}s"
-                }
-            }
+            summary = self.summarize_questions(questions)
+            summary["results"]["processing_time"] = f"{fetch_time}s"
+            return summary
         except Exception as e:
             return {"status": "error", "error": str(e)}
     
-    def process_ranking(self) -> dict:
-        """Process ranking logic - Input questions only"""
+    @staticmethod
+    def summarize_questions(questions: list) -> dict:
+        """Question counts shown by the debug UI (no timings, so the body can be cached)"""
+        questions_with_answers = sum(1 for q in questions if q.get('answers'))
+        input_questions = sum(1 for q in questions if q.get('questionType', '').lower() == 'input')
+        mcq_questions = sum(1 for q in questions if q.get('questionType', '').lower() == 'mcq')
+        
+        return {
+            "status": "success",
+            "results": {
+                "total_questions": len(questions),
+                "questions_with_answers": questions_with_answers,
+                "input_questions": input_questions,
+                "mcq_questions": mcq_questions
+            }
+        }
+    
+    def process_ranking(self, events=None, partition: Partition = ALL) -> dict:
+        """Process ranking logic - Input questions only (or one partition of them)"""
         try:
             start_time = time.time()
-            result = self.ranking_service.process_all_questions()
+            result, joined = self.coordinator.run(
+                partition.scoped("process_ranking"),
+                lambda: self.ranking_service.process_all_questions(events=events, partition=partition)
+            )
             processing_time = round(time.time() - start_time, 2)
             
+            results = self._ranking_results(result, processing_time)
+            if not partition.empty:
+                results["partition"] = partition.describe()
+            if joined:
+                results["joined_run"] = True
             return {
                 "status": "success",
-                "results": {
-                    "total_questions": result["total_questions"],
-                    "processed_count": result["processed_count"],
-                    "skipped_count": result["skipped_count"],
-                    "skipped_mcq": result["skipped_mcq"],
-                    "skipped_insufficient": result["skipped_insufficient"],
-                    "updated_count": result["updated_count"],
-                    "failed_count": result["failed_count"],
-                    "answers_ranked": result["answers_ranked"],
-                    "answers_scored": result["answers_scored"],
-                    "processing_time": f"{processing_time}s"
-                }
+                "results": results
             }
         except Exception as e:
             logger.error(f"Ranking process failed: {str(e)}")
             logger.error(f"Traceback: {traceback.format_exc()}")
             return {"status": "error", "error": str(e)}
     
-    def post_final_answers(self) -> dict:
+    def post_final_answers(self, force: bool = False, events=None) -> dict:
         """POST final answers logic - GET, DELETE, then POST Input questions with correct answers only"""
         try:
             start_time = time.time()
             
-            # Fetch current questions from main endpoint
-            questions = self.db_handler.fetch_all_questions()
+            # Main bank and final set are fetched concurrently, then delta sync
+            # (or GET → DELETE → POST in replace mode) to final endpoint
+            result, joined = self.coordinator.run(
+                "publish_final", lambda: self.final_service.publish_from_source(force=force, events=events)
+            )
             
-            if not questions:
+            if result.get("status") == "no_source_questions":
                 return {
                     "status": "success",
                     "results": {
@@ -161,27 +179,89 @@ class APIEndpoints:
                     }
                 }
             
-            # Process GET → DELETE → POST to final endpoint
-            result = self.final_service.post_to_final_endpoint(questions)
             processing_time = round(time.time() - start_time, 2)
             
+            results = self._final_results(result, processing_time)
+            if joined:
+                results["joined_run"] = True
             return {
                 "status": "success" if result["post_success"] and result["delete_success"] else "error",
-                "results": {
-                    "questions_posted": result["questions_posted"],
-                    "questions_failed": result["questions_failed"],
-                    "questions_deleted": result["questions_deleted"],
-                    "skipped_mcq": result["skipped_mcq"],
-                    "skipped_insufficient": result["skipped_insufficient"],
-                    "total_processed": result["total_processed"],
-                    "processing_time": f"{processing_time}s",
-                    "message": "Success" if result["post_success"] and result["delete_success"] else "Failed"
-                }
+                "results": results
             }
         except Exception as e:
             logger.error(f"Final POST process failed: {str(e)}")
             logger.error(f"Traceback: {traceback.format_exc()}")
             return {"status": "error", "error": str(e)}
+    
+    def rank_and_publish(self, force: bool = False, events=None, partition: Partition = ALL) -> dict:
+        """Rank, write ranks back, then publish the in-memory ranked questions to the final endpoint"""
+        try:
+            start_time = time.time()
+            result, joined = self.coordinator.run(
+                partition.scoped("rank_and_publish"),
+                lambda: self.final_service.rank_and_publish(self.ranking_service, force=force, events=events,
+                                                            partition=partition)
+            )
+            processing_time = round(time.time() - start_time, 2)
+            
+            final = result["final"]
+            ok = final["post_success"] and final["delete_success"]
+            results = {
+                "ranking": self._ranking_results(result["ranking"], processing_time),
+                "final": self._final_results(final, processing_time),
+                "publish_source": result["publish_source"],
+                "processing_time": f"{processing_time}s"
+            }
+            if not partition.empty:
+                results["partition"] = partition.describe()
+            if joined:
+                results["joined_run"] = True
+            return {
+                "status": "success" if ok else "error",
+                "results": results
+            }
+        except Exception as e:
+            logger.error(f"Rank and publish failed: {str(e)}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            return {"status": "error", "error": str(e)}
+    
+    @staticmethod
+    def _ranking_results(result: dict, processing_time: float) -> dict:
+        return {
+            "total_questions": result["total_questions"],
+            "processed_count": result["processed_count"],
+            "skipped_count": result["skipped_count"],
+            "skipped_mcq": result["skipped_mcq"],
+            "skipped_insufficient": result["skipped_insufficient"],
+            "updated_count": result["updated_count"],
+            "failed_count": result["failed_count"],
+            "answers_ranked": result["answers_ranked"],
+            "answers_scored": result["answers_scored"],
+            "stage_rejections": result.get("stage_rejections", {}),
+            "processing_time": f"{processing_time}s"
+        }
+    
+    @staticmethod
+    def _final_results(result: dict, processing_time: float) -> dict:
+        results = {
+            "questions_posted": result["questions_posted"],
+            "questions_failed": result["questions_failed"],
+            "questions_deleted": result["questions_deleted"],
+            "skipped_mcq": result["skipped_mcq"],
+            "skipped_insufficient": result["skipped_insufficient"],
+            "total_processed": result["total_processed"],
+            "processing_time": f"{processing_time}s",
+            "message": "Success" if result["post_success"] and result["delete_success"] else "Failed"
+        }
+        if result.get("status") == "skipped_unchanged":
+            results["message"] = "Unchanged since last publish - nothing sent"
+        if "status" in result:
+            results["publish_status"] = result["status"]
+        for key in ("delete_failed", "chunks", "failed_chunks", "retries_413", "publish_mode", "version", "previous_version",
+                    "questions_inserted", "questions_updated", "questions_replaced", "questions_unchanged"):
+            if key in result:
+                results[key] = result[key]
+        return results
 
 
 class TemplateProvider:
@@ -828,7 +908,11 @@ class TemplateProvider:
                 const response = await fetch(endpoint, { method });
                 updateProgress(75);
                 
-                const data = await response.json();
+                let data = await response.json();
+                if (response.status === 202 && data.job_id) {
+                    addLog(`${method} ${endpoint}: job ${data.job_id} ${data.deduplicated ? 'already running' : 'queued'}`);
+                    data = await waitForJob(data.status_url, data.job_type);
+                }
                 updateProgress(100);
                 
                 if (data.status === 'success') {
@@ -850,6 +934,52 @@ class TemplateProvider:
             }
         }
 
+        function showJobProgress(type, progress) {
+            if (progress.total) {
+                updateProgress(Math.round(25 + 70 * progress.done / progress.total));
+            }
+            if (progress.stage) {
+                updateStatus(`⏳ ${type}: ${progress.stage}${progress.total ? ` ${progress.done}/${progress.total}` : ''}`, 'info');
+            }
+        }
+
+        function followJobEvents(statusUrl, type) {
+            // Live stage / chunk events over SSE; resolves once the job ends or the stream fails
+            return new Promise(resolve => {
+                if (!window.EventSource) {
+                    resolve();
+                    return;
+                }
+                const source = new EventSource(`${statusUrl}/events`);
+                const done = () => { source.close(); resolve(); };
+                source.addEventListener('progress', e => showJobProgress(type, JSON.parse(e.data)));
+                source.addEventListener('chunk', e => {
+                    const ev = JSON.parse(e.data);
+                    showJobProgress(type, ev);
+                    addLog(`${ev.stage} chunk: ${ev.size} questions ${ev.outcome} in ${ev.latency}s (${ev.done}/${ev.total})`);
+                });
+                source.addEventListener('stage_end', e => {
+                    const ev = JSON.parse(e.data);
+                    addLog(`${type} ${ev.stage} ${ev.ok ? 'finished' : 'failed'} in ${ev.duration}s`, ev.ok ? 'INFO' : 'ERROR');
+                });
+                source.addEventListener('job_finished', done);
+                source.onerror = done;
+            });
+        }
+
+        async function waitForJob(statusUrl, type) {
+            await followJobEvents(statusUrl, type);
+            while (true) {
+                const response = await fetch(statusUrl);
+                const { job } = await response.json();
+                showJobProgress(job.type, job.progress || {});
+                if (job.state === 'succeeded' || job.state === 'failed') {
+                    return job.result || { status: 'error', error: job.error };
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+        }
+
         async function testConnection() {
             addLog('Testing API connection...');
             await makeRequest('/api/test-connection');
@@ -920,12 +1050,100 @@ class TemplateProvider:
 # Initialize application components
 db_handler, ranking_service, final_service = AppInitializer.initialize()
 api_endpoints = APIEndpoints(db_handler, ranking_service, final_service)
+job_manager = JobManager()
+response_cache = ResponseCache()
+sampler = SamplingProfiler()
+if Config.SAMPLER_ENABLED:
+    sampler.start()
+
+# The debug page has no per-request content: compile and render it once, serve it with an ETag
+debug_ui_page = static_body(app.jinja_env.from_string(TemplateProvider.get_debug_ui_template()).render(),
+                            "text/html")
+
+def _force_requested() -> bool:
+    """?force=1 or {"force": true} bypasses the unchanged-payload short circuit"""
+    body = request.get_json(silent=True) or {}
+    return str(request.args.get("force", body.get("force", ""))).lower() in ("1", "true", "yes")
+
+def _queue_requested() -> bool:
+    """?queue=1 (or RUN_COALESCE) queues one coalesced follow-up run instead of joining the running one"""
+    value = request.args.get("queue")
+    if value is None:
+        return Config.RUN_COALESCE
+    return value.lower() in ("1", "true", "yes")
+
+def _partition_requested() -> Partition:
+    """
+    ?category=…&level=…&ids=a,b (or the same keys in the JSON body) restrict a run to one
+    partition of the bank; none of them means the whole bank
+    """
+    body = request.get_json(silent=True) or {}
+    values = {**body, **{k: v for k, v in request.args.items() if v != ""}}
+    return Partition.from_mapping(values)
+
+def _submit_job(job_type: str, run):
+    """
+    Run `run(events)` on the job pool and answer 202 with the job id.
+    A submission while the same job type is running joins that job (or its queued follow-up).
+    ?wait=1 blocks until the job finishes and returns its result like the old synchronous endpoint.
+    """
+    def run_and_invalidate(events):
+        try:
+            return run(events)
+        finally:
+            # The run wrote to the bank: cached previews must re-check the data before being served
+            response_cache.invalidate()
+    
+    job, created = job_manager.submit(job_type, run_and_invalidate, coalesce=_queue_requested())
+    if str(request.args.get("wait", "")).lower() in ("1", "true", "yes"):
+        job.wait()
+        result = job.result or {"status": "error", "error": job.error}
+        status_code = 500 if result["status"] == "error" else 200
+        return jsonify(result), status_code
+    
+    return jsonify({
+        "status": "accepted",
+        "job_id": job.id,
+        "job_type": job_type,
+        "deduplicated": not created,
+        "follow_up_of": job.follow_up_of,
+        "status_url": f"/api/jobs/{job.id}"
+    }), 202
+
+def _admin_authorized() -> bool:
+    """Admin endpoints require an x-api-key header equal to API_KEY"""
+    expected = Config.API_KEY or ""
+    supplied = request.headers.get("x-api-key", "")
+    return bool(expected) and hmac.compare_digest(supplied.encode(), expected.encode())
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+    tag_current_thread(f"route:{request.url_rule.rule if request.url_rule else 'unmatched'}")
+
+@app.after_request
+def _record_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_SERVER_SECONDS.observe(time.perf_counter() - started, route=route,
+                                    method=request.method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def _clear_thread_tag(exc):
+    clear_current_thread_tag()
 
 # Route handlers
 @app.route('/')
 def debug_ui():
     """Debug UI homepage"""
-    return render_template_string(TemplateProvider.get_debug_ui_template())
+    return debug_ui_page.response(request)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of pipeline, outbound API and route metrics"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route('/api/health')
 def health():
@@ -943,35 +1161,179 @@ def test_connection():
 
 @app.route('/api/get-questions')
 def get_questions():
-    """Fetch questions from API"""
-    result = api_endpoints.get_questions()
-    status_code = 500 if result["status"] == "error" else 200
-    return jsonify(result), status_code
+    """Fetch questions from API - cached per bank version, with ETag / 304 and compression"""
+    cached = response_cache.fresh("get-questions")
+    if cached is not None:
+        return cached.response(request)
+    
+    try:
+        # Probed before the fetch, so a stored body is never older than the version it is keyed by
+        version = db_handler.dataset_version()
+        if version is not None:
+            cached = response_cache.get("get-questions", version)
+            if cached is not None:
+                return cached.response(request)
+        start_time = time.perf_counter()
+        questions = db_handler.fetch_all_questions()
+        fetch_ms = (time.perf_counter() - start_time) * 1000
+    except Exception as e:
+        return jsonify({"status": "error", "error": str(e)}), 500
+    
+    # Without a cheap version (REST backend without mirror) the fetched bank is fingerprinted
+    if version is None:
+        version = dataset_fingerprint(questions)
+        cached = response_cache.get("get-questions", version)
+    cached = cached or response_cache.put("get-questions", version, APIEndpoints.summarize_questions(questions))
+    # This request's fetch time rides in a header: the cached body (and its ETag) stays the same
+    response = cached.response(request)
+    response.headers["Server-Timing"] = f"fetch;dur={fetch_ms:.1f}"
+    return response
 
 @app.route('/api/process-ranking', methods=['POST'])
 def process_ranking():
-    """Process ranking for Input questions only"""
-    result = api_endpoints.process_ranking()
-    status_code = 500 if result["status"] == "error" else 200
-    return jsonify(result), status_code
+    """Process ranking for Input questions only (optionally one category / level / id list)"""
+    partition = _partition_requested()
+    return _submit_job(partition.scoped("process_ranking"),
+                       lambda events: api_endpoints.process_ranking(events=events, partition=partition))
 
 @app.route('/api/post-final-answers', methods=['POST'])
 def post_final_answers():
     """POST final answers to /admin/survey/final"""
-    result = api_endpoints.post_final_answers()
-    status_code = 500 if result["status"] == "error" else 200
-    return jsonify(result), status_code
+    force = _force_requested()
+    return _submit_job("publish_final", lambda events: api_endpoints.post_final_answers(force=force, events=events))
+
+@app.route('/api/rank-and-publish', methods=['POST'])
+def rank_and_publish():
+    """Rank Input questions, then publish the ranked set to the final endpoint without re-fetching"""
+    force = _force_requested()
+    partition = _partition_requested()
+    return _submit_job(partition.scoped("rank_and_publish"),
+                       lambda events: api_endpoints.rank_and_publish(force=force, events=events,
+                                                                     partition=partition))
+
+@app.route('/api/jobs')
+def list_jobs():
+    """Recent background jobs, newest first (without their results)"""
+    return jsonify({"status": "success", "jobs": [job.to_dict(include_result=False) for job in job_manager.jobs()]})
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """State, progress, per-stage timings and (once finished) the result of a background job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "error": f"Unknown job: {job_id}"}), 404
+    return jsonify({"status": "success", "job": job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/events')
+def stream_job_events(job_id):
+    """
+    Live progress of a background job: fetch / merge / rank per question, upload per chunk
+    with its latency, stage timings, then job_finished. Server-Sent Events by default,
+    NDJSON with ?format=ndjson.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "error": f"Unknown job: {job_id}"}), 404
+    fmt = FORMAT_NDJSON if request.args.get("format") == FORMAT_NDJSON else FORMAT_SSE
+    mimetype = "application/x-ndjson" if fmt == FORMAT_NDJSON else "text/event-stream"
+    return Response(stream_with_context(EventStream(job, fmt)), mimetype=mimetype,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/admin/profile', methods=['POST'])
+def profile_run():
+    """
+    Admin only: run the pipeline once under cProfile and tracemalloc, as a background job.
+    run=process_ranking|publish_final|rank_and_publish, sort=cumulative|tottime|ncalls, top=N.
+    The job result carries a "profile" report: top functions, peak memory per stage, the
+    largest allocation sites and where to download the pstats dump.
+    """
+    if not _admin_authorized():
+        return jsonify({"status": "error", "error": "Unauthorized"}), 401
+    
+    body = request.get_json(silent=True) or {}
+    run = request.args.get("run", body.get("run", "process_ranking"))
+    force = _force_requested()
+    runs = {
+        "process_ranking": lambda events: api_endpoints.process_ranking(events=events),
+        "publish_final": lambda events: api_endpoints.post_final_answers(force=force, events=events),
+        "rank_and_publish": lambda events: api_endpoints.rank_and_publish(force=force, events=events),
+    }
+    if run not in runs:
+        return jsonify({"status": "error", "error": f"run must be one of {', '.join(runs)}"}), 400
+    try:
+        profiler = RunProfiler(top=request.args.get("top", type=int),
+                               sort=request.args.get("sort", body.get("sort", "cumulative")))
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    
+    def profiled(events):
+        try:
+            result, report = profiler.profile(run, runs[run], events)
+        except ProfilerBusyError as e:
+            return {"status": "error", "error": str(e)}
+        if result.get("results", {}).get("joined_run"):
+            report = {"label": run, "skipped": "Joined a run already in flight - nothing was profiled"}
+        elif report.get("pstats_path"):
+            report["pstats_url"] = f"/api/admin/profile/dumps/{os.path.basename(report['pstats_path'])}"
+        result["profile"] = report
+        return result
+    
+    return _submit_job(f"profile_{run}", profiled)
+
+@app.route('/api/admin/profile/dumps/<name>')
+def download_profile_dump(name):
+    """Admin only: a pstats dump written by /api/admin/profile"""
+    if not _admin_authorized():
+        return jsonify({"status": "error", "error": "Unauthorized"}), 401
+    if not Config.PROFILE_DIR:
+        return jsonify({"status": "error", "error": "PROFILE_DIR is not set"}), 404
+    return send_from_directory(os.path.abspath(Config.PROFILE_DIR), name, as_attachment=True,
+                               mimetype="application/octet-stream")
+
+@app.route('/api/admin/profile/samples')
+def profile_samples():
+    """
+    Admin only: stacks collected by the always-on sampler in collapsed format
+    ("route:/api/...;file:func;... count"), ready for flamegraph.pl or speedscope.
+    ?format=json adds sampler stats; ?reset=1 starts a new window after this export.
+    """
+    if not _admin_authorized():
+        return jsonify({"status": "error", "error": "Unauthorized"}), 401
+    
+    reset = str(request.args.get("reset", "")).lower() in ("1", "true", "yes")
+    stacks, stats = sampler.snapshot(reset=reset)
+    if request.args.get("format") == "json":
+        top = request.args.get("top", 50, type=int)
+        return jsonify({"status": "success", **stats,
+                        "top_stacks": [{"stack": stack, "count": count} for stack, count in stacks.most_common(top)]})
+    return Response(SamplingProfiler.collapsed(stacks), mimetype="text/plain",
+                    headers={"X-Sampler-Samples": str(stats["samples"]), "X-Sampler-Overhead": str(stats["overhead"])})
 
 @app.route('/api/logs')
 def get_logs():
-    """Get recent logs (simulated)"""
-    return jsonify({
-        "status": "success",
-        "logs": [
-            {"timestamp": time.time(), "level": "INFO", "message": "Service started"},
-            {"timestamp": time.time(), "level": "INFO", "message": "Configuration validated"},
-        ]
-    })
+    """
+    Admin only: recent log records from the in-memory ring buffer, oldest first (they carry
+    tracebacks and, at DEBUG, configuration details).
+    Filters: level (minimum, e.g. WARNING), since (cursor from the previous call),
+    start / end (unix timestamps) and limit. Poll with the returned cursor to get only new records.
+    """
+    if not _admin_authorized():
+        return jsonify({"status": "error", "error": "Unauthorized"}), 401
+    
+    try:
+        level = request.args.get("level")
+        levelno = logging.getLevelName(level.upper()) if level else None
+        if level and not isinstance(levelno, int):
+            raise ValueError(f"Unknown level: {level}")
+        since = request.args.get("since", type=int)
+        start = request.args.get("start", type=float)
+        end = request.args.get("end", type=float)
+        limit = max(1, min(request.args.get("limit", 200, type=int), Config.LOG_BUFFER_SIZE or 1))
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    
+    result = get_log_buffer().read(since=since, level=levelno, start=start, end=end, limit=limit)
+    return jsonify({"status": "success", **result})
 
 ######################################### Addition for Preview Ranking
 
@@ -980,6 +1342,12 @@ def get_logs():
 def preview_ranking():
     """Preview ranking details with comprehensive error handling"""
     try:
+        partition = _partition_requested()
+        cache_key = partition.scoped("preview-ranking")
+        cached = response_cache.fresh(cache_key)
+        if cached is not None:
+            return cached.response(request)
+        
         logger.info("🔍 Starting preview ranking endpoint...")
         
         # Test if services are properly initialized
@@ -990,30 +1358,50 @@ def preview_ranking():
                 "message": "Services not initialized"
             }), 500
         
-        # Test database connection
+        # Cheap version of the bank, checked before anything is fetched or computed
         try:
-            logger.info("🔌 Testing database connection...")
-            connection_ok = db_handler.test_connection()
-            if not connection_ok:
-                logger.error("❌ Database connection test failed")
-                return jsonify({
-                    "status": "error", 
-                    "message": "Database connection failed"
-                }), 500
-            logger.info("✅ Database connection OK")
+            version = db_handler.dataset_version()
         except Exception as conn_error:
             logger.error(f"❌ Database connection error: {conn_error}")
             return jsonify({
                 "status": "error", 
                 "message": f"Database connection error: {str(conn_error)}"
             }), 500
+        if version is not None:
+            cached = response_cache.get(cache_key, version)
+            if cached is not None:
+                logger.info("♻️ Bank unchanged - serving cached preview")
+                return cached.response(request)
+        
+        # Mongo backend or local mirror: filter and count in the database, load only rankable answers
+        if version is not None and ranking_service.can_push_down_preview():
+            try:
+                logger.info("🎯 Generating preview details via aggregation pushdown...")
+                details = ranking_service.preview_ranking(top_n=5, partition=partition)
+                logger.info(f"✅ Generated preview for {len(details)} questions")
+                return response_cache.put(
+                    cache_key, version, {"status": "success", "data": details, "count": len(details)}
+                ).response(request)
+            except Exception as pushdown_error:
+                logger.error(f"❌ Preview pushdown failed, falling back to full fetch: {pushdown_error}")
         
         # Fetch questions
         try:
             logger.info("📥 Fetching questions...")
-            questions = db_handler.fetch_all_questions()
+            if partition.empty:
+                questions = db_handler.fetch_all_questions()
+            else:
+                questions = db_handler.fetch_partition(partition)
             logger.info(f"📊 Fetched {len(questions)} questions")
             
+            # Without a cheap version the fetched bank is fingerprinted: same bank, same cached preview
+            if version is None:
+                version = dataset_fingerprint(questions)
+                cached = response_cache.get(cache_key, version)
+                if cached is not None:
+                    logger.info("♻️ Bank unchanged - serving cached preview")
+                    return cached.response(request)
+            
             if not questions:
                 logger.info("📭 No questions found")
                 return jsonify({
@@ -1056,11 +1444,11 @@ def preview_ranking():
             details = ranking_service.preview_details(questions, top_n=5)
             logger.info(f"✅ Generated preview for {len(details)} questions")
             
-            return jsonify({
+            return response_cache.put(cache_key, version, {
                 "status": "success",
                 "data": details,
                 "count": len(details)
-            })
+            }).response(request)
             
         except Exception as preview_error:
             logger.error(f"❌ Error in preview_details: {preview_error}")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Logging overhead benchmark - times a full ranking run (fetch, merge, rank, upload) over a
+synthetic question bank with console logging written synchronously vs through the
+background queue listener (LOG_ASYNC), at INFO and DEBUG.
+
+Usage (from ranking-logic/):
+    python -m benchmarks.bench_logging --questions 2000 --answers 40 --repeat 3
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import make_bank
+from config.settings import Config
+from services.ranking_service import RankingService
+from utils.logger import LoggerConfig, stop_log_listeners
+
+
+class InMemoryDatabaseHandler:
+    """Stands in for the REST handler: serves the bank and logs each chunk like the real one"""
+
+    def __init__(self, questions: List[Dict], chunk_size: int = 50):
+        self.questions = questions
+        self.chunk_size = chunk_size
+        self.logger = logging.getLogger('survey_analytics')
+
+    def fetch_all_questions(self) -> List[Dict]:
+        return self.questions
+
+    def bulk_update_questions(self, questions: List[Dict], events=None) -> Dict:
+        for start in range(0, len(questions), self.chunk_size):
+            chunk = questions[start:start + self.chunk_size]
+            self.logger.debug("[BULK] Sending chunk of %d questions", len(chunk))
+            for q in chunk:
+                self.logger.debug("Updating question %s with %d answers", q.get("_id"), len(q.get("answers") or []))
+        return {"updated": len(questions), "failed": 0}
+
+
+def run_once(bank: List[Dict], level: str, async_logging: bool, sink) -> float:
+    Config.LOG_ASYNC = async_logging
+    logger = logging.getLogger('survey_analytics')
+    stdout, sys.stdout = sys.stdout, sink
+    try:
+        LoggerConfig.configure_logger(logger, level)
+    finally:
+        sys.stdout = stdout
+
+    service = RankingService(InMemoryDatabaseHandler(bank))
+    start = time.perf_counter()
+    service.process_all_questions()
+    elapsed = time.perf_counter() - start
+    stop_log_listeners()  # drain outside the timed section, as the listener would in production
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure logging overhead of a full ranking run")
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--answers", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sink", default=os.devnull, help="where console logs go (default: devnull)")
+    args = parser.parse_args()
+
+    print(f"Ranking {args.questions} questions x {args.answers} answers, best of {args.repeat}")
+    with open(args.sink, "a", encoding="utf-8") as sink:
+        for level in ("INFO", "DEBUG"):
+            timings = {}
+            for mode, async_logging in (("sync", False), ("async", True)):
+                # fresh bank per run: ranking rewrites answers in place
+                timings[mode] = min(run_once(make_bank(args.questions, args.answers), level, async_logging, sink)
+                                    for _ in range(args.repeat))
+            saved = timings["sync"] - timings["async"]
+            print(f"  {level:<5}  sync {timings['sync']:.3f}s  async {timings['async']:.3f}s  "
+                  f"saved {saved:.3f}s ({saved / timings['sync'] * 100:.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Ranking pipeline benchmarks - times merge_similar_answers, dense_rank_by_count,
+process_question, preview_details and format_for_api over seeded synthetic banks at several
+scales, reports throughput and peak memory, and compares against a stored baseline.
+
+Usage (from ranking-logic/):
+    python -m benchmarks.bench_ranking                       # compare with benchmarks/baseline.json
+    python -m benchmarks.bench_ranking --scales small        # quick check
+    python -m benchmarks.bench_ranking --save-baseline       # record a new baseline
+    python -m benchmarks.bench_ranking --long-answer-rate 0.05 --typo-rate 0.4   # other corpus shapes
+
+Exits with status 1 when a benchmark is slower (or uses more memory) than the baseline by more
+than the thresholds.
+"""
+
+import argparse
+import copy
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CorpusGenerator, scaled
+from config.settings import Config
+from services.ranking_service import RankingService, dense_rank_by_count
+from utils.data_formatters import QuestionFormatter
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# name -> (questions, mean answers per question)
+SCALES = {
+    "small": (100, 15),
+    "medium": (200, 30),
+    "large": (400, 60),
+}
+
+# Differences below these are timer / allocator noise, never reported as regressions
+NOISE_SECONDS = 0.005
+NOISE_BYTES = 65536
+
+BENCHMARKS = ("merge_similar_answers", "dense_rank_by_count", "process_question", "preview_details", "format_for_api")
+
+
+class _NoDatabase:
+    """The timed functions never touch the database"""
+
+    def fetch_all_questions(self) -> List[Dict]:
+        return []
+
+
+class Case:
+    """One benchmark at one scale: setup() builds fresh inputs, run(inputs) is what gets timed"""
+
+    def __init__(self, name: str, unit: str, setup: Callable[[], Tuple[object, int]], run: Callable[[object], None]):
+        self.name = name
+        self.unit = unit
+        self.setup = setup
+        self.run = run
+
+    def measure(self, repeat: int) -> Dict:
+        timings = []
+        items = 0
+        for _ in range(repeat):
+            inputs, items = self.setup()
+            gc.collect()
+            start = time.perf_counter()
+            self.run(inputs)
+            timings.append(time.perf_counter() - start)
+
+        # Separate pass for memory: tracemalloc slows the code down too much to time it
+        inputs, _ = self.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            self.run(inputs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        best = min(timings)
+        return {
+            "seconds": round(best, 6),
+            "items": items,
+            "unit": self.unit,
+            "throughput": round(items / best, 1) if best > 0 else None,
+            "peak_bytes": peak,
+        }
+
+
+def build_cases(bank: List[Dict]) -> List[Case]:
+    service = RankingService(_NoDatabase())
+    processor = service.question_processor
+    similarity = service.similarity
+    input_questions = [q for q in bank if str(q.get("questionType", "")).lower() == "input"]
+
+    # Ranked rows as the pipeline produces them, input to dense ranking and formatting
+    ranked_bank = copy.deepcopy(bank)
+    for q in ranked_bank:
+        processor.process_question(q)
+    merged_rows = [q["answers"] for q in ranked_bank if str(q.get("questionType", "")).lower() == "input"]
+
+    def answer_lists():
+        lists = [[dict(a) for a in q["answers"]] for q in input_questions]
+        return lists, sum(len(answers) for answers in lists)
+
+    def merge(lists):
+        for answers in lists:
+            similarity.merge_similar_answers(answers)
+
+    def row_lists():
+        lists = [[dict(a) for a in rows] for rows in merged_rows]
+        return lists, sum(len(rows) for rows in lists)
+
+    def rank(lists):
+        for rows in lists:
+            dense_rank_by_count(rows)
+
+    def fresh_bank():
+        return copy.deepcopy(bank), len(bank)
+
+    def process(questions):
+        for q in questions:
+            processor.process_question(q)
+
+    def preview(questions):
+        service.preview_engine.clear()  # cold: measure the work, not the memo
+        service.preview_details(questions)
+
+    def ranked():
+        return ranked_bank, len(ranked_bank)
+
+    def format_all(questions):
+        for q in questions:
+            QuestionFormatter.format_for_api(q)
+
+    return [
+        Case("merge_similar_answers", "answers/s", answer_lists, merge),
+        Case("dense_rank_by_count", "rows/s", row_lists, rank),
+        Case("process_question", "questions/s", fresh_bank, process),
+        Case("preview_details", "questions/s", fresh_bank, preview),
+        Case("format_for_api", "questions/s", ranked, format_all),
+    ]
+
+
+def run_suite(corpus: CorpusGenerator, scales: List[str], repeat: int, only: Optional[List[str]] = None) -> Dict:
+    results: Dict[str, Dict] = {}
+    for scale in scales:
+        questions, answers = SCALES[scale]
+        bank = scaled(corpus, questions=questions, answers=answers).generate()
+        answer_count = sum(len(q["answers"]) for q in bank)
+        print(f"▶ {scale}: {questions} questions, {answer_count} answers")
+        for case in build_cases(bank):
+            if only and case.name not in only:
+                continue
+            result = case.measure(repeat)
+            results[f"{scale}/{case.name}"] = result
+            print(f"   {case.name:<22} {result['seconds']:>9.4f}s  {result['throughput']:>12,.0f} {case.unit:<12} "
+                  f"peak {result['peak_bytes'] / 1048576:7.2f} MiB")
+    return results
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float, max_memory_regression: float) -> List[str]:
+    """Print the comparison table and return the regressions beyond the thresholds"""
+    regressions = []
+    print(f"\nCompared with baseline ({baseline.get('meta', {}).get('recorded_at', 'unknown date')}):")
+    print(f"   {'benchmark':<36} {'time':>9} {'Δ time':>9} {'Δ memory':>9}")
+    for key, result in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            print(f"   {key:<36} {result['seconds']:>8.4f}s {'new':>9}")
+            continue
+        time_delta = (result["seconds"] - base["seconds"]) / base["seconds"] if base["seconds"] else 0.0
+        memory_delta = ((result["peak_bytes"] - base["peak_bytes"]) / base["peak_bytes"]
+                        if base.get("peak_bytes") else 0.0)
+        flag = ""
+        if time_delta > max_regression and result["seconds"] - base["seconds"] > NOISE_SECONDS:
+            regressions.append(f"{key}: {time_delta:+.1%} time")
+            flag = "  ⚠️ slower"
+        if memory_delta > max_memory_regression and result["peak_bytes"] - base["peak_bytes"] > NOISE_BYTES:
+            regressions.append(f"{key}: {memory_delta:+.1%} peak memory")
+            flag += "  ⚠️ more memory"
+        print(f"   {key:<36} {result['seconds']:>8.4f}s {time_delta:>+9.1%} {memory_delta:>+9.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the ranking pipeline on synthetic question banks")
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated, of: {', '.join(SCALES)}")
+    parser.add_argument("--only", default=None, help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-length", type=int, default=3)
+    parser.add_argument("--max-length", type=int, default=20)
+    parser.add_argument("--long-answer-rate", type=float, default=0.0)
+    parser.add_argument("--typo-rate", type=float, default=0.25)
+    parser.add_argument("--duplicate-rate", type=float, default=0.15)
+    parser.add_argument("--mcq-ratio", type=float, default=0.1)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file to compare with / save to")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--max-memory-regression", type=float, default=0.25, help="allowed peak memory growth")
+    parser.add_argument("--output", default=None, help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.getLogger('survey_analytics').setLevel(logging.WARNING)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    only = [b.strip() for b in args.only.split(",")] if args.only else None
+    if unknown or (only and set(only) - set(BENCHMARKS)):
+        print(f"❌ Unknown scale or benchmark: {', '.join(unknown + sorted(set(only or []) - set(BENCHMARKS)))}")
+        return 2
+
+    corpus = CorpusGenerator(seed=args.seed, min_length=args.min_length, max_length=args.max_length,
+                             long_answer_rate=args.long_answer_rate, typo_rate=args.typo_rate,
+                             duplicate_rate=args.duplicate_rate, mcq_ratio=args.mcq_ratio)
+    results = run_suite(corpus, scales, args.repeat, only)
+    report = {
+        "meta": {
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "similarity_threshold": Config.SIMILARITY_THRESHOLD,
+            "repeat": args.repeat,
+            "corpus": corpus.describe(),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("results", {})
+            report["results"] = {**previous, **results}  # keep scales that were not re-run
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\n💾 Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nℹ️ No baseline at {args.baseline} - run with --save-baseline to record one")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("corpus") != corpus.describe():
+        print("\n⚠️ Corpus parameters differ from the baseline's - deltas compare different data")
+
+    regressions = compare(results, baseline, args.max_regression, args.max_memory_regression)
+    if regressions:
+        print("\n❌ Regressions beyond the thresholds:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+    print("\n✅ No regressions beyond the thresholds")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Synthetic question banks for benchmarks - seeded, so the same parameters always give the same bank
+"""
+
+import random
+import string
+from typing import Dict, List, Optional
+
+WORDS = [
+    "paris", "london", "berlin", "madrid", "rome", "vienna", "lisbon", "dublin", "oslo", "prague",
+    "apple", "banana", "cherry", "mango", "orange", "pizza", "pasta", "coffee", "tea", "chocolate",
+    "dog", "cat", "horse", "rabbit", "tiger", "summer", "winter", "football", "tennis", "guitar",
+    "red", "blue", "green", "yellow", "purple", "doctor", "teacher", "pilot", "chef", "artist",
+]
+CATEGORIES = ["Culture", "Food", "Sport", "Nature", "Music"]
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+
+
+class CorpusGenerator:
+    """
+    Builds question banks shaped like the production survey data.
+
+    - questions / answers: bank size and mean answers per question (each question gets
+      answers * (1 ± answers_jitter))
+    - min_length / max_length: length range of ordinary answers, in characters
+    - long_answer_rate / long_length: share of free-text "essay" answers and their length range
+      (the pathological case for pairwise similarity)
+    - typo_rate: share of answers that are a 1-2 character typo of another answer
+    - duplicate_rate: share of answers that are a case / whitespace variant of another answer
+    - mcq_ratio: share of MCQ questions (never ranked, only carried through)
+    - correct_rate: share of answers marked correct
+    """
+
+    def __init__(self, questions: int = 500, answers: int = 30, answers_jitter: float = 0.5,
+                 min_length: int = 3, max_length: int = 20, long_answer_rate: float = 0.0,
+                 long_length: tuple = (80, 400), typo_rate: float = 0.25, duplicate_rate: float = 0.15,
+                 mcq_ratio: float = 0.1, correct_rate: float = 0.8, max_responses: int = 20, seed: int = 7):
+        self.questions = questions
+        self.answers = answers
+        self.answers_jitter = answers_jitter
+        self.min_length = min_length
+        self.max_length = max_length
+        self.long_answer_rate = long_answer_rate
+        self.long_length = long_length
+        self.typo_rate = typo_rate
+        self.duplicate_rate = duplicate_rate
+        self.mcq_ratio = mcq_ratio
+        self.correct_rate = correct_rate
+        self.max_responses = max_responses
+        self.seed = seed
+
+    def describe(self) -> Dict:
+        """Parameters as JSON-friendly values (stored with benchmark baselines)"""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in vars(self).items()}
+
+    def generate(self) -> List[Dict]:
+        rng = random.Random(self.seed)
+        return [self._question(rng, i) for i in range(self.questions)]
+
+    # ---- pieces ------------------------------------------------------------
+
+    def _question(self, rng: random.Random, index: int) -> Dict:
+        spread = int(self.answers * self.answers_jitter)
+        count = max(1, self.answers + rng.randint(-spread, spread))
+        texts: List[str] = []
+        for _ in range(count):
+            texts.append(self._answer_text(rng, texts))
+
+        answers = [
+            {
+                "_id": f"a{index}-{j}",
+                "answer": text,
+                "isCorrect": rng.random() < self.correct_rate,
+                "responseCount": rng.randint(0, self.max_responses),
+                "rank": 0,
+                "score": 0,
+            }
+            for j, text in enumerate(texts)
+        ]
+        return {
+            "_id": f"q{index}",
+            "question": f"Synthetic question {index}?",
+            "questionType": "MCQ" if rng.random() < self.mcq_ratio else "Input",
+            "questionCategory": rng.choice(CATEGORIES),
+            "questionLevel": rng.choice(LEVELS),
+            "timesSkipped": rng.randint(0, 50),
+            "timesAnswered": rng.randint(50, 500),
+            "answers": answers,
+        }
+
+    def _answer_text(self, rng: random.Random, previous: List[str]) -> str:
+        roll = rng.random()
+        if previous and roll < self.typo_rate:
+            return self._typo(rng, rng.choice(previous))
+        if previous and roll < self.typo_rate + self.duplicate_rate:
+            return self._variant(rng, rng.choice(previous))
+        if rng.random() < self.long_answer_rate:
+            return self._text(rng, rng.randint(*self.long_length))
+        return self._text(rng, rng.randint(self.min_length, self.max_length))
+
+    @staticmethod
+    def _text(rng: random.Random, length: int) -> str:
+        words: List[str] = []
+        size = 0
+        while size < length:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)[:length].strip() or rng.choice(WORDS)
+
+    @staticmethod
+    def _typo(rng: random.Random, text: str) -> str:
+        chars = list(text)
+        for _ in range(rng.randint(1, 2)):
+            pos = rng.randrange(len(chars) + 1)
+            edit = rng.random()
+            if edit < 0.4 and pos < len(chars):
+                chars[pos] = rng.choice(string.ascii_lowercase)
+            elif edit < 0.7 and pos < len(chars) and len(chars) > 1:
+                del chars[pos]
+            else:
+                chars.insert(pos, rng.choice(string.ascii_lowercase))
+        return "".join(chars)
+
+    @staticmethod
+    def _variant(rng: random.Random, text: str) -> str:
+        return rng.choice([text.upper(), text.capitalize(), f" {text} ", text.replace(" ", "  ")])
+
+
+def make_bank(questions: int, answers: int, seed: int = 7, **options) -> List[Dict]:
+    """Shorthand for CorpusGenerator(...).generate()"""
+    return CorpusGenerator(questions=questions, answers=answers, seed=seed, **options).generate()
+
+
+def scaled(generator: CorpusGenerator, questions: Optional[int] = None, answers: Optional[int] = None) -> CorpusGenerator:
+    """Same corpus shape at another size"""
+    options = generator.describe()
+    options["questions"] = questions or generator.questions
+    options["answers"] = answers or generator.answers
+    return CorpusGenerator(**options)
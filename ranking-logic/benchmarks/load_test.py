@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Load test - runs the full ranking and publishing flows over HTTP against the stub backend
+(benchmarks/stub_backend.py) with a seeded synthetic bank, and reports run times next to the
+stub's request accounting (requests, bytes, 413s, injected errors) per flow.
+
+Usage (from ranking-logic/):
+    python -m benchmarks.load_test --questions 2000 --answers 40 --latency-ms 20 --runs 3
+    python -m benchmarks.load_test --flows publish --max-body-bytes 200000 --error-rate 0.02
+    python -m benchmarks.load_test --url http://127.0.0.1:8000    # a stub started separately
+
+Every run starts from a freshly seeded bank and an empty final set, so runs are comparable.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import make_bank
+from benchmarks.stub_backend import FINAL_PATH, SURVEY_PATH, StubBackend
+from config.settings import Config
+from database.db_handler import DatabaseHandler
+from services.final_service import FinalService
+from services.ranking_service import RankingService
+
+FLOWS = ("rank", "publish", "rank_and_publish")
+STUB_API_KEY = "stub-load-test"
+
+
+class StubControl:
+    """Seeds, resets and reads the stub - in-process, or over its control routes"""
+
+    def __init__(self, stub: Optional[StubBackend] = None, url: Optional[str] = None, api_key: str = ""):
+        self.stub = stub
+        self.url = stub.url if stub else url.rstrip("/")
+        self.api_key = api_key
+
+    def reseed(self, bank: List[Dict]) -> None:
+        if self.stub:
+            self.stub.store.clear()
+            self.stub.store.seed(bank)
+            return
+        requests.post(f"{self.url}/__stub/reset", json={"store": True}, timeout=30).raise_for_status()
+        requests.post(f"{self.url}{SURVEY_PATH}", json={"questions": bank},
+                      headers={"x-api-key": self.api_key}, timeout=120).raise_for_status()
+
+    def reset_stats(self) -> None:
+        if self.stub:
+            self.stub.stats.reset()
+        else:
+            requests.post(f"{self.url}/__stub/reset", json={}, timeout=30).raise_for_status()
+
+    def stats(self) -> Dict:
+        if self.stub:
+            return self.stub.stats.snapshot()
+        response = requests.get(f"{self.url}/__stub/stats", timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+
+def point_config_at(url: str, api_key: str, publish_mode: str) -> None:
+    """Config is read when the handlers are built, so this must run before they are created"""
+    Config.API_BASE_URL = url
+    Config.API_KEY = api_key
+    Config.API_ENDPOINT = SURVEY_PATH
+    Config.DB_BACKEND = "api"
+    Config.FINAL_PUBLISH_MODE = publish_mode
+    Config.FINAL_PUBLISH_STATE_FILE = ""  # never skip a publish because an earlier run sent the same payload
+
+
+def flow_runner(flow: str) -> Callable[[], Dict]:
+    """A fresh set of handlers per run, as the web interface builds for each job"""
+
+    def run() -> Dict:
+        db = DatabaseHandler()
+        ranking = RankingService(db)
+        if flow == "rank":
+            return ranking.process_all_questions()
+        final = FinalService(db)
+        if flow == "publish":
+            return final.publish_from_source(force=True)
+        return final.rank_and_publish(ranking, force=True)
+
+    return run
+
+
+def _timed(run: Callable[[], Dict]) -> Dict:
+    start = time.perf_counter()
+    try:
+        run()
+        return {"seconds": time.perf_counter() - start, "error": None}
+    except Exception as e:
+        return {"seconds": time.perf_counter() - start, "error": str(e)}
+
+
+def run_flow(flow: str, control: StubControl, bank: List[Dict], runs: int, concurrency: int) -> Dict:
+    """`runs` rounds of `concurrency` simultaneous runs, each round on a freshly seeded store"""
+    timings: List[float] = []
+    errors: List[str] = []
+    control.reset_stats()
+    started = time.perf_counter()
+    busy = 0.0
+    for _ in range(runs):
+        control.reseed(bank)
+        round_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+            outcomes = list(pool.map(lambda _: _timed(flow_runner(flow)), range(concurrency)))
+        busy += time.perf_counter() - round_start
+        timings.extend(o["seconds"] for o in outcomes)
+        errors.extend(o["error"] for o in outcomes if o["error"])
+
+    ordered = sorted(timings)
+    server = control.stats()
+    return {
+        "flow": flow,
+        "runs": len(timings),
+        "failed_runs": len(errors),
+        "errors": errors[:5],
+        "min_seconds": round(ordered[0], 4),
+        "median_seconds": round(statistics.median(ordered), 4),
+        "p95_seconds": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max_seconds": round(ordered[-1], 4),
+        "runs_per_second": round(len(timings) / busy, 3) if busy > 0 else None,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "server": server,
+    }
+
+
+def print_result(result: Dict) -> None:
+    server = result["server"]
+    print(f"▶ {result['flow']}: {result['runs']} runs ({result['failed_runs']} failed)  "
+          f"min {result['min_seconds']:.3f}s  median {result['median_seconds']:.3f}s  "
+          f"p95 {result['p95_seconds']:.3f}s  max {result['max_seconds']:.3f}s")
+    print(f"   stub: {server['requests']} requests, {server['bytes_in'] / 1048576:.2f} MiB in, "
+          f"{server['bytes_out'] / 1048576:.2f} MiB out, {server['status_413']} × 413, "
+          f"{server['errors_5xx']} × 5xx")
+    for row in server["routes"]:
+        route = "final" if row["route"] == FINAL_PATH else "survey"
+        print(f"     {route:<6} {row['method']:<6} {row['status']:>3}  {row['count']:>6} × "
+              f"avg {row['avg_ms']:>8.2f} ms  max {row['max_ms']:>8.2f} ms  "
+              f"{row['bytes_in'] / max(row['count'], 1) / 1024:>8.1f} KiB in/request")
+    for error in result["errors"]:
+        print(f"   ❌ {error}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Drive the ranking and publishing flows against the stub backend")
+    parser.add_argument("--flows", default=",".join(FLOWS), help=f"comma-separated, of: {', '.join(FLOWS)}")
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--answers", type=int, default=30, help="mean answers per question")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--runs", type=int, default=3, help="rounds per flow")
+    parser.add_argument("--concurrency", type=int, default=1, help="simultaneous runs per round")
+    parser.add_argument("--publish-mode", choices=("delta", "replace"), default="delta")
+    parser.add_argument("--url", default=None, help="use a running stub instead of starting one in-process")
+    parser.add_argument("--api-key", default=STUB_API_KEY, help="x-api-key for the stub (--url only)")
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--max-body-bytes", type=int, default=None, help="stub body limit (default: Express' 1mb)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--output", default=None, help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.getLogger('survey_analytics').setLevel(logging.ERROR)
+
+    flows = [f.strip() for f in args.flows.split(",") if f.strip()]
+    if set(flows) - set(FLOWS):
+        print(f"❌ Unknown flow: {', '.join(sorted(set(flows) - set(FLOWS)))}")
+        return 2
+
+    stub = None
+    if args.url:
+        control = StubControl(url=args.url, api_key=args.api_key)
+        settings = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "error_rate": args.error_rate, "error_status": args.error_status}
+        if args.max_body_bytes:
+            settings["max_body_bytes"] = args.max_body_bytes
+        requests.put(f"{control.url}/__stub/config", json=settings, timeout=30).raise_for_status()
+    else:
+        options = {"max_body_bytes": args.max_body_bytes} if args.max_body_bytes else {}
+        stub = StubBackend(api_key=args.api_key, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+                           **options).start()
+        control = StubControl(stub=stub)
+    point_config_at(control.url, args.api_key, args.publish_mode)
+
+    bank = make_bank(args.questions, args.answers, seed=args.seed)
+    answers = sum(len(q["answers"]) for q in bank)
+    print(f"🧪 Load test against {control.url}: {len(bank)} questions, {answers} answers, "
+          f"{args.runs} × {args.concurrency} runs per flow")
+
+    results = []
+    try:
+        for flow in flows:
+            result = run_flow(flow, control, bank, args.runs, args.concurrency)
+            print_result(result)
+            results.append(result)
+    finally:
+        if stub:
+            stub.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 1 if any(r["failed_runs"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
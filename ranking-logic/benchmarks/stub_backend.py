@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Stub backend - stand-in for the Express survey API, for offline load tests and I/O benchmarks.
+
+Serves /api/v1/admin/survey and /api/v1/admin/survey/final (GET / PUT / POST / DELETE) from
+an in-memory store, with configurable latency, a JSON body limit answered with 413, random
+error injection, ETag / 304 on GET (as Express does) and per-route request accounting.
+Control routes:
+
+    GET  /__stub/stats    request counts, bytes and latency per route / method / status
+    POST /__stub/reset    clear the stats (and, with {"store": true}, both collections)
+    PUT  /__stub/config   change latency_ms, jitter_ms, max_body_bytes, error_rate, error_status
+
+Usage (from ranking-logic/):
+    python -m benchmarks.stub_backend --port 8000 --questions 2000 --answers 40 --latency-ms 20
+    API_BASE_URL=http://127.0.0.1:8000 API_ENDPOINT=/api/v1/admin/survey API_KEY=stub python ranking_processor.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import make_bank
+
+SURVEY_PATH = "/api/v1/admin/survey"
+FINAL_PATH = "/api/v1/admin/survey/final"
+CONTROL_PREFIX = "/__stub/"
+DEFAULT_MAX_BODY_BYTES = 1048576  # Express json() default limit: 1mb
+
+
+def _norm(value) -> str:
+    return str(value or "").strip().lower()
+
+
+class StubStore:
+    """Both collections, keyed by _id in insertion order; one lock serializes all writes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.survey: "OrderedDict[str, Dict]" = OrderedDict()
+        self.final: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def seed(self, questions: List[Dict]) -> None:
+        with self.lock:
+            for q in questions:
+                doc = json.loads(json.dumps(q))
+                doc.setdefault("_id", uuid.uuid4().hex)
+                for a in doc.get("answers") or []:
+                    a.setdefault("_id", uuid.uuid4().hex)
+                self.survey[doc["_id"]] = doc
+
+    def clear(self) -> None:
+        with self.lock:
+            self.survey.clear()
+            self.final.clear()
+
+    # ---- main bank ---------------------------------------------------------
+
+    def survey_get(self) -> Tuple[int, Dict]:
+        with self.lock:
+            if not self.survey:
+                return 404, {"success": False, "statusCode": 404, "message": "No questions found"}
+            return 200, {"success": True, "statusCode": 200, "data": list(self.survey.values())}
+
+    def survey_post(self, questions: List[Dict]) -> Tuple[int, Dict]:
+        self.seed(questions)
+        return 201, {"success": True, "statusCode": 201, "message": f"{len(questions)} questions created"}
+
+    def survey_put(self, questions: List[Dict]) -> Tuple[int, Dict]:
+        modified = 0
+        with self.lock:
+            for q in questions:
+                doc = self.survey.get(q.get("questionID") or q.get("_id"))
+                if doc is None:
+                    continue
+                for field in ("question", "questionType", "questionCategory", "questionLevel"):
+                    if q.get(field):
+                        doc[field] = q[field]
+                if "answers" in q:
+                    doc["answers"] = [self._stored_answer(a) for a in q["answers"] or []]
+                modified += 1
+        if not modified:
+            return 404, {"success": False, "statusCode": 404, "message": "No matching questions"}
+        return 200, {"success": True, "statusCode": 200, "data": {"modified": modified}}
+
+    def survey_delete(self, questions: List[Dict]) -> Tuple[int, Dict]:
+        return self._delete(self.survey, questions)
+
+    # ---- final set ---------------------------------------------------------
+
+    def final_get(self) -> Tuple[int, Dict]:
+        with self.lock:
+            if not self.final:
+                return 404, {"success": False, "statusCode": 404, "message": "No questions found"}
+            return 200, {"success": True, "statusCode": 200, "data": list(self.final.values())}
+
+    def final_post(self, questions: List[Dict]) -> Tuple[int, Dict]:
+        """Like the backend: a question identical in text / type / category / level is a duplicate"""
+        added = 0
+        with self.lock:
+            keys = {self._final_key(d) for d in self.final.values()}
+            for q in questions:
+                key = self._final_key(q)
+                if key in keys:
+                    continue
+                keys.add(key)
+                doc = dict(q, _id=uuid.uuid4().hex, question=_norm(q.get("question")))
+                doc["answers"] = [dict(a, _id=uuid.uuid4().hex) for a in q.get("answers") or []]
+                self.final[doc["_id"]] = doc
+                added += 1
+        if not added:
+            return 409, {"success": False, "statusCode": 409, "message": "Questions already exist"}
+        return 201, {"success": True, "statusCode": 201, "message": f"{added} questions created"}
+
+    def final_put(self, questions: List[Dict]) -> Tuple[int, Dict]:
+        """Replaces answers; answer text is stored lowercased, as the backend does"""
+        modified = 0
+        with self.lock:
+            for q in questions:
+                doc = self.final.get(q.get("questionID"))
+                if doc is None:
+                    continue
+                answers = []
+                for a in q.get("answers") or []:
+                    stored = self._stored_answer(a)
+                    stored["answer"] = _norm(stored.get("answer"))
+                    answers.append(stored)
+                doc["answers"] = answers
+                modified += 1
+        if not modified:
+            return 404, {"success": False, "statusCode": 404, "message": "No matching questions"}
+        return 200, {"success": True, "statusCode": 200, "data": {"modified": modified}}
+
+    def final_delete(self, questions: List[Dict]) -> Tuple[int, Dict]:
+        return self._delete(self.final, questions)
+
+    # ---- helpers -----------------------------------------------------------
+
+    def _delete(self, collection: Dict, questions: List[Dict]) -> Tuple[int, Dict]:
+        deleted = 0
+        with self.lock:
+            for q in questions:
+                deleted += collection.pop(q.get("questionID") or q.get("_id"), None) is not None
+        if not deleted:
+            return 404, {"success": False, "statusCode": 404, "message": "No matching questions"}
+        return 200, {"success": True, "statusCode": 200, "data": {"deleted": deleted}}
+
+    @staticmethod
+    def _stored_answer(answer: Dict) -> Dict:
+        stored = {k: v for k, v in answer.items() if k != "answerID"}
+        stored["_id"] = answer.get("answerID") or answer.get("_id") or uuid.uuid4().hex
+        return stored
+
+    @staticmethod
+    def _final_key(q: Dict) -> Tuple[str, str, str, str]:
+        return (_norm(q.get("question")), _norm(q.get("questionType")),
+                _norm(q.get("questionCategory")), _norm(q.get("questionLevel")))
+
+
+class StubStats:
+    """Request accounting per (route, method, status)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows: Dict[Tuple[str, str, int], Dict] = {}
+        self.started_at = time.time()
+
+    def record(self, route: str, method: str, status: int, bytes_in: int, bytes_out: int, seconds: float) -> None:
+        with self.lock:
+            row = self.rows.setdefault((route, method, status), {
+                "count": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0, "max_seconds": 0.0,
+            })
+            row["count"] += 1
+            row["bytes_in"] += bytes_in
+            row["bytes_out"] += bytes_out
+            row["seconds"] += seconds
+            row["max_seconds"] = max(row["max_seconds"], seconds)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.rows.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            rows = [
+                {"route": route, "method": method, "status": status, **row,
+                 "avg_ms": round(row["seconds"] / row["count"] * 1000, 2),
+                 "max_ms": round(row["max_seconds"] * 1000, 2)}
+                for (route, method, status), row in sorted(self.rows.items())
+            ]
+        for row in rows:
+            row.pop("seconds")
+            row.pop("max_seconds")
+        return {
+            "window_seconds": round(time.time() - self.started_at, 3),
+            "requests": sum(row["count"] for row in rows),
+            "bytes_in": sum(row["bytes_in"] for row in rows),
+            "bytes_out": sum(row["bytes_out"] for row in rows),
+            "status_413": sum(row["count"] for row in rows if row["status"] == 413),
+            "errors_5xx": sum(row["count"] for row in rows if row["status"] >= 500),
+            "routes": rows,
+        }
+
+
+class StubBackend:
+    """
+    The stub server; start() serves it on a background thread (port 0 picks a free port).
+    Settings can be changed while it runs, directly or through PUT /__stub/config.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, api_key: Optional[str] = None,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+                 error_rate: float = 0.0, error_status: int = 500, seed: int = 7):
+        self.store = StubStore()
+        self.stats = StubStats()
+        self.api_key = api_key
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.max_body_bytes = max_body_bytes
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubBackend":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def configure(self, **settings) -> Dict:
+        for key in ("latency_ms", "jitter_ms", "max_body_bytes", "error_rate", "error_status"):
+            if key in settings:
+                setattr(self, key, type(getattr(self, key))(settings[key]))
+        return self.settings()
+
+    def settings(self) -> Dict:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "max_body_bytes": self.max_body_bytes,
+                "error_rate": self.error_rate, "error_status": self.error_status}
+
+    # ---- request handling ---------------------------------------------------
+
+    def _delay_and_fault(self) -> bool:
+        """Sleep the configured latency; True when this request should fail"""
+        with self._rng_lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+        delay = max(0.0, self.latency_ms + jitter) / 1000
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def dispatch(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, Dict]:
+        if path.startswith(CONTROL_PREFIX):
+            return self._control(method, path[len(CONTROL_PREFIX):], body or {})
+
+        routes = {
+            SURVEY_PATH: {"GET": self.store.survey_get, "POST": self.store.survey_post,
+                          "PUT": self.store.survey_put, "DELETE": self.store.survey_delete},
+            FINAL_PATH: {"GET": self.store.final_get, "POST": self.store.final_post,
+                         "PUT": self.store.final_put, "DELETE": self.store.final_delete},
+        }
+        handlers = routes.get(path)
+        if handlers is None or method not in handlers:
+            return 404, {"message": f"Cannot {method} {path}"}
+        if method == "GET":
+            return handlers[method]()
+        questions = (body or {}).get("questions")
+        if not isinstance(questions, list):
+            return 400, {"success": False, "statusCode": 400, "message": "questions must be an array"}
+        return handlers[method](questions)
+
+    def _control(self, method: str, action: str, body: Dict) -> Tuple[int, Dict]:
+        if action == "stats" and method == "GET":
+            return 200, {**self.stats.snapshot(), "survey_questions": len(self.store.survey),
+                         "final_questions": len(self.store.final), "settings": self.settings()}
+        if action == "reset" and method == "POST":
+            self.stats.reset()
+            if body.get("store"):
+                self.store.clear()
+            return 200, {"reset": True}
+        if action == "config" and method == "PUT":
+            return 200, self.configure(**body)
+        return 404, {"message": f"Unknown control route {method} {action}"}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # keep load tests quiet
+                pass
+
+            def _handle(self):
+                started = time.perf_counter()
+                path = urlparse(self.path).path.rstrip("/") or "/"
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                control = path.startswith(CONTROL_PREFIX)
+
+                if not control and stub.api_key and self.headers.get("x-api-key") != stub.api_key:
+                    status, payload = 401, {"success": False, "statusCode": 401, "message": "Invalid API key"}
+                elif not control and length > stub.max_body_bytes:
+                    status, payload = 413, {"success": False, "statusCode": 413, "message": "request entity too large"}
+                elif not control and stub._delay_and_fault():
+                    status, payload = stub.error_status, {"success": False, "statusCode": stub.error_status,
+                                                          "message": "Injected failure"}
+                else:
+                    try:
+                        body = json.loads(raw) if raw else None
+                    except ValueError:
+                        status, payload = 400, {"success": False, "statusCode": 400, "message": "Invalid JSON"}
+                    else:
+                        status, payload = stub.dispatch(self.command, path, body)
+
+                out = json.dumps(payload, separators=(",", ":")).encode()
+                etag = None
+                if self.command == "GET" and status == 200:
+                    # Express sets a weak ETag on res.json() bodies and answers If-None-Match with 304
+                    etag = f'W/"{hashlib.blake2b(out, digest_size=12).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        status, out = 304, b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(out)
+                if not control:
+                    stub.stats.record(path, self.command, status, length, len(out), time.perf_counter() - started)
+
+            do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="In-memory stand-in for the survey backend API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--api-key", default=None, help="require this x-api-key (default: accept any)")
+    parser.add_argument("--questions", type=int, default=1000, help="synthetic questions to seed")
+    parser.add_argument("--answers", type=int, default=30, help="mean answers per seeded question")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--max-body-bytes", type=int, default=DEFAULT_MAX_BODY_BYTES)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    stub = StubBackend(host=args.host, port=args.port, api_key=args.api_key, latency_ms=args.latency_ms,
+                       jitter_ms=args.jitter_ms, max_body_bytes=args.max_body_bytes,
+                       error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    if args.questions:
+        stub.store.seed(make_bank(args.questions, args.answers, seed=args.seed))
+    print(f"🧪 Stub backend on {stub.url} with {len(stub.store.survey)} questions "
+          f"(latency {args.latency_ms}±{args.jitter_ms} ms, body limit {args.max_body_bytes} bytes, "
+          f"error rate {args.error_rate})")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
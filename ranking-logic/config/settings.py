@@ -23,6 +23,10 @@ class ConfigValidator:
             if not getattr(config_class, var):
                 missing_vars.append(var)
         
+        if (config_class.DB_BACKEND == 'mongo' or config_class.FINAL_PUBLISH_MODE == 'staged') \
+                and not config_class.MONGO_URI:
+            missing_vars.append('MONGO_URI')
+        
         if missing_vars:
             raise ValueError(ErrorMessages.MISSING_ENV_VARS.format(vars=', '.join(missing_vars)))
     
@@ -34,6 +38,18 @@ class ConfigValidator:
         
         if config_class.FLASK_PORT < 1 or config_class.FLASK_PORT > 65535:
             raise ValueError("FLASK_PORT must be between 1 and 65535")
+        
+        if config_class.DB_BACKEND not in ('api', 'mongo'):
+            raise ValueError("DB_BACKEND must be 'api' or 'mongo'")
+        
+        if config_class.FINAL_PUBLISH_MODE not in ('delta', 'replace', 'staged'):
+            raise ValueError("FINAL_PUBLISH_MODE must be 'delta', 'replace' or 'staged'")
+        
+        if config_class.FINAL_MAX_PAYLOAD_BYTES < 1024 or config_class.FINAL_MAX_WORKERS < 1:
+            raise ValueError("FINAL_MAX_PAYLOAD_BYTES must be >= 1024 and FINAL_MAX_WORKERS >= 1")
+        
+        if config_class.MIRROR_MAX_AGE < 0:
+            raise ValueError("MIRROR_MAX_AGE must be >= 0")
 
 
 class Config:
@@ -50,12 +66,63 @@ class Config:
     
     # Application Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', Defaults.LOG_LEVEL)
+    LOG_BUFFER_SIZE = int(os.getenv('LOG_BUFFER_SIZE', '2000'))  # recent records kept for /api/logs (0 = off)
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()  # text | json (one JSON object per line)
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'True').lower() == 'true'  # write console logs from a listener thread
     FLASK_PORT = int(os.getenv('FLASK_PORT', str(Defaults.FLASK_PORT)))
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
+    # Memoized preview rows (PreviewEngine)
+    PREVIEW_CACHE_SIZE = int(os.getenv('PREVIEW_CACHE_SIZE', '2048'))
+    # Seconds a cached preview / question summary is served without re-fetching the bank (0 = always re-check)
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '5'))
+    
+    # Final endpoint publishing: "delta" (POST/PUT/DELETE only what changed), "replace" (DELETE all, POST all)
+    # or "staged" (write a new version to MongoDB, then switch to it atomically)
+    FINAL_PUBLISH_MODE = os.getenv('FINAL_PUBLISH_MODE', 'delta').lower()
+    FINAL_MAX_PAYLOAD_BYTES = int(os.getenv('FINAL_MAX_PAYLOAD_BYTES', '512000'))  # backend JSON limit is 1mb
+    FINAL_MAX_WORKERS = int(os.getenv('FINAL_MAX_WORKERS', '4'))
+    # Hash of the last successful publish; unchanged payloads skip the final endpoint entirely ("" = memory only)
+    FINAL_PUBLISH_STATE_FILE = os.getenv('FINAL_PUBLISH_STATE_FILE', '.final_publish_state.json')
+    
+    # Background jobs for long-running endpoints
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_HISTORY = int(os.getenv('JOB_HISTORY', '50'))
+    # Single-flight runs: a shared directory for cross-process run locks ("" = per process only),
+    # and whether a submission during a run queues one coalesced follow-up run by default
+    RUN_LOCK_DIR = os.getenv('RUN_LOCK_DIR', '')
+    RUN_COALESCE = os.getenv('RUN_COALESCE', 'False').lower() == 'true'
+    
+    # Opt-in profiling (admin endpoint / --profile): where pstats dumps go ("" = don't write) and report size
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_TOP = int(os.getenv('PROFILE_TOP', '30'))
+    # Always-on stack sampler of the web interface, exported as collapsed stacks for flame graphs
+    SAMPLER_ENABLED = os.getenv('SAMPLER_ENABLED', 'True').lower() == 'true'
+    SAMPLER_HZ = float(os.getenv('SAMPLER_HZ', '50'))
+    SAMPLER_MAX_OVERHEAD = float(os.getenv('SAMPLER_MAX_OVERHEAD', '0.01'))  # share of one core
+    SAMPLER_MAX_STACKS = int(os.getenv('SAMPLER_MAX_STACKS', '10000'))  # distinct stacks kept per window
+    
+    # Local SQLite mirror of the bank for the REST backend ("" = off). Reads within MIRROR_MAX_AGE
+    # seconds of the last sync are served locally; older ones revalidate with a conditional GET
+    MIRROR_PATH = os.getenv('MIRROR_PATH', '')
+    MIRROR_MAX_AGE = float(os.getenv('MIRROR_MAX_AGE', '0'))
+    
     # Bulk update configuration
     BULK_UPDATE_CHUNK_SIZE = int(os.getenv("BULK_UPDATE_CHUNK_SIZE", "10"))
     
+    # Database backend: "api" (Express REST API) or "mongo" (direct pymongo access)
+    DB_BACKEND = os.getenv('DB_BACKEND', Defaults.DB_BACKEND).lower()
+    MONGO_URI = os.getenv('MONGO_URI') or os.getenv('MONGODB_URI')
+    MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', Defaults.MONGO_DB_NAME)
+    MONGO_QUESTIONS_COLLECTION = os.getenv('MONGO_QUESTIONS_COLLECTION', Defaults.MONGO_QUESTIONS_COLLECTION)
+    MONGO_FINAL_COLLECTION = os.getenv('MONGO_FINAL_COLLECTION', Defaults.MONGO_FINAL_COLLECTION)
+    
+    # Incremental ranking daemon (ranking_processor.py --daemon)
+    DAEMON_MODE = os.getenv('DAEMON_MODE', 'auto').lower()  # auto | change_stream | poll
+    DAEMON_DEBOUNCE_SECONDS = float(os.getenv('DAEMON_DEBOUNCE_SECONDS', '2'))
+    DAEMON_MAX_WAIT_SECONDS = float(os.getenv('DAEMON_MAX_WAIT_SECONDS', '10'))
+    DAEMON_POLL_INTERVAL_SECONDS = float(os.getenv('DAEMON_POLL_INTERVAL_SECONDS', '5'))
+    
     # Import field constants for backward compatibility
     from constants import QuestionFields, AnswerFields
     
@@ -68,11 +135,7 @@ class Config:
     @classmethod
     def get_full_api_url(cls) -> str:
         """Get the complete API URL"""
-        full_url = f"{cls.API_BASE_URL}{cls.API_ENDPOINT}"
-        print(f"[DEBUG] API_BASE_URL = {cls.API_BASE_URL}")
-        print(f"[DEBUG] API_ENDPOINT = {cls.API_ENDPOINT}")
-        print(f"[DEBUG] Full API URL = {full_url}")
-        return full_url
+        return f"{cls.API_BASE_URL}{cls.API_ENDPOINT}"
     
     @classmethod
     def get_api_headers(cls) -> dict:
@@ -92,6 +155,11 @@ class Config:
         """Check if debug mode is enabled"""
         return cls.FLASK_DEBUG
     
+    @classmethod
+    def is_mongo_backend(cls) -> bool:
+        """Check if ranking talks to MongoDB directly instead of the REST API"""
+        return cls.DB_BACKEND == 'mongo'
+    
     @classmethod
     def get_scoring_values(cls) -> List[int]:
         """Get scoring values for ranking"""
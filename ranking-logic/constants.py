@@ -6,10 +6,13 @@ Centralized constants for the Survey Ranking System
 class HTTPStatus:
     OK = 200
     CREATED = 201
+    NOT_MODIFIED = 304
     BAD_REQUEST = 400
     UNAUTHORIZED = 401
     FORBIDDEN = 403
     NOT_FOUND = 404
+    CONFLICT = 409
+    PAYLOAD_TOO_LARGE = 413
     INTERNAL_SERVER_ERROR = 500
 
 # API Response Keys
@@ -50,6 +53,12 @@ class Defaults:
     FLASK_PORT = 5000
     LOG_LEVEL = 'INFO'
     
+    # Direct MongoDB backend defaults (mirror backend/src/db + models)
+    DB_BACKEND = 'api'
+    MONGO_DB_NAME = 'GameShow'
+    MONGO_QUESTIONS_COLLECTION = 'questions'
+    MONGO_FINAL_COLLECTION = 'finalquestions'
+    
     # Answer defaults
     ANSWER_TEXT = ''
     IS_CORRECT = False
@@ -5,12 +5,16 @@ Enhanced Database Handler with comprehensive error handling and diagnostics
 
 import logging
 import json
+import time
 from typing import List, Dict, Optional
-from constants import APIKeys, QuestionFields
+from constants import APIKeys, QuestionFields, AnswerFields
 from utils.data_formatters import QuestionFormatter  # keep QuestionFormatter
 from utils.response_processor import ResponseProcessor  # import ResponseProcessor here
 from utils.api_handler import APIHandler
 from config.settings import Config  # ensure this exists
+from database.sqlite_mirror import SQLiteMirror
+from utils.run_events import RunEvents, NULL_EVENTS
+from utils.partition import ALL, Partition
 
 logger = logging.getLogger('survey_analytics')
 
@@ -18,6 +22,8 @@ logger = logging.getLogger('survey_analytics')
 class DatabaseHandler:
     """Enhanced Database Handler with comprehensive diagnostics"""
     
+    mirror: Optional[SQLiteMirror] = None  # MIRROR_PATH; subclasses with their own store leave it off
+    
     def __init__(self):
         self.api = APIHandler(
             base_url=Config.API_BASE_URL,
@@ -25,6 +31,9 @@ class DatabaseHandler:
             endpoint=Config.API_ENDPOINT
         )
         self.last_operation_details = {}
+        if Config.MIRROR_PATH:
+            self.mirror = SQLiteMirror(Config.MIRROR_PATH)
+            logger.info(f"🗄️ Local mirror: {Config.MIRROR_PATH} (max age {Config.MIRROR_MAX_AGE}s)")
     
     def test_connection(self) -> bool:
         """Test if API connection is healthy"""
@@ -122,11 +131,43 @@ class DatabaseHandler:
         return analysis
     
     def fetch_all_questions(self) -> List[Dict]:
-        """Fetch all questions from API endpoint with clean logging"""
+        """Fetch all questions from API endpoint with clean logging (through the mirror when enabled)"""
+        if self.mirror is None:
+            return self._fetch_remote()
+        downloaded = self._refresh_mirror()
+        return downloaded if downloaded is not None else self.mirror.load()
+    
+    def _refresh_mirror(self) -> Optional[List[Dict]]:
+        """
+        Bring the mirror up to date. Within MIRROR_MAX_AGE nothing is sent; otherwise a
+        conditional GET either confirms the bank is unchanged (304, nothing downloaded) or
+        returns it, and only the questions that changed are rewritten locally.
+        Returns the downloaded questions, or None when the mirror was already current.
+        """
+        if self.mirror.is_fresh(Config.MIRROR_MAX_AGE):
+            logger.info("🗄️ Serving questions from the local mirror")
+            return None
+        
+        questions = self._fetch_remote(conditional=True)
+        if questions is None:
+            self.mirror.touch()
+            logger.info("🗄️ Bank unchanged (304) - serving the local mirror")
+            return None
+        return questions
+    
+    def _fetch_remote(self, conditional: bool = False) -> Optional[List[Dict]]:
+        """GET the bank. conditional=True sends the mirror's ETag and returns None on 304."""
         try:
             logger.info("📥 Fetching questions from API...")
             
-            response_data = self.api.make_request("GET")
+            etag = None
+            if conditional:
+                response_data, etag = self.api.get_if_changed(self.mirror.etag)
+                if response_data is None:
+                    self.last_operation_details = {"operation": "fetch_questions", "success": True, "not_modified": True}
+                    return None
+            else:
+                response_data = self.api.make_request("GET")
             
             # Check if this was an empty database 404 that got converted
             if response_data.get("_empty_database"):
@@ -140,6 +181,7 @@ class DatabaseHandler:
                         "suggestions": ["Database is empty - import questions to get started"]
                     }
                 }
+                self._sync_mirror([], etag)
                 return []
             
             questions = ResponseProcessor.extract_questions_from_response(response_data)
@@ -162,10 +204,11 @@ class DatabaseHandler:
                 logger.warning(f"⚠️ {len(analysis['data_issues'])} data issues detected")
                 if logger.isEnabledFor(logging.DEBUG):
                     for issue in analysis["data_issues"][:3]:
-                        logger.debug(f"   • {issue}")
+                        logger.debug("   • %s", issue)
             
             # Process questions for internal use
             processed_questions = self._process_fetched_questions(questions)
+            self._sync_mirror(processed_questions, etag)
             return processed_questions
             
         except Exception as e:
@@ -177,6 +220,7 @@ class DatabaseHandler:
                     "success": True,
                     "empty_database": True
                 }
+                self._sync_mirror([], None)
                 return []
             
             self.last_operation_details = {
@@ -188,6 +232,78 @@ class DatabaseHandler:
             logger.error(f"❌ Failed to fetch questions: {str(e)}")
             raise
     
+    def _sync_mirror(self, questions: List[Dict], etag: Optional[str]) -> None:
+        if self.mirror is None:
+            return
+        try:
+            changes = self.mirror.sync(questions, etag)
+            logger.info(f"🗄️ Mirror synced: {changes['inserted']} new, {changes['updated']} changed, "
+                        f"{changes['deleted']} removed, {changes['unchanged'] + changes['moved']} unchanged")
+        except Exception as e:
+            # The mirror is a cache: never fail a fetch over it, just make the next read re-download
+            logger.warning(f"⚠️ Mirror sync failed: {str(e)}")
+            self.mirror.invalidate()
+    
+    def _mirror_written(self, questions: List[Dict]) -> None:
+        """Record questions just written to the backend in the mirror, as the backend now stores them"""
+        if self.mirror is None or not questions:
+            return
+        stored = []
+        for q in questions:
+            answers = QuestionFormatter.format_for_api(q)[QuestionFields.ANSWERS]
+            for a in answers:
+                a[AnswerFields.ID] = a[AnswerFields.ANSWER_ID]
+            stored.append(QuestionFormatter.ensure_compatibility(dict(q, **{QuestionFields.ANSWERS: answers})))
+        try:
+            self.mirror.apply_updates(stored)
+        except Exception as e:
+            logger.warning(f"⚠️ Mirror update failed: {str(e)}")
+            self.mirror.invalidate()
+    
+    def fetch_questions_by_ids(self, question_ids: List[str]) -> List[Dict]:
+        """Fetch specific questions (the REST API has no id filter: an indexed mirror lookup, else a filtered full fetch)"""
+        if self.mirror is not None:
+            self._refresh_mirror()
+            return self.mirror.load(question_ids=list(question_ids))
+        wanted = set(question_ids)
+        return [q for q in self.fetch_all_questions() if QuestionFormatter.get_question_id(q) in wanted]
+    
+    def fetch_partition(self, partition: Partition) -> List[Dict]:
+        """Questions of one partition: an indexed mirror query, else a filtered full fetch (the REST API cannot filter)"""
+        if self.mirror is not None:
+            self._refresh_mirror()
+            return self.mirror.load(question_ids=partition.question_ids, category=partition.category,
+                                    level=partition.level)
+        return partition.apply(self.fetch_all_questions())
+    
+    def dataset_version(self) -> Optional[str]:
+        """
+        Cheap token that changes whenever the bank does, for keying cached responses without
+        loading the bank. With the mirror: bring it up to date (nothing sent within
+        MIRROR_MAX_AGE, else a conditional GET) and use its data_version. None when there is no
+        cheap version (no mirror, or a mirror that could not be synced).
+        """
+        if self.mirror is None:
+            return None
+        self._refresh_mirror()
+        if self.mirror.validated_at is None:
+            return None
+        version = self.mirror.data_version
+        return f"mirror:{version}" if version else None
+
+    def can_push_down_preview(self) -> bool:
+        """The mirror can total correct responses itself and decode only rankable questions"""
+        return self.mirror is not None
+    
+    def fetch_preview_candidates(self, min_responses: int, partition: Partition = ALL) -> List[Dict]:
+        """Preview summary from the mirror (see MongoDatabaseHandler.fetch_preview_candidates)"""
+        self._refresh_mirror()
+        candidates = self.mirror.preview_candidates(min_responses, question_ids=partition.question_ids,
+                                                    category=partition.category, level=partition.level)
+        rankable = sum(1 for q in candidates if q["rankable"])
+        logger.info(f"📊 Preview from mirror: {rankable} of {len(candidates)} questions decoded with answers")
+        return candidates
+    
     def _process_fetched_questions(self, questions: List[Dict]) -> List[Dict]:
         """Process raw questions from API for internal use"""
         processed_questions = []
@@ -200,12 +316,12 @@ class DatabaseHandler:
             except Exception as e:
                 question_id = question.get('_id', f'Question_{i}')
                 processing_issues.append(f"Question {question_id}: {str(e)}")
-                logger.warning(f"Failed to process question {question_id}: {str(e)}")
+                logger.warning("Failed to process question %s: %s", question_id, e)
         
         if processing_issues:
             logger.warning(f"⚠️ {len(processing_issues)} questions had processing issues:")
             for issue in processing_issues[:3]:  # Show first 3
-                logger.warning(f"  • {issue}")
+                logger.warning("  • %s", issue)
         
         return processed_questions
     
@@ -232,7 +348,7 @@ class DatabaseHandler:
             # Optional: small preview log
             if formatted and formatted[0].get(QuestionFields.ANSWERS):
                 a0 = formatted[0][QuestionFields.ANSWERS][0]
-                logger.debug(f"[BULK] sending chunk={len(chunk)} firstAns rank={a0.get('rank')} score={a0.get('score')}")
+                logger.debug("[BULK] sending chunk=%d firstAns rank=%s score=%s", len(chunk), a0.get('rank'), a0.get('score'))
             resp = self.api.put(json=payload)
             # If APIHandler returns a requests.Response-like object
             status = getattr(resp, "status_code", 200)
@@ -249,7 +365,7 @@ class DatabaseHandler:
                 # 413 -> reduce chunk size
                 if chunk_size > 1:
                     chunk_size = max(1, chunk_size // 2)
-                    logger.info(f"Reducing bulk chunk size to {chunk_size} and retrying current segment")
+                    logger.info("Reducing bulk chunk size to %d and retrying current segment", chunk_size)
                     continue
                 # Fall back to single-question updates
                 logger.info("Falling back to per-question updates due to payload size")
@@ -307,7 +423,7 @@ class DatabaseHandler:
             # Format for API submission
             update_data = self._build_single_question_payload(target_question)
             
-            logger.debug(f"Updating question {question_id} with validated data")
+            logger.debug("Updating question %s with validated data", question_id)
             
             # Make API request
             response = self.api.make_request("PUT", update_data)
@@ -369,12 +485,14 @@ class DatabaseHandler:
         formatted_question = QuestionFormatter.format_for_api(question)
         return {APIKeys.QUESTIONS: [formatted_question]}
     
-    def bulk_update_questions(self, questions: List[Dict]) -> Dict:
+    def bulk_update_questions(self, questions: List[Dict], events: Optional[RunEvents] = None) -> Dict:
         """
         Send updates in chunks to avoid HTTP 413 (PayloadTooLarge).
         Falls back to smaller chunk sizes and finally per-question update.
+        Emits a "chunk" event (size, outcome, latency, done/total) per request sent.
         Returns { updated, total, chunks, failed_chunks }.
         """
+        events = events or NULL_EVENTS
         total = len(questions)
         if total == 0:
             return {"updated": 0, "total": 0, "chunks": 0, "failed_chunks": 0}
@@ -399,12 +517,17 @@ class DatabaseHandler:
 
         while idx < total:
             window = questions[idx: idx + chunk_size]
+            start = time.perf_counter()
             result = send_chunk(window)
+            events.emit("chunk", stage="upload", size=len(window), outcome=result,
+                        latency=round(time.perf_counter() - start, 4),
+                        done=idx + (len(window) if result == "ok" else 0), total=total)
 
             if result == "ok":
                 updated += len(window)
                 idx += len(window)
                 chunks += 1
+                self._mirror_written(window)
                 continue
 
             if result == "413" and chunk_size > 1:
@@ -417,10 +540,13 @@ class DatabaseHandler:
                 resp = self.api.put(json=payload)
                 if getattr(resp, "ok", True):
                     updated += 1
+                    self._mirror_written([q])
                 else:
                     failed_chunks += 1
             idx += len(window)
             chunks += 1
+            events.emit("chunk", stage="upload", size=len(window), outcome="per_question",
+                        latency=round(time.perf_counter() - start, 4), done=idx, total=total)
 
         return {"updated": updated, "total": total, "chunks": chunks, "failed_chunks": failed_chunks}
 
@@ -442,6 +568,7 @@ class DatabaseHandler:
                 "api_key_preview": f"{Config.API_KEY[:8]}..." if Config.API_KEY else "Not set"
             },
             "last_operation": self.last_operation_details,
+            "mirror": self.mirror.stats() if self.mirror is not None else None,
             "connection_status": "unknown"
         }
         
@@ -598,4 +725,13 @@ class DatabaseHandler:
             for rec in result["recommendations"]:
                 logger.info(f"   • {rec}")
         
-        return result
\ No newline at end of file
+        return result
+
+
+def create_db_handler() -> DatabaseHandler:
+    """Build the DatabaseHandler selected by DB_BACKEND ("api" or "mongo")"""
+    if Config.is_mongo_backend():
+        # Imported lazily so the REST-only deployment never needs a MongoDB client
+        from database.mongo_handler import MongoDatabaseHandler
+        return MongoDatabaseHandler()
+    return DatabaseHandler()
@@ -0,0 +1,226 @@
+"""
+Final Store - versioned (blue/green) storage for the published final question set
+"""
+
+import logging
+import threading
+from abc import ABC, abstractmethod
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+
+from config.settings import Config
+from constants import QuestionFields, AnswerFields
+
+logger = logging.getLogger('survey_analytics')
+
+POINTER_ID = "active"
+
+
+def _canonical_type(question_type: str) -> str:
+    raw = (question_type or "").strip()
+    if raw.upper() == "MCQ":
+        return "MCQ"
+    if raw.upper() == "INPUT":
+        return "Input"
+    return raw
+
+
+def _trimmed(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def build_final_documents(formatted_questions: List[Dict]) -> List[Dict]:
+    """
+    Turn questions shaped by _format_question_for_final_api into final-collection documents,
+    the same way the backend's POST does: fresh uuid ids, lowercased question text, trimmed
+    answer text (the schema's trim: true), canonical type, only correct answers for Input
+    questions, and duplicates dropped.
+    """
+    now = datetime.now(timezone.utc)
+    documents = []
+    seen = set()
+    for q in formatted_questions:
+        question_type = _canonical_type(q.get(QuestionFields.QUESTION_TYPE))
+        text = (q.get(QuestionFields.QUESTION) or "").lower().strip()
+        key = (text, question_type, q.get(QuestionFields.QUESTION_CATEGORY), q.get(QuestionFields.QUESTION_LEVEL))
+        if key in seen:
+            continue
+        seen.add(key)
+
+        answers = q.get(QuestionFields.ANSWERS) or []
+        if question_type == "Input":
+            answers = [a for a in answers if a.get(AnswerFields.IS_CORRECT) is True]
+
+        documents.append({
+            QuestionFields.ID: str(uuid.uuid4()),
+            QuestionFields.QUESTION: text,
+            QuestionFields.QUESTION_TYPE: question_type,
+            QuestionFields.QUESTION_CATEGORY: q.get(QuestionFields.QUESTION_CATEGORY),
+            QuestionFields.QUESTION_LEVEL: q.get(QuestionFields.QUESTION_LEVEL),
+            QuestionFields.TIMES_SKIPPED: q.get(QuestionFields.TIMES_SKIPPED, 0),
+            QuestionFields.TIMES_ANSWERED: q.get(QuestionFields.TIMES_ANSWERED, 0),
+            QuestionFields.ANSWERS: [
+                {
+                    AnswerFields.ID: str(uuid.uuid4()),
+                    AnswerFields.ANSWER: _trimmed(a.get(AnswerFields.ANSWER)),
+                    AnswerFields.IS_CORRECT: a.get(AnswerFields.IS_CORRECT),
+                    AnswerFields.RESPONSE_COUNT: a.get(AnswerFields.RESPONSE_COUNT) or 0,
+                    AnswerFields.RANK: a.get(AnswerFields.RANK) or 0,
+                    AnswerFields.SCORE: a.get(AnswerFields.SCORE) or 0,
+                }
+                for a in answers
+            ],
+            "createdAt": now,
+            "updatedAt": now,
+        })
+    return documents
+
+
+class FinalStore(ABC):
+    """
+    Blue/green store for the final set. A publish stages a complete new version next to the
+    active one, then flips the active pointer in a single step; readers resolve the pointer,
+    so they always see one complete version. The previous version stays readable until the flip.
+    """
+
+    @abstractmethod
+    def stage(self, version: str, documents: List[Dict]) -> int:
+        """Write `documents` as `version` without touching the active version; returns the count"""
+        ...
+
+    @abstractmethod
+    def activate(self, version: str) -> Dict:
+        """Make a staged version the active one; returns {version, previous_version, previous_count}"""
+        ...
+
+    @abstractmethod
+    def discard(self, version: str) -> None:
+        """Drop a staged version that will not be activated"""
+        ...
+
+    @abstractmethod
+    def active_version(self) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def read_active(self) -> List[Dict]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryFinalStore(FinalStore):
+    """Process-local stand-in: versions are lists and the pointer is swapped under a lock"""
+
+    def __init__(self):
+        self._versions: Dict[str, List[Dict]] = {}
+        self._active: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def stage(self, version: str, documents: List[Dict]) -> int:
+        staged = list(documents)
+        with self._lock:
+            self._versions[version] = staged
+        return len(staged)
+
+    def activate(self, version: str) -> Dict:
+        with self._lock:
+            if version not in self._versions:
+                raise KeyError(f"Unknown final version: {version}")
+            previous = self._active
+            previous_count = len(self._versions.get(previous, [])) if previous else 0
+            self._active = version
+            # Readers that already resolved the old pointer keep their list; it is just unreferenced here
+            if previous and previous != version:
+                self._versions.pop(previous, None)
+        return {"version": version, "previous_version": previous, "previous_count": previous_count}
+
+    def discard(self, version: str) -> None:
+        with self._lock:
+            if version != self._active:
+                self._versions.pop(version, None)
+
+    def active_version(self) -> Optional[str]:
+        with self._lock:
+            return self._active
+
+    def read_active(self) -> List[Dict]:
+        with self._lock:
+            return list(self._versions.get(self._active, [])) if self._active else []
+
+
+class MongoFinalStore(FinalStore):
+    """
+    MongoDB store. Each version is written to its own staging collection, then renamed onto
+    the collection the backend reads (renameCollection with dropTarget is a single atomic step),
+    so the Express API never sees an empty or half-written final set. A pointer document records
+    the active version.
+    """
+
+    def __init__(self, database=None):
+        self.client = None
+        if database is None:
+            from pymongo import MongoClient
+            self.client = MongoClient(Config.MONGO_URI, serverSelectionTimeoutMS=Config.get_timeout() * 1000)
+            database = self.client[Config.MONGO_DB_NAME]
+        self.database = database
+        self.active_name = Config.MONGO_FINAL_COLLECTION
+        self.pointers = database[f"{self.active_name}_versions"]
+        self.batch_size = 1000
+
+    def _staging_name(self, version: str) -> str:
+        return f"{self.active_name}__staging_{version}"
+
+    def stage(self, version: str, documents: List[Dict]) -> int:
+        staging = self.database[self._staging_name(version)]
+        staging.drop()
+        if not documents:
+            # Nothing to insert would leave no collection to rename: stage an empty one
+            self.database.create_collection(self._staging_name(version))
+        for start in range(0, len(documents), self.batch_size):
+            staging.insert_many(documents[start:start + self.batch_size], ordered=False)
+        logger.info(f"🧱 Staged {len(documents)} final questions as version {version}")
+        return len(documents)
+
+    def activate(self, version: str) -> Dict:
+        previous = self.active_version()
+        previous_count = self.database[self.active_name].estimated_document_count()
+        staging = self.database[self._staging_name(version)]
+        staging.rename(self.active_name, dropTarget=True)
+        self.pointers.replace_one(
+            {"_id": POINTER_ID},
+            {"_id": POINTER_ID, "version": version, "collection": self.active_name,
+             "previousVersion": previous, "activatedAt": datetime.now(timezone.utc)},
+            upsert=True,
+        )
+        logger.info(f"🔀 Final set switched to version {version} (previous: {previous})")
+        return {"version": version, "previous_version": previous, "previous_count": previous_count}
+
+    def discard(self, version: str) -> None:
+        self.database[self._staging_name(version)].drop()
+
+    def active_version(self) -> Optional[str]:
+        pointer = self.pointers.find_one({"_id": POINTER_ID}) or {}
+        return pointer.get("version")
+
+    def read_active(self) -> List[Dict]:
+        return list(self.database[self.active_name].find({}))
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+
+
+def new_version() -> str:
+    """Sortable version id: millisecond timestamp plus a short random suffix"""
+    return f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}"
+
+
+def create_final_store() -> FinalStore:
+    """Final store for FINAL_PUBLISH_MODE=staged"""
+    if not Config.MONGO_URI:
+        raise ValueError("FINAL_PUBLISH_MODE=staged needs MONGO_URI")
+    return MongoFinalStore()
@@ -0,0 +1,419 @@
+"""
+Direct MongoDB Database Handler - reads and writes the questions collection with pymongo
+instead of going through the Express REST API
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from constants import QuestionFields, AnswerFields
+from config.settings import Config
+from database.db_handler import DatabaseHandler
+from utils.data_formatters import QuestionFormatter
+from utils.partition import ALL, Partition
+from utils.run_events import RunEvents, NULL_EVENTS
+
+logger = logging.getLogger('survey_analytics')
+
+
+# Only the fields ranking, preview and final publishing read
+RANKING_PROJECTION = {
+    QuestionFields.ID: 1,
+    QuestionFields.QUESTION: 1,
+    QuestionFields.QUESTION_TYPE: 1,
+    QuestionFields.QUESTION_CATEGORY: 1,
+    QuestionFields.QUESTION_LEVEL: 1,
+    QuestionFields.TIMES_SKIPPED: 1,
+    QuestionFields.TIMES_ANSWERED: 1,
+    f"{QuestionFields.ANSWERS}.{AnswerFields.ID}": 1,
+    f"{QuestionFields.ANSWERS}.{AnswerFields.ANSWER}": 1,
+    f"{QuestionFields.ANSWERS}.{AnswerFields.IS_CORRECT}": 1,
+    f"{QuestionFields.ANSWERS}.{AnswerFields.RESPONSE_COUNT}": 1,
+    f"{QuestionFields.ANSWERS}.{AnswerFields.RANK}": 1,
+    f"{QuestionFields.ANSWERS}.{AnswerFields.SCORE}": 1,
+}
+
+# Case-insensitive equality on questionCategory / questionLevel; PARTITION_INDEXES are built with it
+CASE_INSENSITIVE = {"locale": "en", "strength": 2}
+PARTITION_INDEXES = {
+    "partition_category_level": [(QuestionFields.QUESTION_CATEGORY, 1), (QuestionFields.QUESTION_LEVEL, 1)],
+    "partition_level": [(QuestionFields.QUESTION_LEVEL, 1)],
+}
+
+# Mongoose timestamps set updatedAt on every insert and update (our bulk writes set it too)
+UPDATED_AT = "updatedAt"
+VERSION_INDEX = [(UPDATED_AT, -1)]
+
+# Answer fields written back after merging and ranking
+RANKED_ANSWER_FIELDS = (
+    AnswerFields.ANSWER,
+    AnswerFields.IS_CORRECT,
+    AnswerFields.RESPONSE_COUNT,
+    AnswerFields.RANK,
+    AnswerFields.SCORE,
+)
+
+
+def _partition_query(partition: Partition) -> Dict:
+    """
+    find / $match filter for a partition. Category and level need the CASE_INSENSITIVE
+    collation; an id-only query runs with the default one so it stays on the _id index.
+    """
+    query = {}
+    if partition.question_ids is not None:
+        query[QuestionFields.ID] = {"$in": partition.question_ids}
+    if partition.category is not None:
+        query[QuestionFields.QUESTION_CATEGORY] = partition.category
+    if partition.level is not None:
+        query[QuestionFields.QUESTION_LEVEL] = partition.level
+    return query
+
+
+def _to_int(v) -> int:
+    try:
+        return int(v)
+    except Exception:
+        return 0
+
+
+def _answer_ids(answers: List[Dict]) -> List[str]:
+    ids = []
+    for a in answers or []:
+        aid = a.get(AnswerFields.ANSWER_ID) or a.get(AnswerFields.ID)
+        if aid:
+            ids.append(aid)
+    return ids
+
+
+class MongoDatabaseHandler(DatabaseHandler):
+    """
+    DatabaseHandler backed directly by the questions collection (DB_BACKEND=mongo).
+
+    `collection` may be injected (a local mongod collection or an in-process fake
+    exposing find / bulk_write / database.command); otherwise one is opened from
+    MONGO_URI / MONGO_DB_NAME / MONGO_QUESTIONS_COLLECTION.
+    """
+
+    def __init__(self, collection=None):
+        self.client: Optional[MongoClient] = None
+        if collection is None:
+            self.client = MongoClient(Config.MONGO_URI, serverSelectionTimeoutMS=Config.get_timeout() * 1000)
+            collection = self.client[Config.MONGO_DB_NAME][Config.MONGO_QUESTIONS_COLLECTION]
+        self.collection = collection
+        self.last_operation_details = {}
+        # questionID -> answer _ids seen at fetch time, so answers absorbed by merging can be pulled
+        self._fetched_answer_ids: Dict[str, List[str]] = {}
+        self._partition_indexes_ready = False
+        self._version_index_ready = False
+
+    def test_connection(self) -> bool:
+        """Ping the MongoDB server"""
+        try:
+            self.collection.database.command("ping")
+            logger.info("✅ MongoDB connection successful")
+            return True
+        except PyMongoError as e:
+            logger.error(f"❌ MongoDB connection failed: {str(e)}")
+            return False
+
+    def fetch_all_questions(self) -> List[Dict]:
+        """Fetch all questions with only the fields ranking needs"""
+        try:
+            logger.info("📥 Fetching questions from MongoDB...")
+            questions = list(self.collection.find({}, RANKING_PROJECTION))
+        except PyMongoError as e:
+            self.last_operation_details = {
+                "operation": "fetch_questions",
+                "success": False,
+                "error": str(e)
+            }
+            logger.error(f"❌ Failed to fetch questions: {str(e)}")
+            raise
+
+        analysis = self._analyze_questions_data(questions)
+        self.last_operation_details = {
+            "operation": "fetch_questions",
+            "success": True,
+            "empty_database": not questions,
+            "analysis": analysis
+        }
+        logger.info(f"✅ Found {analysis['total_questions']} questions")
+
+        processed_questions = self._process_fetched_questions(questions)
+        self._remember_answer_ids(processed_questions)
+        return processed_questions
+
+    def fetch_questions_by_ids(self, question_ids: List[str]) -> List[Dict]:
+        """Fetch only the given questions"""
+        if not question_ids:
+            return []
+        questions = list(self.collection.find({QuestionFields.ID: {"$in": list(question_ids)}}, RANKING_PROJECTION))
+        processed_questions = self._process_fetched_questions(questions)
+        self._remember_answer_ids(processed_questions)
+        return processed_questions
+
+    def _partition_options(self, partition: Partition) -> Dict:
+        """Collation for a category / level filter, building its indexes on first use"""
+        if partition.category is None and partition.level is None:
+            return {}
+        if not self._partition_indexes_ready:
+            try:
+                for name, keys in PARTITION_INDEXES.items():
+                    self.collection.create_index(keys, name=name, collation=CASE_INSENSITIVE)
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Could not create partition indexes: {str(e)}")
+            self._partition_indexes_ready = True
+        return {"collation": CASE_INSENSITIVE}
+
+    def fetch_partition(self, partition: Partition) -> List[Dict]:
+        """
+        Fetch only the questions of one partition; the filter runs server-side. The collation
+        is re-checked with Partition.matches(), so the result is the same as on other backends.
+        """
+        if partition.question_ids == []:
+            return []
+        try:
+            questions = list(self.collection.find(_partition_query(partition), RANKING_PROJECTION,
+                                                  **self._partition_options(partition)))
+        except PyMongoError as e:
+            self.last_operation_details = {"operation": "fetch_questions", "success": False, "error": str(e)}
+            logger.error(f"❌ Failed to fetch partition {partition.key}: {str(e)}")
+            raise
+        questions = partition.apply(questions)
+        logger.info(f"✅ Found {len(questions)} questions in partition {partition.key}")
+        processed_questions = self._process_fetched_questions(questions)
+        self._remember_answer_ids(processed_questions)
+        return processed_questions
+
+    def dataset_version(self) -> Optional[str]:
+        """
+        Cheap version of the bank: the collection's estimated count (metadata only) plus the
+        newest updatedAt, read from the updated_at index (built on first use). Deletions change
+        the count; inserts and updates through the API or this handler move updatedAt.
+        """
+        if not self._version_index_ready:
+            try:
+                self.collection.create_index(VERSION_INDEX, name="updated_at")
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Could not create the updatedAt index: {str(e)}")
+            self._version_index_ready = True
+        count = self.collection.estimated_document_count()
+        newest = self.collection.find_one({}, {UPDATED_AT: 1, QuestionFields.ID: 0}, sort=VERSION_INDEX)
+        return f"mongo:{count}:{(newest or {}).get(UPDATED_AT, '')}"
+
+    def can_push_down_preview(self) -> bool:
+        return True
+
+    def fetch_preview_candidates(self, min_responses: int, partition: Partition = ALL) -> List[Dict]:
+        """
+        Preview summary computed server-side: every question comes back with its lowercased
+        type, answer count and correct-response total; only rankable questions (not MCQ and
+        at least `min_responses` correct responses) carry their answers.
+        """
+        answers = {"$ifNull": [f"${QuestionFields.ANSWERS}", []]}
+        correct_answers = {"$filter": {
+            "input": answers,
+            "as": "a",
+            "cond": {"$eq": [f"$$a.{AnswerFields.IS_CORRECT}", True]}
+        }}
+        summary_fields = {k: 1 for k in RANKING_PROJECTION if not k.startswith(f"{QuestionFields.ANSWERS}.")}
+        pipeline = [
+            {"$project": {
+                **summary_fields,
+                QuestionFields.ANSWERS: 1,
+                "answerCount": {"$size": answers},
+                "correctCounts": {"$map": {
+                    "input": correct_answers,
+                    "as": "a",
+                    "in": {"$ifNull": [f"$$a.{AnswerFields.RESPONSE_COUNT}", 0]}
+                }},
+            }},
+            {"$addFields": {"totalCorrect": {"$sum": "$correctCounts"}}},
+            {"$addFields": {
+                "rankable": {"$and": [
+                    {"$ne": [{"$toLower": {"$ifNull": [f"${QuestionFields.QUESTION_TYPE}", ""]}}, "mcq"]},
+                    {"$gte": ["$totalCorrect", min_responses]},
+                ]},
+            }},
+            # Drop answers of everything that will not be clustered before it leaves the server
+            {"$addFields": {
+                QuestionFields.ANSWERS: {"$cond": ["$rankable", f"${QuestionFields.ANSWERS}", "$$REMOVE"]},
+            }},
+            {"$project": {"correctCounts": 0}},
+        ]
+        if not partition.empty:
+            pipeline.insert(0, {"$match": _partition_query(partition)})
+        docs = partition.apply(self.collection.aggregate(pipeline, **self._partition_options(partition)))
+        rankable = 0
+        for doc in docs:
+            if doc.get("rankable"):
+                rankable += 1
+                # Normalize answers exactly like a regular fetch
+                doc.update(QuestionFormatter.ensure_compatibility(doc))
+        logger.info(f"📊 Preview pushdown: {rankable} of {len(docs)} questions downloaded with answers")
+        return docs
+
+    def watch_questions(self, max_await_time_ms: int = 500):
+        """
+        Open a change stream on the questions collection for inserts, replaces and updates.
+        Requires a replica set (a single-node one is enough); raises PyMongoError otherwise.
+        """
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "replace", "update"]}}}]
+        return self.collection.watch(pipeline, max_await_time_ms=max_await_time_ms)
+
+    def _remember_answer_ids(self, questions: List[Dict]) -> None:
+        """Record the stored answer ids of each fetched question"""
+        for q in questions:
+            qid = QuestionFormatter.get_question_id(q)
+            if qid:
+                self._fetched_answer_ids[qid] = _answer_ids(q.get(QuestionFields.ANSWERS))
+
+    def _build_update_ops(self, question_id: str, answers: List[Dict], now: datetime) -> List[UpdateOne]:
+        """
+        Build the UpdateOne operations for one question:
+        - $set of the ranked answer fields, addressed per answer _id via arrayFilters, with the
+          answer text normalized like the REST PUT does it (trimmed, lowercased)
+        - $pull of answers that merging folded into another cluster
+        """
+        set_fields = {}
+        array_filters = []
+        kept_ids = set()
+
+        for i, answer in enumerate(answers or []):
+            answer_id = answer.get(AnswerFields.ANSWER_ID) or answer.get(AnswerFields.ID)
+            if not answer_id:
+                continue
+            kept_ids.add(answer_id)
+            ident = f"a{i}"
+            array_filters.append({f"{ident}.{AnswerFields.ID}": answer_id})
+            for field in RANKED_ANSWER_FIELDS:
+                value = answer.get(field)
+                if field in (AnswerFields.RESPONSE_COUNT, AnswerFields.RANK, AnswerFields.SCORE):
+                    value = _to_int(value)
+                elif field == AnswerFields.IS_CORRECT:
+                    value = bool(value)
+                elif field == AnswerFields.ANSWER:
+                    # the Express PUT stores answer.trim().toLowerCase()
+                    value = (value or "").strip().lower()
+                set_fields[f"{QuestionFields.ANSWERS}.$[{ident}].{field}"] = value
+
+        ops = []
+        if set_fields:
+            set_fields[UPDATED_AT] = now
+            ops.append(UpdateOne({QuestionFields.ID: question_id}, {"$set": set_fields}, array_filters=array_filters))
+
+        absorbed = [aid for aid in self._fetched_answer_ids.get(question_id, []) if aid not in kept_ids]
+        if absorbed:
+            ops.append(UpdateOne(
+                {QuestionFields.ID: question_id},
+                {"$pull": {QuestionFields.ANSWERS: {AnswerFields.ID: {"$in": absorbed}}}}
+            ))
+        return ops
+
+    def bulk_update_questions(self, questions: List[Dict], events: Optional[RunEvents] = None) -> Dict:
+        """
+        Write ranked answers back with one unordered bulk_write.
+        Emits one "chunk" event with the bulk_write latency, like the REST handler does per request.
+        Returns { updated, total, chunks, failed_chunks } like the REST handler.
+        """
+        events = events or NULL_EVENTS
+        total = len(questions)
+        if total == 0:
+            return {"updated": 0, "total": 0, "chunks": 0, "failed_chunks": 0}
+
+        now = datetime.now(timezone.utc)
+        ops: List[UpdateOne] = []
+        op_question_ids: List[str] = []
+        written_answer_ids: Dict[str, List[str]] = {}
+        for q in questions:
+            qid = QuestionFormatter.get_question_id(q)
+            if not qid:
+                continue
+            answers = q.get(QuestionFields.ANSWERS) or []
+            q_ops = self._build_update_ops(qid, answers, now)
+            ops.extend(q_ops)
+            op_question_ids.extend([qid] * len(q_ops))
+            written_answer_ids[qid] = _answer_ids(answers)
+
+        if not ops:
+            return {"updated": 0, "total": total, "chunks": 0, "failed_chunks": 0}
+
+        logger.info(f"📤 bulk_write of {len(ops)} operations for {total} questions")
+        failed_ids = set()
+        start = time.perf_counter()
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            matched = result.matched_count
+        except BulkWriteError as e:
+            details = e.details or {}
+            for err in details.get("writeErrors", []):
+                failed_ids.add(op_question_ids[err.get("index", 0)])
+                logger.error("❌ Update failed for question %s: %s", op_question_ids[err.get('index', 0)], err.get('errmsg'))
+            matched = details.get("nMatched", 0)
+        except PyMongoError as e:
+            logger.error(f"❌ bulk_write failed: {str(e)}")
+            events.emit("chunk", stage="upload", size=total, outcome="fail",
+                        latency=round(time.perf_counter() - start, 4), done=0, total=total)
+            return {"updated": 0, "total": total, "chunks": 1, "failed_chunks": 1}
+
+        for qid, answer_ids in written_answer_ids.items():
+            if qid not in failed_ids:
+                self._fetched_answer_ids[qid] = answer_ids
+
+        updated = len(set(op_question_ids) - failed_ids)
+        events.emit("chunk", stage="upload", size=total, outcome="fail" if failed_ids else "ok",
+                    latency=round(time.perf_counter() - start, 4), done=total, total=total)
+        return {
+            "updated": updated,
+            "total": total,
+            "chunks": 1,
+            "failed_chunks": 1 if failed_ids else 0,
+            "matched": matched,
+        }
+
+    def update_question_answers(self, question_id: str, answers: List[Dict]) -> bool:
+        """Update a single question's ranked answers"""
+        res = self.bulk_update_questions([{QuestionFields.QUESTION_ID: question_id, QuestionFields.ANSWERS: answers}])
+        return res.get("updated", 0) == 1
+
+    def get_diagnostic_summary(self) -> Dict:
+        """Get diagnostic information for the MongoDB backend"""
+        summary = {
+            "db_backend": "mongo",
+            "mongo_config": {
+                "database": self.collection.database.name,
+                "collection": self.collection.name,
+            },
+            "last_operation": self.last_operation_details,
+            "connection_status": "healthy" if self.test_connection() else "failed"
+        }
+
+        try:
+            questions = self.fetch_all_questions()
+            summary["data_analysis"] = self._analyze_questions_data(questions)
+        except Exception as e:
+            summary["data_analysis"] = {"error": str(e)}
+
+        return summary
+
+    def discover_correct_endpoint(self) -> Dict[str, any]:
+        """No endpoint to discover - report MongoDB reachability instead"""
+        responsive = self.test_connection()
+        return {
+            "endpoint": f"mongodb://{self.collection.database.name}/{self.collection.name}",
+            "server_responsive": responsive,
+            "endpoint_working": responsive,
+            "error_details": None,
+            "recommendations": [] if responsive else ["Check MONGO_URI and that mongod is reachable"]
+        }
+
+    def close(self):
+        """Close the MongoDB client if this handler opened it"""
+        if self.client is not None:
+            self.client.close()
+        logger.info("MongoDB database handler closed")
@@ -0,0 +1,350 @@
+"""
+Snapshot Database Handler - ranks a local dump of the question bank instead of the live backend,
+and records the writes as an update plan that can be applied to the backend later
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from constants import QuestionFields, AnswerFields
+from database.db_handler import DatabaseHandler
+from utils.data_formatters import QuestionFormatter
+from utils.partition import ALL, Partition
+from utils.response_processor import ResponseProcessor
+from utils.run_events import RunEvents, NULL_EVENTS
+
+logger = logging.getLogger('survey_analytics')
+
+READ_CHUNK_CHARS = 1 << 16
+PLAN_BATCH_SIZE = 500
+REMOVED_ANSWER_IDS = "removedAnswerIDs"
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+def _open_text(path: str, mode: str, name: Optional[str] = None):
+    """Text handle on a plain or gzip file (by the .gz suffix of `name`, default `path`)"""
+    if (name or path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _is_ndjson(path: str) -> bool:
+    name = path[:-3] if path.endswith(".gz") else path
+    return name.endswith((".ndjson", ".jsonl"))
+
+
+def _plain_id(value):
+    """mongoexport writes ObjectIds as {"$oid": "..."}"""
+    if isinstance(value, dict) and "$oid" in value:
+        return value["$oid"]
+    return value
+
+
+def _plain(question: Dict) -> Dict:
+    if QuestionFields.ID in question:
+        question[QuestionFields.ID] = _plain_id(question[QuestionFields.ID])
+    for answer in question.get(QuestionFields.ANSWERS) or []:
+        if isinstance(answer, dict) and AnswerFields.ID in answer:
+            answer[AnswerFields.ID] = _plain_id(answer[AnswerFields.ID])
+    return question
+
+
+def _iter_json_array(handle: io.TextIOBase) -> Iterator[Dict]:
+    """
+    Decode a top-level JSON array one element at a time, so a large dump is never held
+    as text and as objects at once. The array must be well-formed: elements separated by
+    exactly one comma and nothing but whitespace after the closing bracket, so a corrupt or
+    concatenated dump raises ValueError instead of being ranked.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def refill() -> None:
+        nonlocal buffer, pos, eof
+        chunk = handle.read(READ_CHUNK_CHARS)
+        buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+
+    def peek() -> str:
+        """Next non-whitespace character (refilling the buffer as needed), "" at the end"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ""
+            refill()
+
+    if peek() != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    count = 0
+    if peek() == "]":
+        pos += 1
+    else:
+        while True:
+            if not peek():
+                raise ValueError("unterminated JSON array")
+            if peek() in (",", "]"):
+                raise ValueError(f"expected an array element after element {count}")
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise ValueError(f"invalid JSON in array element {count + 1} ({e.msg})") from None
+                    refill()
+                    continue
+                if not eof and isinstance(item, (int, float)) and not buffer[end:].lstrip(_NUMBER_CHARS):
+                    # a number at the buffer edge ("12", "-4.", "1e") may continue in the next chunk
+                    refill()
+                    continue
+                break
+            yield item
+            count += 1
+            pos = end
+            separator = peek()
+            if separator == "]":
+                pos += 1
+                break
+            if not separator:
+                raise ValueError("unterminated JSON array")
+            if separator != ",":
+                raise ValueError(f"expected ',' or ']' after array element {count}, found {separator!r}")
+            pos += 1
+    if peek():
+        raise ValueError("unexpected data after the closing ']' of the JSON array")
+
+
+def read_snapshot(path: str) -> Iterator[Dict]:
+    """
+    Stream the questions of a dump: NDJSON (.ndjson / .jsonl, one question per line), a JSON
+    array, or a saved API response ({"data": [...]} / {"questions": [...]}, loaded whole).
+    Any of them may be gzip-compressed (.gz).
+    """
+    with _open_text(path, "r") as handle:
+        if _is_ndjson(path):
+            for number, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield _plain(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{number}: invalid JSON ({e.msg})") from None
+            return
+
+        head = handle.read(1)
+        while head and head.isspace():
+            head = handle.read(1)
+        if head == "[":
+            try:
+                for item in _iter_json_array(_Prepend(head, handle)):
+                    yield _plain(item)
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}") from None
+            return
+        items = ResponseProcessor.extract_questions_from_response(json.loads(head + handle.read()))
+        for item in items:
+            yield _plain(item)
+
+
+class _Prepend:
+    """A text handle with already-consumed characters put back in front"""
+
+    def __init__(self, text: str, handle):
+        self.text = text
+        self.handle = handle
+
+    def read(self, size: int = -1) -> str:
+        text, self.text = self.text, ""
+        return text + self.handle.read(size)
+
+
+def write_snapshot(path: str, questions: Iterable[Dict]) -> int:
+    """Write questions as NDJSON or a JSON array (by the file name), one question at a time"""
+    count = 0
+    ndjson = _is_ndjson(path)
+    tmp_path = f"{path}.tmp"
+    with _open_text(tmp_path, "w", name=path) as handle:
+        if not ndjson:
+            handle.write("[")
+        for q in questions:
+            if ndjson:
+                handle.write(json.dumps(q, ensure_ascii=False, default=str) + "\n")
+            else:
+                handle.write(("," if count else "") + "\n" + json.dumps(q, ensure_ascii=False, default=str))
+            count += 1
+        if not ndjson:
+            handle.write("\n]\n")
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_plan(path: str) -> Iterator[Dict]:
+    """Stream the entries of an update plan written by SnapshotDatabaseHandler.write_plan"""
+    with _open_text(path, "r") as handle:
+        for number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: invalid plan entry ({e.msg})") from None
+
+
+def _answer_ids(answers: List[Dict]) -> List[str]:
+    ids = []
+    for a in answers or []:
+        aid = a.get(AnswerFields.ANSWER_ID) or a.get(AnswerFields.ID)
+        if aid:
+            ids.append(aid)
+    return ids
+
+
+class SnapshotDatabaseHandler(DatabaseHandler):
+    """
+    DatabaseHandler over a local dump (ranking_processor.py --input).
+
+    fetch_all_questions() streams the dump; bulk_update_questions() writes nothing remote and
+    keeps each question's ranked payload (the body the REST handler would PUT), plus the
+    answer ids merging removed, for write_plan().
+    """
+
+    def __init__(self, input_path: str):
+        self.input_path = input_path
+        self.last_operation_details = {}
+        self.updates: Dict[str, Dict] = {}
+        # questionID -> answer ids in the snapshot, so answers absorbed by merging are listed in the plan
+        self._snapshot_answer_ids: Dict[str, List[str]] = {}
+
+    def test_connection(self) -> bool:
+        """The snapshot file is readable"""
+        if os.path.isfile(self.input_path) and os.access(self.input_path, os.R_OK):
+            logger.info(f"✅ Snapshot found: {self.input_path}")
+            return True
+        logger.error(f"❌ Snapshot not readable: {self.input_path}")
+        return False
+
+    def dataset_version(self) -> Optional[str]:
+        """The dump's modification time and size"""
+        stat = os.stat(self.input_path)
+        return f"snapshot:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def fetch_all_questions(self) -> List[Dict]:
+        """Read every question of the snapshot"""
+        return self.fetch_partition(ALL)
+
+    def fetch_partition(self, partition: Partition) -> List[Dict]:
+        """Read the questions of one partition, dropping the rest as they stream past"""
+        start = time.perf_counter()
+        logger.info(f"📥 Reading questions from snapshot {self.input_path}...")
+        try:
+            items = read_snapshot(self.input_path)
+            if not partition.empty:
+                items = (q for q in items if partition.matches(q))
+            questions = self._process_fetched_questions(list(items))
+        except (OSError, ValueError) as e:
+            self.last_operation_details = {"operation": "fetch_questions", "success": False, "error": str(e)}
+            logger.error(f"❌ Failed to read snapshot: {str(e)}")
+            raise
+
+        analysis = self._analyze_questions_data(questions)
+        self.last_operation_details = {
+            "operation": "fetch_questions",
+            "success": True,
+            "empty_database": not questions,
+            "analysis": analysis
+        }
+        for q in questions:
+            qid = QuestionFormatter.get_question_id(q)
+            if qid:
+                self._snapshot_answer_ids[qid] = _answer_ids(q.get(QuestionFields.ANSWERS))
+        logger.info(f"✅ Read {len(questions)} questions in {time.perf_counter() - start:.2f}s")
+        return questions
+
+    def fetch_questions_by_ids(self, question_ids: List[str]) -> List[Dict]:
+        return self.fetch_partition(Partition(question_ids=question_ids))
+
+    def bulk_update_questions(self, questions: List[Dict], events: Optional[RunEvents] = None) -> Dict:
+        """Record the ranked questions for the update plan"""
+        events = events or NULL_EVENTS
+        total = len(questions)
+        start = time.perf_counter()
+        updated = 0
+        for q in questions:
+            payload = QuestionFormatter.format_for_api(q)
+            qid = payload.get(QuestionFields.QUESTION_ID)
+            if not qid:
+                continue
+            kept = set(_answer_ids(payload[QuestionFields.ANSWERS]))
+            payload[REMOVED_ANSWER_IDS] = [aid for aid in self._snapshot_answer_ids.get(qid, []) if aid not in kept]
+            self.updates[qid] = payload
+            updated += 1
+        events.emit("chunk", stage="upload", size=total, outcome="ok",
+                    latency=round(time.perf_counter() - start, 4), done=total, total=total)
+        return {"updated": updated, "total": total, "chunks": 1 if total else 0, "failed_chunks": 0}
+
+    def update_question_answers(self, question_id: str, answers: List[Dict]) -> bool:
+        return self.bulk_update_questions([{QuestionFields.QUESTION_ID: question_id,
+                                            QuestionFields.ANSWERS: answers}])["updated"] == 1
+
+    def write_plan(self, path: str) -> int:
+        """NDJSON, one question's update payload per line"""
+        with _open_text(f"{path}.tmp", "w", name=path) as handle:
+            for payload in self.updates.values():
+                handle.write(json.dumps(payload, ensure_ascii=False, default=str) + "\n")
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"📝 Update plan with {len(self.updates)} questions written to {path}")
+        return len(self.updates)
+
+    def get_diagnostic_summary(self) -> Dict:
+        return {"backend": "snapshot", "input": self.input_path, "last_operation": self.last_operation_details,
+                "pending_updates": len(self.updates)}
+
+    def close(self):
+        pass
+
+
+def apply_plan(db_handler, path: str, batch_size: int = PLAN_BATCH_SIZE,
+               events: Optional[RunEvents] = None) -> Dict:
+    """
+    Send an update plan to a live backend with its bulk_update_questions, `batch_size`
+    questions at a time. The Mongo handler also $pulls the answers merging removed; the REST
+    PUT replaces the answer list, which drops them anyway.
+    Returns { updated, total, chunks, failed_chunks } summed over the batches.
+    """
+    events = events or NULL_EVENTS
+    totals = {"updated": 0, "total": 0, "chunks": 0, "failed_chunks": 0}
+    remember = getattr(db_handler, "_remember_answer_ids", None)
+
+    def flush(batch: List[Dict]) -> None:
+        if remember is not None:
+            remember([
+                {QuestionFields.QUESTION_ID: q[QuestionFields.QUESTION_ID],
+                 QuestionFields.ANSWERS: [{AnswerFields.ID: aid} for aid in
+                                          _answer_ids(q[QuestionFields.ANSWERS]) + q[REMOVED_ANSWER_IDS]]}
+                for q in batch
+            ])
+        result = db_handler.bulk_update_questions(batch, events=events)
+        for key in totals:
+            totals[key] += result.get(key, 0)
+        logger.info(f"📤 Applied {totals['updated']}/{totals['total']} planned updates")
+
+    batch: List[Dict] = []
+    for entry in read_plan(path):
+        entry.setdefault(REMOVED_ANSWER_IDS, [])
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return totals
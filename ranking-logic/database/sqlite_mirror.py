@@ -0,0 +1,325 @@
+"""
+SQLite Mirror - local, indexed copy of the question bank kept in sync from fetches and writes
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from constants import AnswerFields, QuestionFields
+from utils.data_formatters import QuestionFormatter
+from utils.partition import match_key
+
+logger = logging.getLogger('survey_analytics')
+
+SQLITE_MAX_PARAMS = 500  # ids per IN (...) query, well under SQLite's variable limit
+SCHEMA_VERSION = 2  # PRAGMA user_version; a mirror written by another version is rebuilt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    question_id       TEXT PRIMARY KEY,
+    question          TEXT,
+    question_type     TEXT COLLATE NOCASE,
+    question_category TEXT,
+    question_level    TEXT,
+    category_key      TEXT NOT NULL,
+    level_key         TEXT NOT NULL,
+    position          INTEGER NOT NULL,
+    fingerprint       TEXT NOT NULL,
+    doc               TEXT NOT NULL,
+    synced_at         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_type ON questions (question_type);
+CREATE INDEX IF NOT EXISTS idx_questions_category_level ON questions (category_key, level_key);
+CREATE INDEX IF NOT EXISTS idx_questions_level ON questions (level_key);
+CREATE INDEX IF NOT EXISTS idx_questions_position ON questions (position);
+
+CREATE TABLE IF NOT EXISTS answers (
+    question_id    TEXT NOT NULL,
+    position       INTEGER NOT NULL,
+    answer_id      TEXT,
+    answer         TEXT,
+    is_correct     INTEGER NOT NULL,
+    response_count INTEGER NOT NULL,
+    rank           INTEGER NOT NULL,
+    score          INTEGER NOT NULL,
+    PRIMARY KEY (question_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_answers_answer_id ON answers (answer_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def question_fingerprint(question: Dict) -> str:
+    """Digest of a whole question document; any change to it (answers included) changes the digest"""
+    body = json.dumps(question, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+
+def _to_int(v) -> int:
+    try:
+        return int(v)
+    except Exception:
+        return 0
+
+
+class SQLiteMirror:
+    """
+    Questions and answers in SQLite, indexed by question id, type, category and level, each
+    question stored with a fingerprint of its document. Category and level are indexed in
+    their match_key form, so filters select exactly what Partition.matches() would.
+
+    sync() reconciles the mirror with a full fetch: only questions whose fingerprint (or
+    position in the bank) changed are rewritten, and questions gone from the bank are deleted.
+    apply_updates() records our own writes. The ETag of the last full fetch is kept so the
+    next fetch can be a conditional GET, and data_version changes whenever the mirrored bank does.
+
+    One connection is shared by all threads behind a lock; WAL lets other processes read
+    while one writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        version, = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            # Only a cache of the backend: drop an outdated layout and let the next fetch refill it
+            self._conn.executescript("DROP TABLE IF EXISTS questions; DROP TABLE IF EXISTS answers; "
+                                     "DROP TABLE IF EXISTS meta;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(SCHEMA)
+
+    # ---- sync state ----------------------------------------------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def etag(self) -> Optional[str]:
+        with self._lock:
+            return self._meta("etag")
+
+    @property
+    def data_version(self) -> Optional[str]:
+        """Opaque token, replaced by every sync or write that changes the mirrored bank"""
+        with self._lock:
+            return self._meta("data_version")
+
+    def _bump_version(self) -> None:
+        self._set_meta("data_version", uuid.uuid4().hex)
+
+    @property
+    def validated_at(self) -> Optional[float]:
+        """When the mirror was last known to match the backend (full sync or 304)"""
+        with self._lock:
+            value = self._meta("validated_at")
+        return float(value) if value else None
+
+    def is_fresh(self, max_age: float) -> bool:
+        validated_at = self.validated_at
+        return max_age > 0 and validated_at is not None and time.time() - validated_at < max_age
+
+    def touch(self) -> None:
+        """The backend confirmed the bank is unchanged (304)"""
+        with self._lock:
+            self._set_meta("validated_at", str(time.time()))
+
+    def invalidate(self) -> None:
+        """Forget the sync state; the next fetch downloads the bank again"""
+        with self._lock:
+            self._set_meta("etag", None)
+            self._set_meta("validated_at", None)
+
+    # ---- writes ------------------------------------------------------------
+
+    def _write_question(self, qid: str, question: Dict, position: int, fingerprint: str, now: float) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO questions (question_id, question, question_type, question_category, "
+            "question_level, category_key, level_key, position, fingerprint, doc, synced_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (qid, question.get(QuestionFields.QUESTION), question.get(QuestionFields.QUESTION_TYPE),
+             question.get(QuestionFields.QUESTION_CATEGORY), question.get(QuestionFields.QUESTION_LEVEL),
+             match_key(question.get(QuestionFields.QUESTION_CATEGORY)),
+             match_key(question.get(QuestionFields.QUESTION_LEVEL)), position, fingerprint, json.dumps(question, separators=(",", ":"), default=str), now)
+        )
+        self._conn.execute("DELETE FROM answers WHERE question_id = ?", (qid,))
+        self._conn.executemany(
+            "INSERT INTO answers (question_id, position, answer_id, answer, is_correct, response_count, rank, score) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (qid, i, a.get(AnswerFields.ANSWER_ID) or a.get(AnswerFields.ID), a.get(AnswerFields.ANSWER),
+                 int(a.get(AnswerFields.IS_CORRECT) is True), _to_int(a.get(AnswerFields.RESPONSE_COUNT)),
+                 _to_int(a.get(AnswerFields.RANK)), _to_int(a.get(AnswerFields.SCORE)))
+                for i, a in enumerate(question.get(QuestionFields.ANSWERS) or [])
+            ]
+        )
+
+    def _delete(self, question_ids: List[str]) -> None:
+        for start in range(0, len(question_ids), SQLITE_MAX_PARAMS):
+            chunk = question_ids[start:start + SQLITE_MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM answers WHERE question_id IN ({marks})", chunk)
+            self._conn.execute(f"DELETE FROM questions WHERE question_id IN ({marks})", chunk)
+
+    def sync(self, questions: List[Dict], etag: Optional[str] = None) -> Dict:
+        """Make the mirror match a full fetch of the bank. Returns the change counts."""
+        now = time.time()
+        changes = {"inserted": 0, "updated": 0, "moved": 0, "deleted": 0, "unchanged": 0}
+        with self._lock:
+            known = {qid: (fp, pos) for qid, fp, pos in
+                     self._conn.execute("SELECT question_id, fingerprint, position FROM questions")}
+            seen = set()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for position, q in enumerate(questions):
+                    qid = QuestionFormatter.get_question_id(q)
+                    if not qid or qid in seen:
+                        continue
+                    seen.add(qid)
+                    fingerprint = question_fingerprint(q)
+                    stored = known.get(qid)
+                    if stored is None or stored[0] != fingerprint:
+                        self._write_question(qid, q, position, fingerprint, now)
+                        changes["inserted" if stored is None else "updated"] += 1
+                    elif stored[1] != position:
+                        self._conn.execute("UPDATE questions SET position = ? WHERE question_id = ?", (position, qid))
+                        changes["moved"] += 1
+                    else:
+                        changes["unchanged"] += 1
+                gone = [qid for qid in known if qid not in seen]
+                self._delete(gone)
+                changes["deleted"] = len(gone)
+                if len(seen) != changes["unchanged"] or gone or self._meta("data_version") is None:
+                    self._bump_version()
+                self._set_meta("etag", etag)
+                self._set_meta("validated_at", str(now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return changes
+
+    def apply_updates(self, questions: Iterable[Dict]) -> int:
+        """
+        Record questions we just wrote to the backend. Their remote version (and ETag) is now
+        newer than the mirror's sync state, so that state is left for the next fetch to refresh.
+        """
+        now = time.time()
+        written = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                next_position = self._conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM questions").fetchone()[0]
+                for q in questions:
+                    qid = QuestionFormatter.get_question_id(q)
+                    if not qid:
+                        continue
+                    row = self._conn.execute("SELECT position FROM questions WHERE question_id = ?", (qid,)).fetchone()
+                    if row is None:
+                        position, next_position = next_position, next_position + 1
+                    else:
+                        position = row[0]
+                    self._write_question(qid, q, position, question_fingerprint(q), now)
+                    written += 1
+                if written:
+                    self._bump_version()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return written
+
+    # ---- reads -------------------------------------------------------------
+
+    @staticmethod
+    def _where(question_ids: Optional[List[str]], category: Optional[str], level: Optional[str],
+               question_type: Optional[str]) -> tuple:
+        clauses, params = [], []
+        for column, value in (("category_key", category), ("level_key", level)):
+            if value:
+                clauses.append(f"q.{column} = ?")
+                params.append(match_key(value))
+        if question_type:
+            clauses.append("q.question_type = ?")
+            params.append(question_type)
+        if question_ids is not None:
+            clauses.append(f"q.question_id IN ({','.join('?' * len(question_ids))})")
+            params.extend(question_ids)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self, sql: str, question_ids: Optional[List[str]], category, level, question_type) -> List[tuple]:
+        """Run a filtered SELECT, splitting long id lists into several queries"""
+        if question_ids is None:
+            id_chunks = [None]
+        else:
+            ids = list(dict.fromkeys(question_ids))
+            id_chunks = [ids[i:i + SQLITE_MAX_PARAMS] for i in range(0, len(ids), SQLITE_MAX_PARAMS)]
+        rows = []
+        with self._lock:
+            for chunk in id_chunks:
+                where, params = self._where(chunk, category, level, question_type)
+                rows.extend(self._conn.execute(sql.format(where=where), params).fetchall())
+        rows.sort(key=lambda row: row[0])  # bank order
+        return rows
+
+    def load(self, question_ids: Optional[List[str]] = None, category: Optional[str] = None,
+             level: Optional[str] = None, question_type: Optional[str] = None) -> List[Dict]:
+        """Mirrored questions in bank order, optionally filtered (case-insensitively) through the indexes"""
+        rows = self._select("SELECT q.position, q.doc FROM questions q{where}",
+                            question_ids, category, level, question_type)
+        return [json.loads(doc) for _, doc in rows]
+
+    def preview_candidates(self, min_responses: int, question_ids: Optional[List[str]] = None,
+                           category: Optional[str] = None, level: Optional[str] = None) -> List[Dict]:
+        """
+        Like MongoDatabaseHandler.fetch_preview_candidates: answer counts and correct-response
+        totals come from the answers table, and only rankable questions are decoded with answers.
+        """
+        correct = "COALESCE(SUM(CASE WHEN a.is_correct THEN a.response_count ELSE 0 END), 0)"
+        rows = self._select(
+            "SELECT q.position, q.question_id, q.question, q.question_type, q.question_category, q.question_level, "
+            f"COUNT(a.position), {correct}, "
+            f"CASE WHEN LOWER(COALESCE(q.question_type, '')) != 'mcq' AND {correct} >= {int(min_responses)} "
+            "THEN q.doc END "
+            "FROM questions q LEFT JOIN answers a ON a.question_id = q.question_id{where} GROUP BY q.question_id",
+            question_ids, category, level, None
+        )
+        results = []
+        for _, qid, text, qtype, qcategory, qlevel, answer_count, total_correct, doc in rows:
+            if doc is not None:
+                summary = json.loads(doc)
+            else:
+                summary = {QuestionFields.ID: qid, QuestionFields.QUESTION_ID: qid, QuestionFields.QUESTION: text,
+                           QuestionFields.QUESTION_TYPE: qtype, QuestionFields.QUESTION_CATEGORY: qcategory,
+                           QuestionFields.QUESTION_LEVEL: qlevel}
+            summary.update({"answerCount": answer_count, "totalCorrect": total_correct, "rankable": doc is not None})
+            results.append(summary)
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            questions, = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()
+            answers, = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+            validated_at = self._meta("validated_at")
+        return {"path": self.path, "questions": questions, "answers": answers,
+                "validated_at": float(validated_at) if validated_at else None}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
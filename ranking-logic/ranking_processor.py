@@ -3,13 +3,21 @@
 Updated Ranking Processor - Input questions only, no automatic final processing
 """
 
+import argparse
+import signal
 import sys
 import time
-from typing import Dict
+from typing import Dict, List, Optional
 from config.settings import Config
-from database.db_handler import DatabaseHandler
+from database.db_handler import create_db_handler
+from database.snapshot_handler import SnapshotDatabaseHandler, apply_plan, write_snapshot
 from services.ranking_service import RankingService
+from services.final_service import FinalService
+from services.ranking_daemon import RankingDaemon
 from utils.logger import setup_logger
+from utils.partition import ALL, Partition
+from utils.profiling import RunProfiler, format_report
+from utils.run_coordinator import RunCoordinator
 
 
 class ProcessorDisplay:
@@ -37,12 +45,15 @@ class ProcessorDisplay:
         print(f"❌ Failed Updates: {result['failed_count']}")
         print(f"🏆 Answers Ranked: {result['answers_ranked']}")
         print(f"🎯 Answers Scored: {result['answers_scored']}")
+        if result.get('stage_rejections'):
+            rejections = ", ".join(f"{stage}={count}" for stage, count in result['stage_rejections'].items())
+            print(f"🚦 Rejected by stage: {rejections}")
         
         ProcessorDisplay._print_warnings_and_success(result)
         
         print("=" * 70)
         print("🏁 Ranking process finished.")
-        print("💡 Use the UI or separate command to POST to final endpoint.")
+        print("💡 Use the UI or --publish to POST to final endpoint.")
     
     @staticmethod
     def _print_warnings_and_success(result: Dict):
@@ -61,6 +72,50 @@ class ProcessorDisplay:
         else:
             print(f"\nℹ️  No questions were updated (possibly no valid Input questions found)")
     
+    @staticmethod
+    def print_publish_results(result: Dict, publish_source: str):
+        """Print final endpoint publish results"""
+        print("\n" + "=" * 70)
+        print("📤 FINAL ENDPOINT PUBLISH")
+        print("=" * 70)
+        print(f"♻️  Source: {'in-memory ranked questions' if publish_source == 'memory' else 're-fetched questions'}")
+        if result.get('status') == 'skipped_unchanged':
+            print("⏭️  Payload unchanged since last publish - nothing sent")
+            print("=" * 70)
+            return
+        print(f"📤 Questions Posted: {result['questions_posted']}")
+        print(f"🗑️  Questions Deleted: {result['questions_deleted']}")
+        if result.get('publish_mode') == 'delta':
+            print(f"✏️  Questions Updated: {result['questions_updated']}")
+            print(f"⏸️  Questions Unchanged: {result['questions_unchanged']}")
+        print(f"❌ Failed: {result['questions_failed'] + result.get('delete_failed', 0)}")
+        print("=" * 70)
+    
+    @staticmethod
+    def print_offline_results(files: Dict):
+        """Print where an offline run wrote its results"""
+        print(f"📂 Snapshot: {files['input']}")
+        if files.get('output'):
+            print(f"💾 Ranked bank: {files['output']} ({files['output_count']} questions)")
+        if files.get('plan'):
+            print(f"📝 Update plan: {files['plan']} ({files['plan_count']} questions)")
+            print(f"💡 Apply it with: python ranking_processor.py --apply-plan {files['plan']}")
+        if not files.get('output') and not files.get('plan'):
+            print("ℹ️  Dry run - pass --output and/or --plan to keep the results")
+        print("=" * 70)
+    
+    @staticmethod
+    def print_apply_results(result: Dict, processing_time: float):
+        """Print the outcome of applying an update plan"""
+        print("\n" + "=" * 70)
+        print("📤 UPDATE PLAN APPLIED")
+        print("=" * 70)
+        print(f"⏱️  Processing Time: {processing_time}s")
+        print(f"📝 Planned Questions: {result['total']}")
+        print(f"💾 Updated in Database: {result['updated']}")
+        print(f"📦 Requests: {result['chunks']} ({result['failed_chunks']} failed)")
+        print("=" * 70)
+    
     @staticmethod
     def print_error(error_msg: str):
         """Print error message"""
@@ -98,17 +153,22 @@ class ProcessorValidator:
 class RankingProcessor:
     """Main processor class that orchestrates the ranking process"""
     
-    def __init__(self):
+    def __init__(self, profiler: Optional[RunProfiler] = None):
         self.logger = setup_logger()
         self.db_handler = None
         self.ranking_service = None
+        self.final_service = None
+        self.coordinator = RunCoordinator()
+        self.profiler = profiler
+        self.profile_report = None
     
     def initialize_services(self) -> bool:
         """Initialize database handler and ranking service"""
         try:
             self.logger.info("🔧 Initializing services...")
-            self.db_handler = DatabaseHandler()
+            self.db_handler = create_db_handler()
             self.ranking_service = RankingService(self.db_handler)
+            self.final_service = FinalService(self.db_handler)
             return True
         except Exception as e:
             self.logger.error(f"❌ Service initialization failed: {str(e)}")
@@ -127,13 +187,33 @@ class RankingProcessor:
         
         return True
     
-    def execute_ranking_process(self) -> tuple:
+    def _single_flight(self, key: str, fn) -> tuple:
+        """Run fn(events) through the run coordinator, under the profiler when --profile is set"""
+        if self.profiler is None:
+            return self.coordinator.run(key, lambda: fn(None))
+        
+        def profiled():
+            result, self.profile_report = self.profiler.profile(key, fn)
+            return result
+        
+        result, joined = self.coordinator.run(key, profiled)
+        if joined:
+            self.logger.warning("⚠️ Joined a run already in progress - nothing was profiled")
+        return result, joined
+    
+    def execute_ranking_process(self, partition: Partition = ALL) -> tuple:
         """Execute the main ranking process"""
         self.logger.info("⚙️ Starting ranking process for Input questions only...")
         start_time = time.time()
         
         try:
-            result = self.ranking_service.process_all_questions()
+            # Shares RUN_LOCK_DIR with the web workers, so a run already in flight is joined, not repeated
+            result, joined = self._single_flight(
+                partition.scoped("process_ranking"),
+                lambda events: self.ranking_service.process_all_questions(events=events, partition=partition)
+            )
+            if joined:
+                self.logger.info("🔗 Joined a ranking run already in progress - reporting its result")
             processing_time = round(time.time() - start_time, 2)
             return result, processing_time, True
         except Exception as e:
@@ -141,17 +221,44 @@ class RankingProcessor:
             self.logger.error(f"❌ Fatal error in ranking processor: {str(e)}")
             return None, processing_time, False
     
-    def run(self) -> bool:
-        """Run the complete ranking process"""
+    def execute_rank_and_publish(self, force: bool = False, partition: Partition = ALL) -> tuple:
+        """Rank, then publish the in-memory ranked questions to the final endpoint"""
+        self.logger.info("⚙️ Starting rank and publish...")
+        start_time = time.time()
+        
+        try:
+            result, joined = self._single_flight(
+                partition.scoped("rank_and_publish"),
+                lambda events: self.final_service.rank_and_publish(self.ranking_service, force=force, events=events,
+                                                                   partition=partition)
+            )
+            if joined:
+                self.logger.info("🔗 Joined a rank and publish run already in progress - reporting its result")
+            processing_time = round(time.time() - start_time, 2)
+            return result, processing_time, True
+        except Exception as e:
+            processing_time = round(time.time() - start_time, 2)
+            self.logger.error(f"❌ Fatal error in rank and publish: {str(e)}")
+            return None, processing_time, False
+    
+    def run(self, publish: bool = False, force_publish: bool = False, partition: Partition = ALL) -> bool:
+        """Run the complete ranking process (of the whole bank or one partition), optionally publishing"""
         ProcessorDisplay.print_header()
         
         # Validate prerequisites
         if not self.validate_prerequisites():
             ProcessorDisplay.print_error("Prerequisites validation failed")
             return False
+        if not partition.empty:
+            self.logger.info(f"🎯 Ranking only partition {partition.key}")
         
         # Execute ranking process
-        result, processing_time, success = self.execute_ranking_process()
+        if publish:
+            published, processing_time, success = self.execute_rank_and_publish(force=force_publish,
+                                                                                partition=partition)
+            result = published["ranking"] if success else None
+        else:
+            result, processing_time, success = self.execute_ranking_process(partition=partition)
         
         if not success:
             ProcessorDisplay.print_error("Ranking process execution failed")
@@ -159,6 +266,14 @@ class RankingProcessor:
         
         # Display results
         ProcessorDisplay.print_results(result, processing_time)
+        if publish:
+            final = published["final"]
+            ProcessorDisplay.print_publish_results(final, published["publish_source"])
+        if self.profile_report:
+            print("\n" + format_report(self.profile_report))
+        if publish and not (final["post_success"] and final["delete_success"]):
+            self.logger.error("❌ Publishing to final endpoint failed")
+            return False
         
         # Log completion
         if result['failed_count'] > 0:
@@ -170,12 +285,173 @@ class RankingProcessor:
             self.logger.info("ℹ️ Ranking process completed with no updates")
         
         return True
+    
+    def run_offline(self, input_path: str, output_path: Optional[str] = None,
+                    plan_path: Optional[str] = None, partition: Partition = ALL) -> bool:
+        """
+        Rank a local snapshot: no backend access. Writes the bank as it would stand after
+        ranking to output_path and the writes to plan_path, for --apply-plan later.
+        With a partition only its questions are read, ranked and planned.
+        """
+        ProcessorDisplay.print_header()
+        self.db_handler = SnapshotDatabaseHandler(input_path)
+        self.ranking_service = RankingService(self.db_handler)
+        if not self.db_handler.test_connection():
+            ProcessorDisplay.print_error("Snapshot not readable")
+            return False
+        
+        self.logger.info("⚙️ Starting offline ranking...")
+        start_time = time.time()
+        try:
+            (result, current), _ = self._single_flight(
+                partition.scoped("offline_ranking"),
+                lambda events: self.ranking_service.process_for_publish(events=events, partition=partition)
+            )
+            files = {"input": input_path, "output": output_path, "plan": plan_path}
+            if output_path:
+                files["output_count"] = write_snapshot(output_path, current)
+            if plan_path:
+                files["plan_count"] = self.db_handler.write_plan(plan_path)
+        except Exception as e:
+            self.logger.error(f"❌ Fatal error in offline ranking: {str(e)}")
+            ProcessorDisplay.print_error("Offline ranking failed")
+            return False
+        
+        ProcessorDisplay.print_results(result, round(time.time() - start_time, 2))
+        ProcessorDisplay.print_offline_results(files)
+        if self.profile_report:
+            print("\n" + format_report(self.profile_report))
+        return True
+    
+    def run_apply_plan(self, plan_path: str) -> bool:
+        """Write an update plan from an offline run to the backend"""
+        print(f"📤 Applying update plan {plan_path}")
+        print("=" * 70)
+        if not self.validate_prerequisites():
+            ProcessorDisplay.print_error("Prerequisites validation failed")
+            return False
+        
+        start_time = time.time()
+        try:
+            result, _ = self._single_flight("apply_plan", lambda events: apply_plan(self.db_handler, plan_path, events=events))
+        except Exception as e:
+            self.logger.error(f"❌ Failed to apply update plan: {str(e)}")
+            return False
+        
+        ProcessorDisplay.print_apply_results(result, round(time.time() - start_time, 2))
+        if result['updated'] < result['total']:
+            self.logger.warning(f"⚠️ {result['total'] - result['updated']} planned updates were not applied")
+            return False
+        return True
+    
+    def run_save_snapshot(self, path: str, partition: Partition = ALL) -> bool:
+        """Download the question bank (or one partition of it) once into a local snapshot for --input"""
+        if not self.validate_prerequisites():
+            ProcessorDisplay.print_error("Prerequisites validation failed")
+            return False
+        try:
+            if partition.empty:
+                questions = self.db_handler.fetch_all_questions()
+            else:
+                questions = self.db_handler.fetch_partition(partition)
+            count = write_snapshot(path, questions)
+        except Exception as e:
+            self.logger.error(f"❌ Failed to save snapshot: {str(e)}")
+            return False
+        self.logger.info(f"💾 Saved {count} questions to {path}")
+        return True
+    
+    def run_daemon(self, mode: Optional[str] = None, catch_up: bool = True) -> bool:
+        """Keep ranks fresh by re-ranking changed questions until interrupted"""
+        print("🛰️ Starting Survey Answer Ranking Daemon (Ctrl+C to stop)")
+        print("=" * 70)
+        
+        if not self.validate_prerequisites():
+            ProcessorDisplay.print_error("Prerequisites validation failed")
+            return False
+        
+        daemon = RankingDaemon(self.ranking_service, self.db_handler)
+        signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+        try:
+            totals = daemon.run(mode=mode, catch_up=catch_up)
+        except KeyboardInterrupt:
+            daemon.stop()
+            totals = daemon.totals
+        
+        self.logger.info(
+            f"🏁 Daemon stopped: {totals['batches']} batches, "
+            f"{totals['questions_reranked']} questions re-ranked, {totals['updated_count']} updated"
+        )
+        return True
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Survey answer ranking processor")
+    parser.add_argument("--publish", action="store_true",
+                        help="after ranking, publish the ranked questions to the final endpoint")
+    parser.add_argument("--force-publish", action="store_true",
+                        help="with --publish, publish even if the payload is unchanged since the last publish")
+    parser.add_argument("--daemon", action="store_true",
+                        help="run continuously, re-ranking only questions whose answers change")
+    parser.add_argument("--daemon-mode", choices=["auto", "change_stream", "poll"], default=None,
+                        help="change detection for --daemon (default: DAEMON_MODE, auto)")
+    parser.add_argument("--no-catch-up", action="store_true",
+                        help="with --daemon, skip the initial full ranking pass")
+    parser.add_argument("--profile", action="store_true",
+                        help="run under cProfile and tracemalloc and print the top functions and per-stage peak memory")
+    parser.add_argument("--profile-dir", default=None,
+                        help="with --profile, where to write the pstats dump (default: PROFILE_DIR)")
+    parser.add_argument("--profile-sort", choices=["cumulative", "tottime", "ncalls"], default="cumulative",
+                        help="with --profile, how to order the top functions")
+    parser.add_argument("--input", metavar="PATH", default=None,
+                        help="rank a local snapshot (JSON or NDJSON, optionally .gz) instead of the backend")
+    parser.add_argument("--output", metavar="PATH", default=None,
+                        help="with --input, write the ranked question bank here (.ndjson/.jsonl or .json, optionally .gz)")
+    parser.add_argument("--plan", metavar="PATH", default=None,
+                        help="with --input, write the update plan (NDJSON) here")
+    parser.add_argument("--apply-plan", metavar="PATH", default=None,
+                        help="write an update plan from an offline run to the backend")
+    parser.add_argument("--save-snapshot", metavar="PATH", default=None,
+                        help="download the question bank into a snapshot file for --input")
+    parser.add_argument("--category", default=None,
+                        help="rank only questions of this questionCategory (case-insensitive)")
+    parser.add_argument("--level", default=None,
+                        help="rank only questions of this questionLevel (case-insensitive)")
+    parser.add_argument("--question-ids", metavar="ID,ID,...", default=None,
+                        help="rank only these questions (comma-separated questionIDs)")
+    args = parser.parse_args(argv)
+    args.partition = Partition.from_mapping({"category": args.category, "level": args.level,
+                                             "ids": args.question_ids})
+    if (args.output or args.plan) and not args.input:
+        parser.error("--output and --plan need --input")
+    if args.input and (args.publish or args.force_publish or args.daemon):
+        parser.error("--input cannot be combined with --publish or --daemon")
+    if sum(bool(x) for x in (args.input, args.apply_plan, args.save_snapshot, args.daemon)) > 1:
+        parser.error("--input, --apply-plan, --save-snapshot and --daemon are separate modes")
+    if not args.partition.empty and (args.daemon or args.apply_plan):
+        parser.error("--category, --level and --question-ids cannot be combined with --daemon or --apply-plan")
+    if not args.partition.empty and args.output:
+        parser.error("--output writes the whole bank and cannot be combined with a partition (use --plan)")
+    return args
 
 
-def main() -> bool:
+def main(argv: Optional[List[str]] = None) -> bool:
     """Main function, entry point for ranking processor"""
-    processor = RankingProcessor()
-    return processor.run()
+    args = parse_args(argv)
+    profiler = RunProfiler(output_dir=args.profile_dir, sort=args.profile_sort) if args.profile else None
+    processor = RankingProcessor(profiler=profiler)
+    if args.input:
+        return processor.run_offline(args.input, output_path=args.output, plan_path=args.plan,
+                                     partition=args.partition)
+    if args.apply_plan:
+        return processor.run_apply_plan(args.apply_plan)
+    if args.save_snapshot:
+        return processor.run_save_snapshot(args.save_snapshot, partition=args.partition)
+    if args.daemon:
+        return processor.run_daemon(mode=args.daemon_mode, catch_up=not args.no_catch_up)
+    return processor.run(publish=args.publish or args.force_publish, force_publish=args.force_publish,
+                         partition=args.partition)
 
 
 if __name__ == "__main__":
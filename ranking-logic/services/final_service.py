@@ -2,17 +2,44 @@
 Final Service - Handles GET, DELETE, then POST for Input questions with 3+ correct answers
 """
 
+import hashlib
 import json
 import logging
-from typing import List, Dict, Tuple
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from config.settings import Config
 from utils.api_handler import APIHandler
 from utils.data_formatters import QuestionFormatter
+from utils.metrics import STAGE_SECONDS
+from utils.partition import ALL, Partition
 from utils.response_processor import ResponseProcessor
-from constants import QuestionFields, AnswerFields, APIKeys
+from utils.run_events import RunEvents, NULL_EVENTS
+from database.final_store import build_final_documents, create_final_store, new_version
+from constants import QuestionFields, AnswerFields, APIKeys, HTTPStatus
 
 logger = logging.getLogger('survey_analytics')
 
+_ENVELOPE_BYTES = len(json.dumps({APIKeys.QUESTIONS: []}).encode())
+_MIN_PAYLOAD_BYTES = 1024
+
+
+class _PayloadBudget:
+    """Byte budget for request bodies during one publish; a 413 lowers it for the rest of that publish"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+    
+    def lower(self, rejected_size: int) -> int:
+        with self._lock:
+            self.limit = max(_MIN_PAYLOAD_BYTES, min(self.limit, rejected_size // 2))
+            return self.limit
+
 
 class FinalEndpointHandler:
     """Handles API communication with the /final endpoint - GET, DELETE, and POST"""
@@ -23,13 +50,33 @@ class FinalEndpointHandler:
             api_key=Config.API_KEY,
             endpoint="/api/v1/admin/survey/final"
         )
+        self.max_payload_bytes = Config.FINAL_MAX_PAYLOAD_BYTES
+        self.max_workers = Config.FINAL_MAX_WORKERS
+        self._session = threading.local()
+    
+    @contextmanager
+    def publish_session(self):
+        """
+        One publish (on this thread): the chunk budget starts at max_payload_bytes, and a budget
+        lowered by a 413 is kept for every later request of the same publish, then dropped
+        """
+        self._session.budget = _PayloadBudget(self.max_payload_bytes)
+        try:
+            yield self._session.budget
+        finally:
+            self._session.budget = None
+    
+    def _current_budget(self) -> _PayloadBudget:
+        return getattr(self._session, "budget", None) or _PayloadBudget(self.max_payload_bytes)
     
     def get_existing_questions(self) -> List[Dict]:
         """GET existing questions from final endpoint"""
         try:
             logger.info("📥 Getting existing questions from final endpoint")
             
+            start = time.perf_counter()
             response = self.api.make_request("GET")
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="final_get")
             
             # Extract questions from response
             questions = ResponseProcessor.extract_questions_from_response(response)
@@ -46,73 +93,162 @@ class FinalEndpointHandler:
                 logger.error(f"❌ Failed to get existing questions from final endpoint: {str(e)}")
                 raise
     
-    def delete_existing_questions(self, existing_questions: List[Dict]) -> bool:
+    def delete_existing_questions(self, existing_questions: List[Dict]) -> Dict:
         """DELETE existing questions from final endpoint"""
-        try:
-            if not existing_questions:
-                logger.info("⏭️ No existing questions to delete")
-                return True
-            
-            logger.info(f"🗑️ Deleting {len(existing_questions)} existing questions from final endpoint")
-            
-            # Build delete payload using _id from GET response as questionID
-            delete_payload = {
-                "questions": [
-                    {"questionID": question.get("_id")} 
-                    for question in existing_questions 
-                    if question.get("_id")
-                ]
-            }
-            
-            if not delete_payload["questions"]:
-                logger.warning("⚠️ No valid question IDs found for deletion")
-                return True
-            
-            logger.debug(f"DELETE payload: {json.dumps(delete_payload, indent=2)}")
-            
-            response = self.api.make_request("DELETE", delete_payload)
-            
-            if ResponseProcessor.is_success_response(response):
-                logger.info(f"✅ Successfully deleted {len(delete_payload['questions'])} questions from final endpoint")
-                return True
-            else:
-                error_msg = response.get(APIKeys.MESSAGE, str(response))
-                logger.error(f"❌ Failed to delete questions from final endpoint: {error_msg}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"❌ Exception deleting questions from final endpoint: {str(e)}")
-            return False
+        if not existing_questions:
+            logger.info("⏭️ No existing questions to delete")
+            return self._empty_stats()
+        
+        # Build delete payload using _id from GET response as questionID
+        question_ids = [q.get("_id") for q in existing_questions if q.get("_id")]
+        if not question_ids:
+            logger.warning("⚠️ No valid question IDs found for deletion")
+            return self._empty_stats()
+        return self.delete_questions_by_ids(question_ids)
+    
+    def delete_questions_by_ids(self, question_ids: List[str]) -> Dict:
+        """DELETE the given final question ids"""
+        if not question_ids:
+            logger.debug("⏭️ Nothing to delete from final endpoint")
+            return self._empty_stats()
+        
+        logger.info(f"🗑️ Deleting {len(question_ids)} existing questions from final endpoint")
+        stats = self._send_in_chunks("DELETE", [{"questionID": qid} for qid in question_ids])
+        self._log_stats("deleted", stats)
+        return stats
+    
+    def put_questions(self, formatted_questions: List[Dict]) -> Dict:
+        """PUT already formatted questions (with questionID and answerIDs) to the final endpoint"""
+        if not formatted_questions:
+            return self._empty_stats()
+        
+        logger.info(f"✏️ PUTting {len(formatted_questions)} changed questions to final endpoint")
+        stats = self._send_in_chunks("PUT", formatted_questions)
+        self._log_stats("updated", stats)
+        return stats
     
-    def post_questions(self, questions: List[Dict]) -> bool:
+    def post_questions(self, questions: List[Dict]) -> Dict:
         """POST questions to the final endpoint"""
+        if not questions:
+            logger.warning("No questions to POST to final endpoint")
+            return self._empty_stats()
+        
+        # Format questions for API
+        formatted_questions = [self._format_question_for_final_api(q) for q in questions]
+        return self.post_formatted_questions(formatted_questions)
+    
+    def post_formatted_questions(self, formatted_questions: List[Dict]) -> Dict:
+        """POST questions already shaped by _format_question_for_final_api"""
+        if not formatted_questions:
+            return self._empty_stats()
+        
+        logger.info(f"📤 POSTing {len(formatted_questions)} questions to final endpoint")
+        
+        # DEBUG: Log the payload structure
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("POST payload structure: %s...",
+                         json.dumps(formatted_questions[:1], indent=2, default=str)[:500])
+        
+        stats = self._send_in_chunks("POST", formatted_questions)
+        self._log_stats("posted", stats)
+        return stats
+    
+    # ---- chunked transport -------------------------------------------------
+    
+    @staticmethod
+    def _empty_stats(total: int = 0) -> Dict:
+        return {"total": total, "sent": 0, "failed": 0, "chunks": 0, "failed_chunks": 0, "retries_413": 0}
+    
+    @staticmethod
+    def _merge_stats(into: Dict, other: Dict) -> Dict:
+        for key in ("sent", "failed", "chunks", "failed_chunks", "retries_413"):
+            into[key] += other[key]
+        return into
+    
+    @staticmethod
+    def _log_stats(verb: str, stats: Dict) -> None:
+        if stats["failed"]:
+            logger.error(
+                f"❌ Final endpoint: {stats['sent']}/{stats['total']} {verb}, {stats['failed']} failed "
+                f"({stats['failed_chunks']}/{stats['chunks']} chunks failed, {stats['retries_413']} 413 splits)"
+            )
+        else:
+            logger.info(f"✅ Successfully {verb} {stats['sent']} questions in {stats['chunks']} chunks")
+    
+    @staticmethod
+    def _pack_by_bytes(items: List[Dict], budget: int) -> List[Tuple[List[Dict], int]]:
+        """Greedily pack items into chunks whose JSON body stays under the byte budget"""
+        chunks = []
+        current, current_bytes = [], _ENVELOPE_BYTES
+        for item in items:
+            size = len(json.dumps(item, default=str).encode()) + 2  # ", " separator
+            if current and current_bytes + size > budget:
+                chunks.append((current, current_bytes))
+                current, current_bytes = [], _ENVELOPE_BYTES
+            current.append(item)
+            current_bytes += size
+        if current:
+            chunks.append((current, current_bytes))
+        return chunks
+    
+    def _send_in_chunks(self, method: str, items: List[Dict]) -> Dict:
+        """Send `items` as {"questions": [...]} bodies under the byte budget, a few chunks at a time"""
+        stats = self._empty_stats(len(items))
+        start = time.perf_counter()
+        budget = self._current_budget()
+        chunks = self._pack_by_bytes(items, budget.limit)
+        workers = max(1, min(self.max_workers, len(chunks)))
+        
+        if workers == 1:
+            for chunk, size in chunks:
+                self._merge_stats(stats, self._send_chunk(method, chunk, size, budget))
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="final-api") as pool:
+                futures = [pool.submit(self._send_chunk, method, chunk, size, budget) for chunk, size in chunks]
+                for future in futures:
+                    self._merge_stats(stats, future.result())
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=f"final_{method.lower()}")
+        return stats
+    
+    def _send_chunk(self, method: str, chunk: List[Dict], size: int, budget: _PayloadBudget) -> Dict:
+        """Send one chunk; on 413 lower the publish's budget and resend it as two halves"""
+        stats = self._empty_stats(len(chunk))
+        stats["chunks"] = 1
+        payload = {APIKeys.QUESTIONS: chunk}
         try:
-            if not questions:
-                logger.warning("No questions to POST to final endpoint")
-                return True
-            
-            logger.info(f"📤 POSTing {len(questions)} questions to final endpoint")
-            
-            # Format questions for API
-            formatted_questions = [self._format_question_for_final_api(q) for q in questions]
-            payload = {APIKeys.QUESTIONS: formatted_questions}
-            
-            # DEBUG: Log the payload structure
-            logger.debug(f"POST payload structure: {json.dumps(payload, indent=2, default=str)[:500]}...")
-            
-            response = self.api.make_request("POST", payload)
-            
-            if ResponseProcessor.is_success_response(response):
-                logger.info(f"✅ Successfully posted {len(questions)} questions to final endpoint")
-                return True
+            if method == "POST":
+                response = self.api.post(json=payload)
+            elif method == "PUT":
+                response = self.api.put(json=payload)
             else:
-                error_msg = response.get(APIKeys.MESSAGE, str(response))
-                logger.error(f"❌ Failed to post questions to final endpoint: {error_msg}")
-                return False
-                
+                response = self.api.delete(json=payload)
         except Exception as e:
-            logger.error(f"❌ Exception posting questions to final endpoint: {str(e)}")
-            return False
+            logger.error("❌ Exception sending %s chunk of %d to final endpoint: %s", method, len(chunk), e)
+            stats["failed"] = len(chunk)
+            stats["failed_chunks"] = 1
+            return stats
+        
+        status = response.status_code
+        if status == HTTPStatus.PAYLOAD_TOO_LARGE and len(chunk) > 1:
+            limit = budget.lower(size)
+            logger.info("📉 413 for %d questions (%d bytes) - splitting, budget now %d bytes for this publish",
+                        len(chunk), size, limit)
+            mid = len(chunk) // 2
+            halves = self._empty_stats(len(chunk))
+            for part in (chunk[:mid], chunk[mid:]):
+                part_size = _ENVELOPE_BYTES + sum(len(json.dumps(i, default=str).encode()) + 2 for i in part)
+                self._merge_stats(halves, self._send_chunk(method, part, part_size, budget))
+            halves["retries_413"] += 1
+            return halves
+        
+        # 409 on POST: every question already exists; 404 on DELETE: already gone
+        if response.ok or (method == "POST" and status == HTTPStatus.CONFLICT) \
+                or (method == "DELETE" and status == HTTPStatus.NOT_FOUND):
+            stats["sent"] = len(chunk)
+        else:
+            stats["failed"] = len(chunk)
+            stats["failed_chunks"] = 1
+        return stats
     
     def _format_question_for_final_api(self, question: Dict) -> Dict:
         """Format question for final endpoint API submission"""
@@ -179,16 +315,332 @@ class AnswerFilter:
         return filtered_question
 
 
+def _norm(value) -> str:
+    return str(value or "").strip().lower()
+
+
+class FinalDeltaPlanner:
+    """
+    Diffs the desired final set against what the final endpoint currently holds.
+
+    Final questions get fresh ids when they are POSTed, so they are matched to their source
+    question by the same identity the backend uses for duplicates:
+    (question text, type, category, level), compared case-insensitively.
+    """
+    
+    @staticmethod
+    def question_key(question: Dict) -> Tuple[str, str, str, str]:
+        return (
+            _norm(question.get(QuestionFields.QUESTION)),
+            _norm(question.get(QuestionFields.QUESTION_TYPE)),
+            _norm(question.get(QuestionFields.QUESTION_CATEGORY)),
+            _norm(question.get(QuestionFields.QUESTION_LEVEL)),
+        )
+    
+    @staticmethod
+    def _answers_state(question: Dict) -> List[Tuple]:
+        # PUT stores answer text lowercased, so compare that way to avoid perpetual updates
+        return sorted(
+            (
+                _norm(a.get(AnswerFields.ANSWER)),
+                int(a.get(AnswerFields.RESPONSE_COUNT) or 0),
+                bool(a.get(AnswerFields.IS_CORRECT)),
+                int(a.get(AnswerFields.RANK) or 0),
+                int(a.get(AnswerFields.SCORE) or 0),
+            )
+            for a in question.get(QuestionFields.ANSWERS) or []
+        )
+    
+    @staticmethod
+    def _counters(question: Dict) -> Tuple[int, int]:
+        return (
+            int(question.get(QuestionFields.TIMES_SKIPPED) or 0),
+            int(question.get(QuestionFields.TIMES_ANSWERED) or 0),
+        )
+    
+    @staticmethod
+    def _as_update(desired: Dict, existing: Dict) -> Dict:
+        """PUT body for `existing`, reusing its answer ids where the answer text matches"""
+        existing_answer_ids = {
+            _norm(a.get(AnswerFields.ANSWER)): a.get(AnswerFields.ID)
+            for a in existing.get(QuestionFields.ANSWERS) or []
+        }
+        update = dict(desired)
+        update[QuestionFields.QUESTION_ID] = existing.get(QuestionFields.ID)
+        update[QuestionFields.ANSWERS] = [
+            dict(a, **{AnswerFields.ANSWER_ID: existing_answer_ids.get(_norm(a.get(AnswerFields.ANSWER))) or str(uuid.uuid4())})
+            for a in desired.get(QuestionFields.ANSWERS) or []
+        ]
+        return update
+    
+    def plan(self, desired: List[Dict], existing: List[Dict]) -> Dict:
+        """
+        desired: questions formatted for the final API
+        existing: questions returned by GET on the final endpoint
+        Returns inserts (formatted), updates (PUT bodies), delete_ids,
+        replacements (formatted, re-POSTed after their old copy is deleted) and an unchanged count.
+        """
+        existing_by_key: Dict[Tuple, Dict] = {}
+        delete_ids: List[str] = []
+        for question in existing:
+            key = self.question_key(question)
+            if key in existing_by_key:
+                # Duplicate final copy of the same source question - drop the extra
+                delete_ids.append(question.get(QuestionFields.ID))
+            else:
+                existing_by_key[key] = question
+        
+        inserts, updates, replacements = [], [], []
+        unchanged = 0
+        seen = set()
+        for question in desired:
+            key = self.question_key(question)
+            if key in seen:
+                continue  # the backend would reject the second copy as a duplicate
+            seen.add(key)
+            
+            current = existing_by_key.pop(key, None)
+            if current is None:
+                inserts.append(question)
+                continue
+            
+            same_counters = self._counters(question) == self._counters(current)
+            if same_counters and self._answers_state(question) == self._answers_state(current):
+                unchanged += 1
+            elif same_counters:
+                updates.append(self._as_update(question, current))
+            else:
+                # PUT cannot change timesSkipped/timesAnswered, so re-create the question
+                delete_ids.append(current.get(QuestionFields.ID))
+                replacements.append(question)
+        
+        # Final questions whose source no longer qualifies
+        delete_ids.extend(q.get(QuestionFields.ID) for q in existing_by_key.values())
+        
+        return {
+            "inserts": inserts,
+            "updates": updates,
+            "replacements": replacements,
+            "delete_ids": [qid for qid in delete_ids if qid],
+            "unchanged": unchanged,
+        }
+
+
+class PublishState:
+    """
+    Remembers the payload hash of the last successful publish in a small JSON file, keyed
+    by publish target (see _key) so switching backends or FINAL_PUBLISH_MODE never reuses a
+    hash recorded for another target. An empty path keeps the state in memory only.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory: Dict[str, Dict] = {}
+    
+    def _read(self) -> Dict[str, Dict]:
+        if not self.path:
+            return dict(self._memory)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable publish state {self.path}: {str(e)}")
+            return {}
+    
+    def _write(self, state: Dict[str, Dict]) -> None:
+        if not self.path:
+            self._memory = state
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not persist publish state to {self.path}: {str(e)}")
+    
+    @staticmethod
+    def _key() -> str:
+        """
+        The final set a publish writes: the REST endpoint of API_BASE_URL (delta and replace
+        both converge on it) or, with staged, the versioned collection (URI without credentials)
+        """
+        if Config.FINAL_PUBLISH_MODE == "staged":
+            host = (Config.MONGO_URI or "").rsplit("@", 1)[-1].split("/")[0]
+            return f"staged:{host}/{Config.MONGO_DB_NAME}.{Config.MONGO_FINAL_COLLECTION}"
+        return Config.API_BASE_URL or ""
+    
+    def last_hash(self) -> str:
+        with self._lock:
+            return (self._read().get(self._key()) or {}).get("payload_hash", "")
+    
+    def save(self, payload_hash: str, question_count: int) -> None:
+        with self._lock:
+            state = self._read()
+            state[self._key()] = {
+                "payload_hash": payload_hash,
+                "question_count": question_count,
+                "published_at": time.time(),
+            }
+            self._write(state)
+    
+    def clear(self) -> None:
+        with self._lock:
+            state = self._read()
+            if state.pop(self._key(), None) is not None:
+                self._write(state)
+
+
 class FinalService:
     """Main service for handling final endpoint GET, DELETE, and POST operations"""
     
-    def __init__(self, db_handler):
+    def __init__(self, db_handler, final_store=None):
         self.db = db_handler
+        self.final_store = final_store  # FINAL_PUBLISH_MODE=staged; created on first use
         self.final_api = FinalEndpointHandler()
         self.validator = QuestionValidator()
         self.answer_filter = AnswerFilter()
+        self.delta_planner = FinalDeltaPlanner()
+        self.publish_state = PublishState(Config.FINAL_PUBLISH_STATE_FILE)
+    
+    def rank_and_publish(self, ranking_service, force: bool = False, events: Optional[RunEvents] = None,
+                         partition: Partition = ALL) -> Dict:
+        """
+        Rank, write ranks back, then publish the freshly ranked questions straight from memory.
+        Falls back to re-fetching the bank when some ranking writes failed.
+        With a partition only its questions are ranked, but the whole bank is published (from a
+        re-fetch): publishing a slice would delete every other question from the final set.
+        """
+        events = events or NULL_EVENTS
+        ranking_stats, current_questions = ranking_service.process_for_publish(events=events, partition=partition)
+        
+        if not partition.empty:
+            logger.info(f"🔄 Ranked partition {partition.key} - re-fetching the bank to publish it whole")
+            final_result = self.publish_from_source(force=force, events=events)
+            publish_source = "refetch"
+        elif current_questions is None:
+            logger.warning("⚠️ Some ranking writes failed - re-fetching questions before publishing")
+            final_result = self.publish_from_source(force=force, events=events)
+            publish_source = "refetch"
+        elif not current_questions:
+            logger.warning("⚠️ No questions found in main bank - nothing published")
+            final_result = self._no_source_result()
+            publish_source = "memory"
+        else:
+            logger.info(f"♻️ Publishing {len(current_questions)} in-memory ranked questions (no re-fetch)")
+            final_result = self.post_to_final_endpoint(current_questions, force=force, events=events)
+            publish_source = "memory"
+        
+        return {"ranking": ranking_stats, "final": final_result, "publish_source": publish_source}
     
-    def post_to_final_endpoint(self, main_questions: List[Dict]) -> Dict:
+    def publish_from_source(self, force: bool = False, events: Optional[RunEvents] = None) -> Dict:
+        """
+        Fetch the main bank and publish it. When a publish is expected (force, or no payload
+        hash recorded yet) the final set is fetched at the same time on a worker thread, so the
+        two reads cost roughly the slower of them instead of their sum. Otherwise the final set is
+        only fetched once the payload turns out to have changed, so an unchanged scheduled run
+        makes no request to the final endpoint at all.
+        An empty main bank publishes nothing, so a bad fetch can never wipe the final set.
+        """
+        events = events or NULL_EVENTS
+        prefetch = Config.FINAL_PUBLISH_MODE != "staged" and (force or not self.publish_state.last_hash())
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="final-prefetch") if prefetch else None
+        existing = pool.submit(self.final_api.get_existing_questions) if pool else None
+        try:
+            with events.stage("fetch"):
+                main_questions = self.db.fetch_all_questions()
+            events.emit("fetched", count=len(main_questions))
+            
+            if not main_questions:
+                logger.warning("⚠️ No questions found in main bank - nothing published")
+                return self._no_source_result()
+            
+            return self.post_to_final_endpoint(main_questions, force=force, existing=existing, events=events)
+        finally:
+            if pool is not None:
+                # Never wait for a prefetch nobody used (a GET already in flight finishes on its own)
+                existing.cancel()
+                pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _no_source_result(self) -> Dict:
+        """Result of a publish that sent nothing because the main bank came back empty"""
+        empty = self.final_api._empty_stats
+        result = self._create_result_with_deletion({}, empty(), empty())
+        result['status'] = 'no_source_questions'
+        return result
+    
+    def post_to_final_endpoint(self, main_questions: List[Dict], force: bool = False,
+                               existing: Optional[Future] = None, events: Optional[RunEvents] = None) -> Dict:
+        """
+        Publish main questions to the final endpoint.
+        FINAL_PUBLISH_MODE=delta only sends what changed; replace re-creates the whole set.
+        When the formatted payload hashes the same as the last successful publish, nothing is
+        sent at all and the result status is "skipped_unchanged" (force=True publishes anyway).
+        existing: optional future already fetching the current final set
+        """
+        events = events or NULL_EVENTS
+        with events.stage("prepare"):
+            valid_questions = self._filter_and_process_questions(main_questions)
+            desired = [self.final_api._format_question_for_final_api(q) for q in valid_questions['questions_to_post']]
+            payload_hash = self.payload_hash(desired)
+        
+        if not force and payload_hash == self.publish_state.last_hash():
+            logger.info(f"⏭️ Final payload unchanged since last publish ({payload_hash[:12]}) - skipping")
+            empty = self.final_api._empty_stats
+            result = self._create_result_with_deletion(valid_questions, empty(), empty())
+            result.update({'status': 'skipped_unchanged', 'payload_hash': payload_hash})
+            return result
+        
+        with events.stage("publish", mode=Config.FINAL_PUBLISH_MODE), self.final_api.publish_session():
+            if Config.FINAL_PUBLISH_MODE == "replace":
+                result = self._replace(valid_questions, desired, existing)
+            elif Config.FINAL_PUBLISH_MODE == "staged":
+                result = self._staged(valid_questions, desired)
+            else:
+                result = self._sync(valid_questions, desired, existing)
+        
+        if result['post_success'] and result['delete_success']:
+            self.publish_state.save(payload_hash, len(desired))
+            result['status'] = 'published'
+        else:
+            # Unknown final state: make sure the next run publishes again
+            self.publish_state.clear()
+            result['status'] = 'failed'
+        result['payload_hash'] = payload_hash
+        return result
+    
+    @staticmethod
+    def payload_hash(formatted_questions: List[Dict]) -> str:
+        """Order-insensitive sha256 of the formatted final payload"""
+        rows = sorted(json.dumps(q, sort_keys=True, separators=(",", ":"), default=str) for q in formatted_questions)
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update(row.encode())
+            digest.update(b"\n")
+        return digest.hexdigest()
+    
+    def replace_final_questions(self, main_questions: List[Dict]) -> Dict:
+        """GET → DELETE all → POST all, regardless of FINAL_PUBLISH_MODE and the last publish hash"""
+        valid_questions = self._filter_and_process_questions(main_questions)
+        desired = [self.final_api._format_question_for_final_api(q) for q in valid_questions['questions_to_post']]
+        return self._replace(valid_questions, desired)
+    
+    def sync_final_questions(self, main_questions: List[Dict]) -> Dict:
+        """Delta sync regardless of FINAL_PUBLISH_MODE and the last publish hash"""
+        valid_questions = self._filter_and_process_questions(main_questions)
+        desired = [self.final_api._format_question_for_final_api(q) for q in valid_questions['questions_to_post']]
+        return self._sync(valid_questions, desired)
+    
+    def _existing_questions(self, existing: Optional[Future]) -> List[Dict]:
+        """Current final set, from the prefetch when one is running"""
+        if existing is not None:
+            return existing.result()
+        return self.final_api.get_existing_questions()
+    
+    def _replace(self, valid_questions: Dict, desired: List[Dict], existing: Optional[Future] = None) -> Dict:
         """
         Complete flow: GET existing questions, DELETE them, then POST new questions
         Only processes Input questions with 3+ correct answers
@@ -198,40 +650,124 @@ class FinalService:
             logger.info("🎯 Starting final endpoint operation: GET → DELETE → POST")
             
             # Step 1: GET existing questions from final endpoint
-            existing_questions = self.final_api.get_existing_questions()
+            existing_questions = self._existing_questions(existing)
             
             # Step 2: DELETE existing questions if any found
             if existing_questions:
-                delete_success = self.final_api.delete_existing_questions(existing_questions)
-                if not delete_success:
+                delete_stats = self.final_api.delete_existing_questions(existing_questions)
+                if delete_stats["failed"]:
                     logger.error("❌ Failed to delete existing questions - aborting POST")
-                    return self._create_result_with_deletion({}, False, 0, len(existing_questions), False)
+                    return self._create_result_with_deletion({}, self.final_api._empty_stats(), delete_stats)
             else:
+                delete_stats = self.final_api._empty_stats()
                 logger.info("⏭️ No existing questions to delete - proceeding to POST")
             
-            # Step 3: Process and filter new questions for POST
-            valid_questions = self._filter_and_process_questions(main_questions)
-            
-            if not valid_questions['questions_to_post']:
+            if not desired:
                 logger.warning("No valid questions to POST to final endpoint")
-                return self._create_result_with_deletion(valid_questions, True, 0, len(existing_questions), True)
+                return self._create_result_with_deletion(valid_questions, self.final_api._empty_stats(), delete_stats)
             
-            # Step 4: Execute POST operation
-            post_success = self.final_api.post_questions(valid_questions['questions_to_post'])
+            # Step 3: Execute POST operation
+            post_stats = self.final_api.post_formatted_questions(desired)
             
             # Compile result
-            return self._create_result_with_deletion(
-                valid_questions, 
-                post_success, 
-                len(valid_questions['questions_to_post']), 
-                len(existing_questions),
-                len(existing_questions) == 0 or delete_success
-            )
+            return self._create_result_with_deletion(valid_questions, post_stats, delete_stats)
             
         except Exception as e:
             logger.error(f"❌ Final endpoint operation failed: {str(e)}")
             raise
     
+    def _sync(self, valid_questions: Dict, desired: List[Dict], existing: Optional[Future] = None) -> Dict:
+        """
+        Delta flow: GET existing questions, diff them against the desired set, then
+        DELETE stale ones, POST new ones and PUT changed ones. Unchanged questions are not touched,
+        so the final collection never goes empty and the work scales with the size of the change.
+        """
+        try:
+            logger.info("🎯 Starting final endpoint delta sync: GET → diff → DELETE/POST/PUT")
+            
+            existing_questions = self._existing_questions(existing)
+            
+            plan = self.delta_planner.plan(desired, existing_questions)
+            logger.info(
+                f"🧮 Final delta: {len(plan['inserts'])} new, {len(plan['updates'])} changed, "
+                f"{len(plan['replacements'])} re-created, {len(plan['delete_ids'])} to delete, "
+                f"{plan['unchanged']} unchanged"
+            )
+            
+            empty = self.final_api._empty_stats
+            
+            # DELETE first so re-created questions don't collide with their old copy
+            delete_stats = self.final_api.delete_questions_by_ids(plan['delete_ids'])
+            if delete_stats["failed"]:
+                logger.error("❌ Failed to delete stale questions - aborting POST/PUT")
+                result = self._create_result_with_deletion(valid_questions, empty(), delete_stats)
+                result.update(self._delta_counts(plan, empty(), empty(), empty()))
+                return result
+            
+            insert_stats = self.final_api.post_formatted_questions(plan['inserts'])
+            replace_stats = self.final_api.post_formatted_questions(plan['replacements'])
+            put_stats = self.final_api.put_questions(plan['updates'])
+            
+            post_stats = self.final_api._merge_stats(dict(insert_stats), replace_stats)
+            post_stats["total"] += replace_stats["total"]
+            result = self._create_result_with_deletion(valid_questions, post_stats, delete_stats, put_stats)
+            result.update(self._delta_counts(plan, insert_stats, replace_stats, put_stats))
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Final endpoint delta sync failed: {str(e)}")
+            raise
+    
+    def _staged(self, valid_questions: Dict, desired: List[Dict]) -> Dict:
+        """
+        Blue/green flow: stage the complete new set as a new version, then switch readers to it
+        in one step. The active version is never emptied or partially written.
+        """
+        if self.final_store is None:
+            self.final_store = create_final_store()
+        
+        version = new_version()
+        documents = build_final_documents(desired)
+        empty = self.final_api._empty_stats
+        logger.info(f"🎯 Starting staged final publish: version {version} ({len(documents)} questions)")
+        
+        try:
+            staged = self.final_store.stage(version, documents)
+            switch = self.final_store.activate(version)
+        except Exception as e:
+            logger.error(f"❌ Staged publish of version {version} failed - active version unchanged: {str(e)}")
+            try:
+                self.final_store.discard(version)
+            except Exception as cleanup_error:
+                logger.warning(f"⚠️ Could not discard staged version {version}: {str(cleanup_error)}")
+            failed = empty(len(documents))
+            failed.update({"failed": len(documents), "chunks": 1, "failed_chunks": 1})
+            result = self._create_result_with_deletion(valid_questions, failed, empty())
+            result.update({'publish_mode': 'staged', 'version': None})
+            return result
+        
+        post_stats = empty(staged)
+        post_stats.update({"sent": staged, "chunks": 1})
+        replaced_stats = empty(switch["previous_count"])
+        replaced_stats["sent"] = switch["previous_count"]
+        result = self._create_result_with_deletion(valid_questions, post_stats, replaced_stats)
+        result.update({
+            'publish_mode': 'staged',
+            'version': version,
+            'previous_version': switch["previous_version"],
+        })
+        return result
+    
+    @staticmethod
+    def _delta_counts(plan: Dict, insert_stats: Dict, replace_stats: Dict, put_stats: Dict) -> Dict:
+        return {
+            'publish_mode': 'delta',
+            'questions_inserted': insert_stats['sent'],
+            'questions_updated': put_stats['sent'],
+            'questions_replaced': replace_stats['sent'],
+            'questions_unchanged': plan['unchanged'],
+        }
+    
     def _filter_and_process_questions(self, main_questions: List[Dict]) -> Dict:
         """Filter and process questions for final endpoint"""
         questions_to_post = []
@@ -244,7 +780,7 @@ class FinalService:
 
             #MCQ: send directly to finalQuestions without ranking/validation
             if question_type == "mcq":
-                logger.debug(f"✅ Passing MCQ question {question_id} directly to final")
+                logger.debug("✅ Passing MCQ question %s directly to final", question_id)
                 questions_to_post.append(question)
                 # we *do* stay inside the loop, just move to next question
                 continue
@@ -254,10 +790,10 @@ class FinalService:
 
             if not is_valid:
                 if "at least" in validation_msg.lower():
-                    logger.error(f"❌ Question {question_id}: {validation_msg}")
+                    logger.error("❌ Question %s: %s", question_id, validation_msg)
                     skipped_insufficient += 1
                 else:
-                    logger.debug(f"⏭️ Question {question_id}: {validation_msg}")
+                    logger.debug("⏭️ Question %s: %s", question_id, validation_msg)
                 continue
 
             #Filter to only correct answers for Input questions
@@ -282,15 +818,21 @@ class FinalService:
 
 
     
-    def _create_result_with_deletion(self, filter_result: Dict, post_success: bool, posted_count: int, deleted_count: int, delete_success: bool) -> Dict:
-        """Create result dictionary including deletion information"""
+    def _create_result_with_deletion(self, filter_result: Dict, post_stats: Dict, delete_stats: Dict, put_stats: Dict = None) -> Dict:
+        """Create result dictionary including deletion information and per-chunk accounting"""
+        put_stats = put_stats or self.final_api._empty_stats()
+        operations = (post_stats, delete_stats, put_stats)
         return {
-            'questions_posted': posted_count if post_success else 0,
-            'questions_failed': posted_count if not post_success else 0,
-            'questions_deleted': deleted_count if delete_success else 0,
+            'questions_posted': post_stats['sent'],
+            'questions_failed': post_stats['failed'] + put_stats['failed'],
+            'questions_deleted': delete_stats['sent'],
+            'delete_failed': delete_stats['failed'],
             'skipped_mcq': filter_result.get('skipped_mcq', 0),
             'skipped_insufficient': filter_result.get('skipped_insufficient', 0),
-            'post_success': post_success,
-            'delete_success': delete_success,
+            'post_success': post_stats['failed'] == 0 and put_stats['failed'] == 0,
+            'delete_success': delete_stats['failed'] == 0,
+            'chunks': sum(op['chunks'] for op in operations),
+            'failed_chunks': sum(op['failed_chunks'] for op in operations),
+            'retries_413': sum(op['retries_413'] for op in operations),
             'total_processed': len(filter_result.get('questions_to_post', [])) + filter_result.get('skipped_mcq', 0) + filter_result.get('skipped_insufficient', 0)
-        }
\ No newline at end of file
+        }
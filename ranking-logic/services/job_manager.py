@@ -0,0 +1,198 @@
+"""
+Job Manager - runs long ranking / publishing operations on a bounded background pool
+"""
+
+import logging
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import Config
+from utils.run_events import RunEvents
+from utils.sampling_profiler import thread_tag
+
+logger = logging.getLogger('survey_analytics')
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class Job:
+    """One background run: state, live progress, per-stage timings and the final result"""
+
+    def __init__(self, job_type: str, follow_up_of: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.state = JOB_QUEUED
+        self.follow_up_of = follow_up_of
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: Dict = {}
+        self.stages: Dict[str, Dict] = {}
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.events = RunEvents()
+        self.events.subscribe(self._on_event)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def _on_event(self, event: Dict) -> None:
+        kind = event["event"]
+        with self._lock:
+            if kind == "stage_start":
+                self.stages[event["stage"]] = {"state": JOB_RUNNING, "started_at": event["ts"]}
+                self.progress["stage"] = event["stage"]
+                self.progress.pop("done", None)
+                self.progress.pop("total", None)
+            elif kind == "stage_end":
+                stage = self.stages.setdefault(event["stage"], {})
+                stage.update({"state": JOB_SUCCEEDED if event.get("ok") else JOB_FAILED,
+                              "duration": event.get("duration")})
+            elif kind == "progress":
+                self.progress.update({"stage": event["stage"], "done": event["done"], "total": event.get("total")})
+            elif kind == "chunk":
+                self.progress.update({"stage": event["stage"], "done": event["done"], "total": event.get("total"),
+                                      "chunks": self.progress.get("chunks", 0) + 1,
+                                      "last_chunk_latency": event.get("latency")})
+            elif kind == "fetched":
+                self.progress["questions_fetched"] = event.get("count")
+
+    def start(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self.state = JOB_RUNNING
+
+    def finish(self, result: Optional[Dict], error: Optional[str] = None) -> None:
+        with self._lock:
+            self.result = result
+            self.error = error
+            failed = error is not None or (result or {}).get("status") == "error"
+            self.state = JOB_FAILED if failed else JOB_SUCCEEDED
+            self.finished_at = time.time()
+        self._done.set()
+        self.events.emit("job_finished", job_id=self.id, state=self.state, error=error)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            data = {
+                "id": self.id,
+                "type": self.type,
+                "state": self.state,
+                "follow_up_of": self.follow_up_of,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed": round(end - (self.started_at or end), 3),
+                "progress": dict(self.progress),
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "error": self.error,
+            }
+            if include_result:
+                data["result"] = self.result
+            return data
+
+
+class JobManager:
+    """
+    Bounded worker pool for background jobs. Submitting a job type that is already queued
+    or running returns the existing job instead of starting a second one. With coalesce=True
+    the submission instead queues one follow-up run that starts when the current one ends;
+    every later submission joins that same follow-up.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_history: Optional[int] = None):
+        self.max_workers = max_workers or Config.JOB_WORKERS
+        self.max_history = max_history or Config.JOB_HISTORY
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active_by_type: Dict[str, Job] = {}
+        self._follow_ups: Dict[str, Tuple[Job, Callable[[RunEvents], Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, fn: Callable[[RunEvents], Dict], coalesce: bool = False) -> Tuple[Job, bool]:
+        """
+        Queue fn(events) as a job of `job_type`.
+        Returns (job, created); created is False when the submission joined an existing job.
+        """
+        with self._lock:
+            pending = self._follow_ups.get(job_type)
+            if pending is not None:
+                logger.info(f"🔁 {job_type} follow-up already queued as job {pending[0].id} - joining it")
+                return pending[0], False
+
+            current = self._active_by_type.get(job_type)
+            if current is not None and current.active:
+                if not coalesce:
+                    logger.info(f"🔁 {job_type} already {current.state} as job {current.id} - not starting another")
+                    return current, False
+                job = Job(job_type, follow_up_of=current.id)
+                self._follow_ups[job_type] = (job, fn)
+                self._jobs[job.id] = job
+                self._prune()
+                logger.info(f"📥 Queued {job_type} follow-up job {job.id} behind {current.id}")
+                return job, True
+
+            job = Job(job_type)
+            self._active_by_type[job_type] = job
+            self._jobs[job.id] = job
+            self._prune()
+
+        logger.info(f"📥 Queued {job_type} job {job.id}")
+        self._pool.submit(self._run, job, fn)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job: Job, fn: Callable[[RunEvents], Dict]) -> None:
+        job.start()
+        logger.info(f"▶️ Running {job.type} job {job.id}")
+        try:
+            with thread_tag(f"job:{job.type}"):
+                result = fn(job.events)
+            job.finish(result)
+        except Exception as e:
+            logger.error(f"❌ {job.type} job {job.id} failed: {str(e)}")
+            logger.debug(traceback.format_exc())
+            job.finish(None, error=str(e))
+        logger.info(f"🏁 {job.type} job {job.id} {job.state} in {job.to_dict(False)['elapsed']}s")
+        self._start_follow_up(job.type)
+
+    def _start_follow_up(self, job_type: str) -> None:
+        with self._lock:
+            pending = self._follow_ups.pop(job_type, None)
+            if pending is None:
+                return
+            job, fn = pending
+            self._active_by_type[job_type] = job
+        self._pool.submit(self._run, job, fn)
+
+    def _prune(self) -> None:
+        """Drop the oldest finished jobs beyond max_history (caller holds the lock)"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
@@ -0,0 +1,183 @@
+"""
+Preview Engine - side-effect-free ranking preview with per-question memoization
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+from config.settings import Config
+from constants import AnswerFields, QuestionFields
+
+logger = logging.getLogger('survey_analytics')
+
+
+def _to_bool(v) -> bool:
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, str):
+        return v.strip().lower() in {"true", "1", "yes", "y"}
+    return bool(v)
+
+
+def _to_int(v) -> int:
+    try:
+        return int(v)
+    except Exception:
+        return 0
+
+
+def _copy_row(row: Dict) -> Dict:
+    """Copy a cached row deep enough that callers cannot change the cache"""
+    out = dict(row)
+    if "clusters" in out:
+        out["clusters"] = [dict(c) for c in out["clusters"]]
+    if "debug" in out:
+        out["debug"] = dict(out["debug"])
+    return out
+
+
+class PreviewEngine:
+    """
+    Builds preview rows without mutating the questions it is given.
+
+    Rankable questions are processed on a shallow view of the question (the merge step
+    builds new answer dicts and ranking only touches those), so neither the question
+    nor its answers are changed or deep-copied. Ranked rows are memoized by a
+    fingerprint of everything that feeds them, so an unchanged bank is served from cache.
+    """
+
+    def __init__(self, question_processor, min_responses: int, cache_size: Optional[int] = None):
+        self.question_processor = question_processor
+        self.min_responses = min_responses
+        self.cache_size = Config.PREVIEW_CACHE_SIZE if cache_size is None else cache_size
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def preview(self, questions: List[Dict], top_n: int = 5) -> List[Dict]:
+        """Preview rows for full questions (answers included)"""
+        results: List[Dict] = []
+
+        for q in questions:
+            qtype = (q.get(QuestionFields.QUESTION_TYPE) or "").lower()
+            answers = q.get(QuestionFields.ANSWERS) or []
+
+            # Mirror skip rules used in your pipeline
+            if qtype == "mcq":
+                results.append(self.skip_row(q, len(answers), "mcq"))
+                continue
+
+            total_correct = sum(_to_int(a.get(AnswerFields.RESPONSE_COUNT, 0))
+                                for a in answers
+                                if _to_bool(a.get(AnswerFields.IS_CORRECT)))
+
+            if total_correct < self.min_responses:
+                # show the correct-responses total here
+                results.append(self.skip_row(q, total_correct, "insufficient"))
+                continue
+
+            results.append(self.ranked_row(q, total_correct, top_n))
+
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _fingerprint(self, q: Dict, total_correct: int, top_n: int) -> str:
+        h = hashlib.blake2b(digest_size=20)
+        h.update(repr((
+            q.get(QuestionFields.ID), q.get(QuestionFields.QUESTION_TYPE), q.get(QuestionFields.QUESTION),
+            q.get("questionText"), q.get("text"),
+            q.get(QuestionFields.QUESTION_LEVEL), q.get("level"),
+            q.get(QuestionFields.QUESTION_CATEGORY), q.get("category"),
+            total_correct, top_n, self.question_processor.similarity.threshold,
+        )).encode())
+        for a in q.get(QuestionFields.ANSWERS) or []:
+            h.update(repr((
+                a.get(AnswerFields.ANSWER), a.get(AnswerFields.IS_CORRECT), a.get(AnswerFields.RESPONSE_COUNT),
+                a.get(AnswerFields.RANK), a.get(AnswerFields.SCORE),
+            )).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def header(q: Dict) -> Dict:
+        return {
+            "questionId": q.get("_id"),
+            "questionType": (q.get("questionType") or "").lower(),
+            "questionLevel": q.get("questionLevel") or q.get("level"),
+            "questionCategory": q.get("questionCategory") or q.get("category"),
+            "text": q.get("questionText") or q.get("question") or q.get("text") or "",
+        }
+
+    def skip_row(self, q: Dict, response_count: int, reason: str) -> Dict:
+        row = self.header(q)
+        row.update({
+            "responseCount": response_count,
+            "rankable": False,
+            "skipReason": reason
+        })
+        return row
+
+    def ranked_row(self, q: Dict, total_correct: int, top_n: int) -> Dict:
+        key = self._fingerprint(q, total_correct, top_n)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return _copy_row(cached)
+            self.misses += 1
+
+        row = self._build_ranked_row(q, total_correct, top_n)
+
+        with self._lock:
+            self._cache[key] = row
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return _copy_row(row)
+
+    def _build_ranked_row(self, q: Dict, total_correct: int, top_n: int) -> Dict:
+        # Reuse the real processing path on a shallow view: process_question only
+        # rebinds view["answers"] to newly merged dicts, so `q` is left untouched
+        view = dict(q)
+        processed_q, meta = self.question_processor.process_question(view)
+
+        # Pull out the “ranked” view from processed_q
+        proc_answers = processed_q.get("answers") or []
+
+        # Keep only positive-ranked clusters/answers and sort by rank asc
+        ranked = [a for a in proc_answers if int(a.get("rank", 0)) > 0]
+        ranked.sort(key=lambda a: int(a.get("rank", 0)))
+
+        top = ranked[:top_n]
+
+        # Preview Cluster Shape, format
+        preview_clusters = [
+            {
+                "value": a.get("normalized") or a.get("answer") or a.get("value"),
+                "original": a.get("answer"),
+                "count": a.get("responseCount") or a.get("count") or 0,
+                "rank": int(a.get("rank", 0)),
+                "score": int(a.get("score", 0)),
+                "isCorrect": bool(a.get("isCorrect", False))
+            }
+            for a in top
+        ]
+
+        row = self.header(q)
+        row.update({
+            "responseCount": total_correct,
+            "rankable": True,
+            "skipReason": None,
+            "clusters": preview_clusters,
+            "debug": {
+                "ranked_cnt": int(meta.get("ranked_cnt", 0)),
+                "scored_cnt": int(meta.get("scored_cnt", 0)),
+            }
+        })
+        return row
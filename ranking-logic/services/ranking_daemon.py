@@ -0,0 +1,200 @@
+"""
+Ranking Daemon - keeps answer ranks fresh by re-ranking only the questions that change
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+from config.settings import Config
+from constants import AnswerFields, QuestionFields
+from utils.data_formatters import QuestionFormatter
+
+logger = logging.getLogger('survey_analytics')
+
+
+def answers_fingerprint(question: Dict) -> str:
+    """
+    Order-insensitive digest of the answer fields submissions change
+    (id, text, isCorrect, responseCount). Rank/score are derived, so they are left out.
+    """
+    rows = sorted(
+        repr((
+            a.get(AnswerFields.ANSWER_ID) or a.get(AnswerFields.ID) or "",
+            a.get(AnswerFields.ANSWER),
+            bool(a.get(AnswerFields.IS_CORRECT)),
+            a.get(AnswerFields.RESPONSE_COUNT),
+        ))
+        for a in question.get(QuestionFields.ANSWERS) or []
+    )
+    return hashlib.blake2b("\n".join(rows).encode(), digest_size=16).hexdigest()
+
+
+class RankingDaemon:
+    """
+    Long-running incremental ranker.
+
+    Change events (MongoDB change stream) or polling detect questions whose answers changed.
+    Affected ids are debounced, then only those questions are re-merged, re-ranked and written.
+    The daemon remembers the fingerprint of what it wrote, so the echo of its own writes is ignored.
+    """
+
+    def __init__(self, ranking_service, db_handler,
+                 debounce_seconds: Optional[float] = None,
+                 max_wait_seconds: Optional[float] = None,
+                 poll_interval_seconds: Optional[float] = None):
+        self.ranking_service = ranking_service
+        self.db = db_handler
+        self.debounce = Config.DAEMON_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self.max_wait = Config.DAEMON_MAX_WAIT_SECONDS if max_wait_seconds is None else max_wait_seconds
+        self.poll_interval = Config.DAEMON_POLL_INTERVAL_SECONDS if poll_interval_seconds is None else poll_interval_seconds
+        self.stop_event = threading.Event()
+
+        self._known: Dict[str, str] = {}           # questionID -> fingerprint last seen or written
+        self._pending: Dict[str, Optional[Dict]] = {}  # questionID -> latest doc (None = fetch on flush)
+        self._first_event_at: Optional[float] = None
+        self._last_event_at: Optional[float] = None
+        self.totals = {"batches": 0, "questions_reranked": 0, "updated_count": 0, "echoes_ignored": 0}
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def run(self, mode: Optional[str] = None, catch_up: bool = True) -> Dict:
+        """
+        Run until stop() is called.
+        mode: "change_stream", "poll" or "auto" (change stream when the backend supports it).
+        catch_up: rank the whole bank once before going incremental
+                  (otherwise the current state is taken as the baseline).
+        """
+        mode = (mode or Config.DAEMON_MODE).lower()
+        logger.info(f"🛰️ Ranking daemon starting (mode={mode}, debounce={self.debounce}s, max_wait={self.max_wait}s)")
+
+        if mode in ("auto", "change_stream") and hasattr(self.db, "watch_questions"):
+            try:
+                stream = self.db.watch_questions()
+            except PyMongoError as e:
+                if mode == "change_stream":
+                    raise
+                logger.warning(f"⚠️ Change stream unavailable ({str(e)}) - falling back to polling")
+            else:
+                self._run_change_stream(stream, catch_up)
+                return self.totals
+        elif mode == "change_stream":
+            raise ValueError("Change streams need DB_BACKEND=mongo")
+
+        self._run_polling(catch_up)
+        return self.totals
+
+    def _run_change_stream(self, stream, catch_up: bool) -> None:
+        # The stream is opened before the catch-up pass so no submission falls in between
+        with stream:
+            if catch_up:
+                self._rerank(self.db.fetch_all_questions())
+            logger.info("👂 Watching questions collection via change stream")
+            while not self.stop_event.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    qid = (change.get("documentKey") or {}).get(QuestionFields.ID)
+                    if qid:
+                        self._mark_pending(qid, None)
+                self._maybe_flush()
+
+    def _run_polling(self, catch_up: bool) -> None:
+        logger.info(f"🔁 Polling questions every {self.poll_interval}s")
+        first_poll = True
+        next_poll = 0.0
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_poll:
+                next_poll = now + self.poll_interval
+                try:
+                    self._poll_once(baseline_only=first_poll and not catch_up)
+                    first_poll = False
+                except Exception as e:
+                    logger.error(f"❌ Poll failed: {str(e)}")
+            self._maybe_flush()
+            self.stop_event.wait(min(self.debounce, self.poll_interval, 0.5))
+
+    def _poll_once(self, baseline_only: bool = False) -> None:
+        """Queue every question whose answers differ from the last seen/written state"""
+        for q in self.db.fetch_all_questions():
+            qid = QuestionFormatter.get_question_id(q)
+            if not qid:
+                continue
+            fp = answers_fingerprint(q)
+            if baseline_only:
+                self._known[qid] = fp
+                continue
+            if self._known.get(qid) == fp:
+                continue
+            queued = self._pending.get(qid)
+            if queued is not None and answers_fingerprint(queued) == fp:
+                continue  # unchanged since the last poll - don't re-arm the debounce
+            self._mark_pending(qid, q)
+
+    def _mark_pending(self, qid: str, question: Optional[Dict]) -> None:
+        now = time.monotonic()
+        if not self._pending:
+            self._first_event_at = now
+        self._last_event_at = now
+        self._pending[qid] = question
+
+    def _maybe_flush(self) -> None:
+        """Flush once events have been quiet for `debounce` or the oldest one waited `max_wait`"""
+        if not self._pending:
+            return
+        now = time.monotonic()
+        if now - self._last_event_at < self.debounce and now - self._first_event_at < self.max_wait:
+            return
+
+        pending, self._pending = self._pending, {}
+        to_fetch = [qid for qid, q in pending.items() if q is None]
+        questions = [q for q in pending.values() if q is not None]
+        if to_fetch:
+            try:
+                questions.extend(self.db.fetch_questions_by_ids(to_fetch))
+            except Exception as e:
+                logger.error(f"❌ Failed to fetch {len(to_fetch)} changed questions: {str(e)}")
+                for qid in to_fetch:
+                    self._mark_pending(qid, None)
+                return
+
+        changed = []
+        for q in questions:
+            if self._known.get(QuestionFormatter.get_question_id(q)) == answers_fingerprint(q):
+                self.totals["echoes_ignored"] += 1
+            else:
+                changed.append(q)
+        if changed:
+            self._rerank(changed)
+
+    def _rerank(self, questions: List[Dict]) -> None:
+        """Re-merge and re-rank `questions`, writing back only the ones that were ranked"""
+        if not questions:
+            return
+        # Fingerprints of the stored state, for questions that end up not being written
+        for q in questions:
+            self._known[QuestionFormatter.get_question_id(q)] = answers_fingerprint(q)
+
+        stats, to_update = self.ranking_service.rank_questions(questions)
+        self.ranking_service.upload_ranked(to_update, stats)
+
+        if stats["updated_count"] == len(to_update):
+            for q in to_update:
+                self._known[QuestionFormatter.get_question_id(q)] = answers_fingerprint(q)
+        else:
+            # Unknown which writes failed: forget them so the next change or poll retries
+            for q in to_update:
+                self._known.pop(QuestionFormatter.get_question_id(q), None)
+
+        self.totals["batches"] += 1
+        self.totals["questions_reranked"] += len(questions)
+        self.totals["updated_count"] += stats["updated_count"]
+        logger.info(
+            f"🔄 Re-ranked {len(questions)} changed questions: "
+            f"{stats['processed_count']} ranked, {stats['updated_count']} updated"
+        )
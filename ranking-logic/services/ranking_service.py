@@ -3,12 +3,17 @@ Updated Ranking Service - Only processes Input questions, no automatic final end
 """
 
 import logging
-from typing import List, Dict, Tuple
+import time
+from typing import List, Dict, Optional, Tuple
 
 from config.settings import Config
 from constants import AnswerFields, QuestionFields
 from utils.data_formatters import QuestionFormatter, DataValidator
 from services.similarity_service import SimilarityService
+from services.preview_service import PreviewEngine
+from utils.metrics import QUESTION_STEP_SECONDS
+from utils.run_events import RunEvents, NULL_EVENTS
+from utils.partition import ALL, Partition
 
 logger = logging.getLogger('survey_analytics')
 
@@ -179,16 +184,44 @@ class AnswerRanker:
 
 
 
+# QuestionProcessor stages that can reject a question, cheapest first
+STAGE_TYPE_FILTER = "type_filter"      # not an Input question - answers never touched
+STAGE_UPPER_BOUND = "upper_bound"      # raw answers cannot reach MIN_RESPONSES even if all merge into correct clusters
+STAGE_THRESHOLD = "threshold"          # exact check on merged counts
+REJECTION_STAGES = (STAGE_TYPE_FILTER, STAGE_UPPER_BOUND, STAGE_THRESHOLD)
+
+
 class QuestionProcessor:
+    """
+    Staged pipeline, ordered by cost:
+    type filter -> upper-bound count check on raw answers -> clustering
+    -> exact threshold on merged counts -> ranking
+    """
+
     def __init__(self, answer_ranker: AnswerRanker, similarity: "SimilarityService"):
         self.answer_ranker = answer_ranker
         self.similarity = similarity
 
+    @staticmethod
+    def _is_rankable_type(q: Dict) -> bool:
+        # Only rank "input" type
+        return str(q.get(QuestionFields.QUESTION_TYPE, "")).lower() == "input"
+
+    @staticmethod
+    def _correct_upper_bound(answers: List[Dict]) -> int:
+        """
+        Most correct responses the question can have after merging: a merged cluster is
+        correct if any member is, so at best every (non-negative) count lands in a correct
+        cluster - and with no correct answer at all, nothing does.
+        """
+        if not any(_is_true(a.get(AnswerFields.IS_CORRECT)) for a in answers):
+            return 0
+        return sum(max(0, _to_int(a.get(AnswerFields.RESPONSE_COUNT, 0))) for a in answers)
+
     def _should_process(self, q: Dict) -> Tuple[bool, Dict]:
         reason = {"skipped_mcq": False, "skipped_insufficient": False}
 
-        # Only rank "input" type
-        if str(q.get(QuestionFields.QUESTION_TYPE, "")).lower() != "input":
+        if not self._is_rankable_type(q):
             reason["skipped_mcq"] = True
             return False, reason
 
@@ -208,31 +241,48 @@ class QuestionProcessor:
 
     def process_question(self, q: Dict) -> Tuple[Dict, Dict]:
         qid = QuestionFormatter.get_question_id(q)
+
+        # 1) Type filter - MCQ and other non-Input questions never reach clustering
+        if not self._is_rankable_type(q):
+            return q, {"processed": False, "skipped_mcq": True, "skipped_insufficient": False,
+                       "rejected_at": STAGE_TYPE_FILTER}
+
         answers = q.get(QuestionFields.ANSWERS) or []
         logger.debug("Processing ranking for Input question %s with %d answers", qid, len(answers))
 
-        # 1) Merge near-duplicates first (so thresholds & ranking use merged counts)
-        merged, _ = self.similarity.merge_similar_answers(answers)
+        # 2) Upper bound on raw answers - hopeless questions skip the O(n²) merge
+        if self._correct_upper_bound(answers) < MIN_RESPONSES:
+            return q, {"processed": False, "skipped_mcq": False, "skipped_insufficient": True,
+                       "rejected_at": STAGE_UPPER_BOUND}
+
+        # 3) Merge near-duplicates (so thresholds & ranking use merged counts)
+        start = time.perf_counter()
+        merged, duplicates = self.similarity.merge_similar_answers(answers)
+        QUESTION_STEP_SECONDS.observe(time.perf_counter() - start, step="merge")
         q[QuestionFields.ANSWERS] = merged
         answers = merged
+        clusters = {"clusters": len(merged), "answers_merged": duplicates}
 
-        for i, a in enumerate(answers):
-            logger.debug("Answer %d: '%s' - isCorrect: %s, responseCount: %s",
-                         i, str(a.get(AnswerFields.ANSWER))[:30],
-                         a.get(AnswerFields.IS_CORRECT),
-                         a.get(AnswerFields.RESPONSE_COUNT))
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, a in enumerate(answers):
+                logger.debug("Answer %d: '%s' - isCorrect: %s, responseCount: %s",
+                             i, str(a.get(AnswerFields.ANSWER))[:30],
+                             a.get(AnswerFields.IS_CORRECT),
+                             a.get(AnswerFields.RESPONSE_COUNT))
 
-        # 2) Decide if we should process (uses merged counts)
+        # 4) Exact threshold on merged counts
         ok, reason = self._should_process(q)
         if not ok:
-            return q, {"processed": False, **reason}
+            return q, {"processed": False, **reason, "rejected_at": STAGE_THRESHOLD, **clusters}
 
-        # 3) Rank the merged answers
+        # 5) Rank the merged answers
+        start = time.perf_counter()
         ranked_answers, ranked_cnt, scored_cnt = self.answer_ranker.rank_answers(answers)
+        QUESTION_STEP_SECONDS.observe(time.perf_counter() - start, step="rank")
         q[QuestionFields.ANSWERS] = ranked_answers
 
         logger.debug("Input question %s: ranked %d answers, scored %d answers", qid, ranked_cnt, scored_cnt)
-        return q, {"processed": True, "ranked_cnt": ranked_cnt, "scored_cnt": scored_cnt}
+        return q, {"processed": True, "ranked_cnt": ranked_cnt, "scored_cnt": scored_cnt, **clusters}
 
     # Safety alias for any old code path
     def process(self, q: Dict) -> Tuple[Dict, Dict]:
@@ -250,126 +300,127 @@ class RankingService:
         self.answer_ranker = AnswerRanker(Config.SCORING_VALUES)
         self.similarity = SimilarityService(self.db)
         self.question_processor = QuestionProcessor(self.answer_ranker, self.similarity)
+        self.preview_engine = PreviewEngine(self.question_processor, MIN_RESPONSES)
     
     def preview_details(self, questions: List[Dict], top_n: int = 5) -> List[Dict]:
         """
         Read-only preview:
         - Uses the same processing pipeline as writing, but does not persist.
+        - Does not mutate `questions`; ranked rows are memoized per question fingerprint.
         - Returns which questions are rankable, why skipped, and top clusters.
         """
-        results: List[Dict] = []
+        return self.preview_engine.preview(questions, top_n=top_n)
 
-        for q in questions:
-            qtype = (q.get("questionType") or "").lower()
-            answers = q.get("answers") or []
-            qtext = q.get("questionText") or q.get("question") or q.get("text") or ""
-
-            
-            ##total = _total_responses(answers)
-
-            lvl = q.get("questionLevel") or q.get("level")
-            cat = q.get("questionCategory") or q.get("category")
-
-            # Mirror skip rules used in your pipeline
-            if qtype == "mcq":
-                results.append({
-                    "questionId": q.get("_id"),
-                    "questionType": qtype,
-                    "questionLevel": lvl,         
-                    "questionCategory": cat,
-                    "text": qtext,
-                    "responseCount": len(answers),
-                    "rankable": False,
-                    "skipReason": "mcq"
-                })
-                continue
-
-            total_correct = sum(_to_int(a.get(AnswerFields.RESPONSE_COUNT, 0))
-                                for a in answers
-                                if _to_bool(a.get(AnswerFields.IS_CORRECT))
-                                )
-
-            if total_correct < MIN_RESPONSES:
-                results.append({
-                    "questionId": q.get("_id"),
-                    "questionType": qtype,
-                    "questionLevel": lvl,
-                    "questionCategory": cat,
-                    "text": qtext,
-                    "responseCount": total_correct,   # show the correct-responses total here
-                    "rankable": False,
-                    "skipReason": "insufficient"
-                })
-                continue
-
-            # Example threshold; match what QuestionProcessor uses
-            ##if total < MIN_RESPONSES:
-                ##results.append({
-                    ##"questionId": q.get("_id"),
-                    ##"questionType": qtype,
-                    ##"questionLevel": lvl,         
-                    ##"questionCategory": cat,
-                    ##"text": qtext,
-                    ##"responseCount": total,
-                    ##"rankable": False,
-                    ##"skipReason": "insufficient"
-                ##})
-                ##continue
-
-            # Reuse the real processing path, but read only, not affect DB
-            # process_question returns (processed_question, meta)
-            processed_q, meta = self.question_processor.process_question(q)
-
-            # Pull out the “ranked” view from processed_q
-            proc_answers = processed_q.get("answers") or []
-
-            # Keep only positive-ranked clusters/answers and sort by rank asc
-            ranked = [a for a in proc_answers if int(a.get("rank", 0)) > 0]
-            ranked.sort(key=lambda a: int(a.get("rank", 0)))
-
-            top = ranked[:top_n]
-
-            # Preview Cluster Shape, format
-            preview_clusters = [
-                {
-                    "value": a.get("normalized") or a.get("answer") or a.get("value"),
-                    "original": a.get("answer"),
-                    "count": a.get("responseCount") or a.get("count") or 0,
-                    "rank": int(a.get("rank", 0)),
-                    "score": int(a.get("score", 0)),
-                    "isCorrect": bool(a.get("isCorrect", False))
-                }
-                for a in top
-            ]
-
-            results.append({
-                "questionId": q.get("_id"),
-                "questionType": qtype,
-                "text": qtext,
-                "questionLevel": lvl,         
-                "questionCategory": cat,
-                "responseCount": total_correct,
-                "rankable": True,
-                "skipReason": None,
-                "clusters": preview_clusters,
-                "debug": {
-                    "ranked_cnt": int(meta.get("ranked_cnt", 0)),
-                    "scored_cnt": int(meta.get("scored_cnt", 0)),
-                }
-            })
+    def can_push_down_preview(self) -> bool:
+        """True when the backend (MongoDB, or the local mirror) can filter and count preview questions itself"""
+        supported = getattr(self.db, "can_push_down_preview", None)
+        return bool(supported and supported())
 
+    def preview_ranking(self, top_n: int = 5, partition: Partition = ALL) -> List[Dict]:
+        """
+        Preview straight from the backend. With a Mongo backend the type filter and the
+        correct-response totals are computed by an aggregation pipeline (with the local mirror,
+        by a SQL query), so MCQ and under-threshold questions arrive without their answers;
+        only rankable questions' answers are downloaded (decoded) and clustered.
+        A partition restricts the preview to its questions (filtered in the same query).
+        """
+        if not self.can_push_down_preview():
+            return self.preview_details(self._fetch_questions(partition), top_n=top_n)
+
+        engine = self.preview_engine
+        results: List[Dict] = []
+        options = {"partition": partition} if not partition.empty else {}
+        for q in self.db.fetch_preview_candidates(MIN_RESPONSES, **options):
+            if q.get("rankable"):
+                results.append(engine.ranked_row(q, _to_int(q.get("totalCorrect")), top_n))
+            elif (q.get("questionType") or "").lower() == "mcq":
+                results.append(engine.skip_row(q, _to_int(q.get("answerCount")), "mcq"))
+            else:
+                results.append(engine.skip_row(q, _to_int(q.get("totalCorrect")), "insufficient"))
         return results
 
-    def _fetch_questions(self) -> List[Dict]:
-        """Fetch all questions from database"""
-        try:
+    def _fetch_source(self, partition: Partition = ALL) -> List[Dict]:
+        """
+        Fetch all questions from database, or only a partition's: at the source when the
+        handler supports it (fetch_partition), otherwise by filtering the full fetch.
+        Fetch errors propagate.
+        """
+        if partition.empty:
             return self.db.fetch_all_questions()
+        fetch_partition = getattr(self.db, "fetch_partition", None)
+        if fetch_partition is not None:
+            return fetch_partition(partition)
+        return partition.apply(self.db.fetch_all_questions())
+
+    def _fetch_questions(self, partition: Partition = ALL) -> List[Dict]:
+        """Like _fetch_source, but a failed fetch is logged and ranks nothing"""
+        try:
+            return self._fetch_source(partition)
         except Exception as e:
             logger.error("Fetch error: %s", e)
             return []
 
-    def process_all_questions(self) -> Dict:
-        questions = self._fetch_questions()
+    def process_all_questions(self, events: Optional[RunEvents] = None, partition: Partition = ALL) -> Dict:
+        """Fetch, rank and write back the whole bank, or only the questions of `partition`"""
+        events = events or NULL_EVENTS
+        with events.stage("fetch"):
+            questions = self._fetch_questions(partition)
+        events.emit("fetched", count=len(questions))
+        return self.process_questions(questions, events)
+
+    def process_questions(self, questions: List[Dict], events: Optional[RunEvents] = None) -> Dict:
+        """Rank the given questions and write the ranked ones back"""
+        events = events or NULL_EVENTS
+        with events.stage("rank"):
+            stats, to_update = self.rank_questions(questions, events)
+        with events.stage("upload"):
+            self.upload_ranked(to_update, stats, events)
+        return stats
+
+    def process_for_publish(self, questions: Optional[List[Dict]] = None, events: Optional[RunEvents] = None,
+                            partition: Partition = ALL) -> Tuple[Dict, Optional[List[Dict]]]:
+        """
+        Rank and write back like process_all_questions, and also return the bank as it now
+        stands in the database so it can be published without downloading it again.
+
+        Ranking rebinds answers in place (merge runs before the threshold check), so questions
+        that were not written get their original answer list back. Returns (stats, None) when
+        some writes failed, since the stored state is then unknown.
+        With a partition (and no `questions`) only that partition is fetched, ranked and returned.
+        A failed fetch raises instead of returning an empty bank, which would otherwise be
+        published as "delete everything".
+        """
+        events = events or NULL_EVENTS
+        if questions is None:
+            with events.stage("fetch"):
+                questions = self._fetch_source(partition)
+            events.emit("fetched", count=len(questions))
+        original_answers = [q.get(QuestionFields.ANSWERS) for q in questions]
+
+        with events.stage("rank"):
+            stats, to_update = self.rank_questions(questions, events)
+        with events.stage("upload"):
+            self.upload_ranked(to_update, stats, events)
+        if stats["updated_count"] != len(to_update):
+            return stats, None
+
+        written = {id(q) for q in to_update}
+        current: List[Dict] = []
+        for q, answers in zip(questions, original_answers):
+            if id(q) in written:
+                current.append(q)
+            else:
+                view = dict(q)
+                view[QuestionFields.ANSWERS] = answers
+                current.append(view)
+        return stats, current
+
+    def rank_questions(self, questions: List[Dict], events: Optional[RunEvents] = None) -> Tuple[Dict, List[Dict]]:
+        """
+        Merge and rank the given questions in memory (no I/O).
+        Returns (stats, questions that passed validation and should be written).
+        """
+        events = events or NULL_EVENTS
         total = len(questions)
         stats = {
             "total_questions": total,
@@ -384,16 +435,24 @@ class RankingService:
             "failed_count": 0,
             "answers_ranked": 0,   # add for app.py
             "answers_scored": 0,   # optional aggregate
+            "stage_rejections": {stage: 0 for stage in REJECTION_STAGES},
         }
         if not questions:
-            return stats
+            return stats, []
 
         to_update: List[Dict] = []
 
-        for q in questions:
+        for done, q in enumerate(questions, 1):
             pq, res = self.question_processor.process_question(q)
+            if events.active:
+                events.progress("rank", done, total, question_id=QuestionFormatter.get_question_id(pq),
+                                outcome="ranked" if res.get("processed") else res.get("rejected_at"),
+                                clusters=res.get("clusters"), answers_merged=res.get("answers_merged", 0))
             if res.get("processed"):
-                if DataValidator.validate_question(pq):
+                start = time.perf_counter()
+                valid = DataValidator.validate_question(pq)
+                QUESTION_STEP_SECONDS.observe(time.perf_counter() - start, step="validate")
+                if valid:
                     to_update.append(pq)
                     stats["processed_questions"] += 1
                     stats["answers_ranked"] += int(res.get("ranked_cnt", 0))
@@ -403,16 +462,21 @@ class RankingService:
             else:
                 stats["skipped_mcq"] += int(res.get("skipped_mcq", False))
                 stats["skipped_insufficient"] += int(res.get("skipped_insufficient", False))
+                stats["stage_rejections"][res.get("rejected_at", STAGE_THRESHOLD)] += 1
 
         stats["processed_count"] = stats["processed_questions"]
         stats["skipped_count"] = stats["skipped_mcq"] + stats["skipped_insufficient"] + stats["validation_failed"]
         stats["failed_count"] = stats["validation_failed"]
 
+        return stats, to_update
+
+    def upload_ranked(self, to_update: List[Dict], stats: Dict, events: Optional[RunEvents] = None) -> Dict:
+        """Write ranked questions back and record the update counts in `stats`"""
+        events = events or NULL_EVENTS
         if to_update:
-            res = self.db.bulk_update_questions(to_update)
+            res = self.db.bulk_update_questions(to_update, events=events)
+            events.progress("upload", res.get("updated", 0), len(to_update))
             updated = res.get("updated") or res.get("updated_count", 0)
             stats["updated_questions"] = updated
             stats["updated_count"] = updated
-
         return stats
-    
@@ -10,6 +10,7 @@ from typing import List, Dict, Tuple, Optional
 from config.settings import Config
 from utils.data_formatters import QuestionFormatter
 from constants import AnswerFields
+from utils.metrics import SIMILARITY_COMPARISONS
 
 logger = logging.getLogger("survey_analytics")
 
@@ -158,6 +159,7 @@ class SimilarityService:
         used = [False] * n
         merged: List[Dict] = []
         duplicates = 0
+        computed = 0
 
         for i in range(n):
             if used[i]:
@@ -186,6 +188,7 @@ class SimilarityService:
                         continue
 
                 # otherwise: direct similarity
+                computed += 1
                 sim = _levenshtein_similarity(ai, aj)
                 if sim >= self.threshold:
                     cluster.append(bj)
@@ -223,6 +226,8 @@ class SimilarityService:
 
             merged.append(kept)
 
+        if computed:
+            SIMILARITY_COMPARISONS.inc(computed, result="computed")
         return merged, duplicates
 
    
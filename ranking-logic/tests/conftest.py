@@ -0,0 +1,12 @@
+"""
+Shared test setup: modules import each other from the ranking-logic root (as the entry points
+run there), and the logger is kept quiet
+"""
+
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.getLogger('survey_analytics').setLevel(logging.CRITICAL)
@@ -0,0 +1,79 @@
+"""
+EventStream: a slow client may lose progress events, but the stream always ends with
+job_finished once the job is over
+"""
+
+import json
+import threading
+
+from services.job_manager import Job
+from utils.event_stream import END_EVENT, FORMAT_NDJSON, EventStream
+
+
+def _open(job, **kwargs):
+    """A stream whose client is already connected (it has read the snapshot)"""
+    stream = iter(EventStream(job, fmt=FORMAT_NDJSON, **kwargs))
+    assert json.loads(next(stream))["event"] == "snapshot"
+    return stream
+
+
+def _drain(stream, timeout=5.0):
+    """The remaining events of the stream, or None when it did not end within `timeout`"""
+    lines = []
+    reader = threading.Thread(target=lambda: lines.extend(stream), daemon=True)
+    reader.start()
+    reader.join(timeout)
+    if reader.is_alive():
+        return None
+    return [json.loads(line) for line in lines]
+
+
+def _running_job():
+    job = Job("rank")
+    job.start()
+    return job
+
+
+def test_events_arrive_in_order_and_end_the_stream():
+    job = _running_job()
+    stream = _open(job, heartbeat=0.05)
+    for done in range(3):
+        job.events.progress("rank", done, 3)
+    job.finish({"status": "success"})
+
+    events = _drain(stream)
+    assert [e["event"] for e in events] == ["progress", "progress", "progress", END_EVENT]
+    assert events[-1]["state"] == "succeeded" and events[-1]["dropped"] == 0
+
+
+def test_full_buffer_never_drops_the_end_event():
+    job = _running_job()
+    stream = _open(job, max_buffer=5, heartbeat=0.05)
+    for done in range(10):
+        job.events.progress("rank", done, 10)
+    job.finish({"status": "success"})
+
+    events = _drain(stream)
+    assert events is not None, "stream kept sending heartbeats after the job finished"
+    assert events[-1]["event"] == END_EVENT and events[-1]["state"] == "succeeded"
+    assert events[-1]["dropped"] == 6
+    assert [e["done"] for e in events if e["event"] == "progress"] == [1, 2, 3, 4]  # 5-9 dropped while full, 0 evicted for the end
+
+
+def test_stream_ends_from_the_job_state_when_the_end_event_never_arrives():
+    job = _running_job()
+    source = EventStream(job, fmt=FORMAT_NDJSON, heartbeat=0.05)
+    job.events.unsubscribe(source._callback)  # the end event is lost on its way
+    stream = iter(source)
+    next(stream)
+    job.finish(None, error="boom")
+
+    events = _drain(stream)
+    assert events[-1] == {"event": END_EVENT, "job_id": job.id, "state": "failed", "error": "boom", "dropped": 0}
+
+
+def test_finished_job_streams_only_snapshot_and_end():
+    job = _running_job()
+    job.finish({"status": "success"})
+    events = _drain(EventStream(job, fmt=FORMAT_NDJSON))
+    assert [e["event"] for e in events] == ["snapshot", END_EVENT]
@@ -0,0 +1,146 @@
+"""
+Final publishing transport and diff: FinalDeltaPlanner.plan and the 413 split / payload budget
+of FinalEndpointHandler
+"""
+
+import json
+
+from constants import APIKeys
+from services.final_service import FinalDeltaPlanner, FinalEndpointHandler
+
+
+def _final(text, answers, qid=None, skipped=0, answered=0, category="Food", level="Easy"):
+    question = {"question": text, "questionType": "Input", "questionCategory": category,
+                "questionLevel": level, "timesSkipped": skipped, "timesAnswered": answered,
+                "answers": [{"answer": a, "isCorrect": True, "responseCount": c, "rank": r, "score": s}
+                            for a, c, r, s in answers]}
+    if qid:
+        question["_id"] = qid
+        for i, a in enumerate(question["answers"]):
+            a["_id"] = f"{qid}-a{i}"
+    return question
+
+
+class TestFinalDeltaPlanner:
+    planner = FinalDeltaPlanner()
+
+    def test_identical_sets_need_nothing(self):
+        desired = [_final("capital of france?", [("paris", 5, 1, 100)])]
+        existing = [_final("Capital of France?", [("Paris", 5, 1, 100)], qid="f1")]
+        plan = self.planner.plan(desired, existing)
+        assert plan == {"inserts": [], "updates": [], "replacements": [], "delete_ids": [], "unchanged": 1}
+
+    def test_changed_answers_become_a_put_that_keeps_answer_ids(self):
+        desired = [_final("q", [("paris", 7, 1, 100), ("lyon", 2, 2, 80)])]
+        existing = [_final("q", [("paris", 5, 1, 100)], qid="f1")]
+        plan = self.planner.plan(desired, existing)
+        update, = plan["updates"]
+        assert update["questionID"] == "f1"
+        ids = {a["answer"]: a["answerID"] for a in update["answers"]}
+        assert ids["paris"] == "f1-a0"
+        assert ids["lyon"] and ids["lyon"] != "f1-a0"
+        assert plan["inserts"] == plan["replacements"] == plan["delete_ids"] == []
+
+    def test_changed_counters_replace_the_question(self):
+        desired = [_final("q", [("paris", 5, 1, 100)], answered=3)]
+        existing = [_final("q", [("paris", 5, 1, 100)], qid="f1", answered=2)]
+        plan = self.planner.plan(desired, existing)
+        assert plan["delete_ids"] == ["f1"]
+        assert plan["replacements"] == desired
+        assert plan["updates"] == []
+
+    def test_new_gone_and_duplicate_questions(self):
+        desired = [_final("new", [("a", 1, 1, 100)]), _final("kept", [("b", 1, 1, 100)]),
+                   _final("KEPT", [("b", 1, 1, 100)])]
+        existing = [_final("kept", [("b", 1, 1, 100)], qid="f1"),
+                    _final("kept", [("b", 1, 1, 100)], qid="f2"),
+                    _final("gone", [("c", 1, 1, 100)], qid="f3")]
+        plan = self.planner.plan(desired, existing)
+        assert [q["question"] for q in plan["inserts"]] == ["new"]
+        assert sorted(plan["delete_ids"]) == ["f2", "f3"]
+        assert plan["unchanged"] == 1
+
+    def test_same_text_in_another_category_is_a_different_question(self):
+        desired = [_final("q", [("a", 1, 1, 100)], category="Music")]
+        existing = [_final("q", [("a", 1, 1, 100)], qid="f1", category="Food")]
+        plan = self.planner.plan(desired, existing)
+        assert len(plan["inserts"]) == 1 and plan["delete_ids"] == ["f1"]
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = 200 <= status_code < 300
+
+
+class LimitedAPI:
+    """Answers 413 to any body over `limit` bytes and records the accepted ones"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.accepted = []
+        self.rejected = 0
+
+    def _send(self, json):
+        if len(json_dumps(json)) > self.limit:
+            self.rejected += 1
+            return FakeResponse(413)
+        self.accepted.extend(json[APIKeys.QUESTIONS])
+        return FakeResponse(201)
+
+    post = put = delete = _send
+
+
+def json_dumps(payload):
+    return json.dumps(payload, default=str).encode()
+
+
+def _handler(api, max_bytes):
+    handler = FinalEndpointHandler()
+    handler.api = api
+    handler.max_payload_bytes = max_bytes
+    handler.max_workers = 1
+    return handler
+
+
+def _items(count, size=400):
+    return [{"question": f"q{i}", "pad": "x" * size} for i in range(count)]
+
+
+def test_chunks_stay_under_the_budget():
+    api = LimitedAPI(limit=10_000)
+    stats = _handler(api, max_bytes=5_000).post_formatted_questions(_items(40))
+    assert stats["sent"] == 40 and stats["failed"] == 0 and stats["retries_413"] == 0
+    assert stats["chunks"] > 1
+
+
+def test_413_splits_until_every_question_is_sent():
+    api = LimitedAPI(limit=3_000)
+    items = _items(40)
+    stats = _handler(api, max_bytes=50_000).post_formatted_questions(items)
+    assert stats["sent"] == 40 and stats["failed"] == 0
+    assert stats["retries_413"] > 0
+    assert [q["question"] for q in api.accepted] == [q["question"] for q in items]
+
+
+def test_a_single_oversized_question_fails_without_looping():
+    api = LimitedAPI(limit=100)
+    stats = _handler(api, max_bytes=50_000).post_formatted_questions(_items(1))
+    assert stats["failed"] == 1 and stats["failed_chunks"] == 1 and api.rejected == 1
+
+
+def test_lowered_budget_lasts_for_one_publish_only():
+    api = LimitedAPI(limit=3_000)
+    handler = _handler(api, max_bytes=50_000)
+
+    with handler.publish_session() as budget:
+        handler.delete_questions_by_ids([f"id{i}" for i in range(5)])
+        handler.post_formatted_questions(_items(40))
+        assert budget.limit < 50_000
+        rejected = api.rejected
+        handler.put_questions(_items(40))  # packed with the lowered budget: no new 413s
+        assert api.rejected == rejected
+
+    assert handler.max_payload_bytes == 50_000
+    with handler.publish_session() as budget:
+        assert budget.limit == 50_000
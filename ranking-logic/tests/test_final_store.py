@@ -0,0 +1,163 @@
+"""
+Staged (blue/green) final publishing: build_final_documents, the in-memory and MongoDB final
+stores, and FinalService._staged on top of them
+"""
+
+import pytest
+
+from config.settings import Config
+from database.final_store import InMemoryFinalStore, MongoFinalStore, POINTER_ID, build_final_documents
+from services.final_service import FinalService
+
+
+def _formatted(text, answers, qtype="Input", category="Food", level="Easy"):
+    return {"question": text, "questionType": qtype, "questionCategory": category, "questionLevel": level,
+            "timesSkipped": 1, "timesAnswered": 2,
+            "answers": [{"answer": a, "isCorrect": ok, "responseCount": 3, "rank": 1, "score": 100}
+                        for a, ok in answers]}
+
+
+def test_documents_are_shaped_like_the_backend_post():
+    documents = build_final_documents([
+        _formatted("  Capital of FRANCE? ", [("  Paris ", True), ("lyon", False)], qtype="input"),
+        _formatted("capital of france?", [("paris", True)]),  # duplicate of the first
+        _formatted("Pick one", [("A", True), (" b ", False)], qtype="mcq"),
+    ])
+    assert len(documents) == 2
+    first, mcq = documents
+    assert first["question"] == "capital of france?" and first["questionType"] == "Input"
+    assert [a["answer"] for a in first["answers"]] == ["Paris"]  # trimmed, not lowercased
+    assert mcq["questionType"] == "MCQ" and [a["answer"] for a in mcq["answers"]] == ["A", "b"]
+    ids = [first["_id"], mcq["_id"]] + [a["_id"] for d in documents for a in d["answers"]]
+    assert len(set(ids)) == len(ids)
+
+
+class TestInMemoryFinalStore:
+    def test_activate_swaps_versions(self):
+        store = InMemoryFinalStore()
+        assert store.active_version() is None and store.read_active() == []
+        store.stage("v1", [{"_id": "a"}])
+        assert store.read_active() == []  # staged, not active yet
+        assert store.activate("v1") == {"version": "v1", "previous_version": None, "previous_count": 0}
+        store.stage("v2", [{"_id": "b"}, {"_id": "c"}])
+        assert store.activate("v2") == {"version": "v2", "previous_version": "v1", "previous_count": 1}
+        assert store.read_active() == [{"_id": "b"}, {"_id": "c"}]
+
+    def test_discard_never_drops_the_active_version(self):
+        store = InMemoryFinalStore()
+        store.stage("v1", [{"_id": "a"}])
+        store.activate("v1")
+        store.discard("v1")
+        assert store.read_active() == [{"_id": "a"}]
+        store.stage("v2", [])
+        store.discard("v2")
+        with pytest.raises(KeyError):
+            store.activate("v2")
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    @property
+    def docs(self):
+        return self.database.collections.get(self.name)
+
+    def drop(self):
+        self.database.collections.pop(self.name, None)
+
+    def insert_many(self, documents, ordered=True):
+        self.database.collections.setdefault(self.name, []).extend(documents)
+
+    def rename(self, new_name, dropTarget=False):
+        if self.docs is None:
+            raise RuntimeError("NamespaceNotFound: source namespace does not exist")
+        self.database.collections[new_name] = self.database.collections.pop(self.name)
+
+    def estimated_document_count(self):
+        return len(self.docs or [])
+
+    def find(self, query):
+        return list(self.docs or [])
+
+    def find_one(self, query):
+        return next((d for d in self.docs or [] if d["_id"] == query["_id"]), None)
+
+    def replace_one(self, query, document, upsert=False):
+        self.drop()
+        self.insert_many([document])
+
+
+class FakeDatabase:
+    """Just enough of a pymongo Database: renaming a collection that was never created fails"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+    def create_collection(self, name):
+        if name in self.collections:
+            raise RuntimeError(f"collection {name} already exists")
+        self.collections[name] = []
+
+
+class TestMongoFinalStore:
+    def test_stage_and_activate(self):
+        database = FakeDatabase()
+        store = MongoFinalStore(database)
+        store.stage("v1", [{"_id": "a"}, {"_id": "b"}])
+        switch = store.activate("v1")
+        assert switch == {"version": "v1", "previous_version": None, "previous_count": 0}
+        assert store.read_active() == [{"_id": "a"}, {"_id": "b"}]
+        assert store.pointers.find_one({"_id": POINTER_ID})["version"] == "v1"
+        assert list(database.collections) == [Config.MONGO_FINAL_COLLECTION, store.pointers.name]
+
+    def test_an_empty_set_can_be_activated(self):
+        store = MongoFinalStore(FakeDatabase())
+        store.stage("v1", [{"_id": "a"}])
+        store.activate("v1")
+        assert store.stage("v2", []) == 0
+        assert store.activate("v2")["previous_count"] == 1
+        assert store.read_active() == [] and store.active_version() == "v2"
+
+
+@pytest.fixture
+def staged_service(monkeypatch):
+    monkeypatch.setattr(Config, "FINAL_PUBLISH_STATE_FILE", "")
+    monkeypatch.setattr(Config, "FINAL_PUBLISH_MODE", "staged")
+    return FinalService(db_handler=None, final_store=InMemoryFinalStore())
+
+
+def _main(qid, answers):
+    return {"_id": qid, "question": f"question {qid}", "questionType": "Input", "questionCategory": "Food",
+            "questionLevel": "Easy",
+            "answers": [{"_id": f"{qid}-{a}", "answer": a, "isCorrect": ok, "responseCount": 4, "rank": 1,
+                         "score": 100} for a, ok in answers]}
+
+
+def test_staged_publish_replaces_the_active_set(staged_service):
+    store = staged_service.final_store
+    first = staged_service.post_to_final_endpoint([_main("q1", [("paris", True), ("rome", False)])])
+    assert first["status"] == "published" and first["publish_mode"] == "staged"
+    assert [a["answer"] for a in store.read_active()[0]["answers"]] == ["paris"]
+
+    second = staged_service.post_to_final_endpoint([_main("q1", [("paris", True)]), _main("q2", [("oslo", True)])])
+    assert second["status"] == "published"
+    assert second["previous_version"] == first["version"]
+    assert len(store.read_active()) == 2
+
+
+def test_failed_stage_leaves_the_active_set(staged_service, monkeypatch):
+    store = staged_service.final_store
+    staged_service.post_to_final_endpoint([_main("q1", [("paris", True)])])
+    active = store.active_version()
+
+    def broken(version, documents):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(store, "stage", broken)
+    result = staged_service.post_to_final_endpoint([_main("q2", [("oslo", True)])])
+    assert result["status"] == "failed" and result["version"] is None
+    assert store.active_version() == active and len(store.read_active()) == 1
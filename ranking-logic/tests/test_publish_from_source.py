@@ -0,0 +1,99 @@
+"""
+FinalService.publish_from_source: the final set is prefetched only when a publish is expected,
+and an unchanged payload or an empty bank never reaches the final endpoint
+"""
+
+import copy
+
+import pytest
+
+from config.settings import Config
+from services.final_service import FinalEndpointHandler, FinalService
+
+
+def _question(qid, count=5):
+    return {"_id": qid, "question": f"question {qid}", "questionType": "Input",
+            "questionCategory": "Food", "questionLevel": "Easy", "timesSkipped": 0, "timesAnswered": 1,
+            "answers": [{"_id": f"{qid}-a0", "answer": "paris", "isCorrect": True,
+                         "responseCount": count, "rank": 1, "score": 100}]}
+
+
+class FakeDB:
+    def __init__(self, questions):
+        self.questions = questions
+
+    def fetch_all_questions(self):
+        return copy.deepcopy(self.questions)
+
+
+class FakeResponse:
+    status_code = 201
+    ok = True
+
+
+class CountingFinalAPI(FinalEndpointHandler):
+    """Final endpoint that accepts every write and counts the reads of the final set"""
+
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+        self.writes = 0
+        self.api = self
+
+    def get_existing_questions(self):
+        self.gets += 1
+        return []
+
+    def _send(self, json):
+        self.writes += 1
+        return FakeResponse()
+
+    post = put = delete = _send
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(Config, "FINAL_PUBLISH_STATE_FILE", "")
+    monkeypatch.setattr(Config, "FINAL_PUBLISH_MODE", "delta")
+    service = FinalService(FakeDB([_question("q1"), _question("q2")]))
+    service.final_api = CountingFinalAPI()
+    return service
+
+
+def test_first_publish_prefetches_the_final_set(service):
+    result = service.publish_from_source()
+    assert result["status"] == "published"
+    assert service.final_api.gets == 1 and service.final_api.writes == 1
+
+
+def test_unchanged_payload_makes_no_final_request(service):
+    service.publish_from_source()
+    api = service.final_api
+    gets, writes = api.gets, api.writes
+
+    result = service.publish_from_source()
+    assert result["status"] == "skipped_unchanged"
+    assert (api.gets, api.writes) == (gets, writes)
+
+
+def test_empty_bank_after_a_publish_makes_no_final_request(service):
+    service.publish_from_source()
+    gets = service.final_api.gets
+    service.db.questions = []
+    assert service.publish_from_source()["status"] == "no_source_questions"
+    assert service.final_api.gets == gets
+
+
+def test_changed_payload_fetches_the_final_set_once(service):
+    service.publish_from_source()
+    gets = service.final_api.gets
+    service.db.questions[0]["answers"][0]["responseCount"] += 1
+    assert service.publish_from_source()["status"] == "published"
+    assert service.final_api.gets == gets + 1
+
+
+def test_force_prefetches_and_publishes(service):
+    service.publish_from_source()
+    gets = service.final_api.gets
+    assert service.publish_from_source(force=True)["status"] == "published"
+    assert service.final_api.gets == gets + 1
@@ -0,0 +1,64 @@
+"""
+FinalService.rank_and_publish: a failed or empty fetch of the main bank must never reach the
+final endpoint, where an empty payload would delete the whole final set
+"""
+
+import pytest
+
+from config.settings import Config
+from services.final_service import FinalEndpointHandler, FinalService
+from services.ranking_service import RankingService
+
+
+class FakeDB:
+    def __init__(self, questions=None, error=None):
+        self.questions = questions or []
+        self.error = error
+
+    def fetch_all_questions(self):
+        if self.error:
+            raise self.error
+        return list(self.questions)
+
+
+class RecordingFinalAPI:
+    """Stands in for FinalEndpointHandler and fails the test on any call that would publish"""
+
+    _empty_stats = FinalEndpointHandler._empty_stats
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append(name)
+            raise AssertionError(f"final endpoint called: {name}")
+        return record
+
+
+@pytest.fixture
+def final_service(monkeypatch):
+    monkeypatch.setattr(Config, "FINAL_PUBLISH_STATE_FILE", "")
+    monkeypatch.setattr(Config, "FINAL_PUBLISH_MODE", "delta")
+    service = FinalService(db_handler=None)
+    service.final_api = RecordingFinalAPI()
+    return service
+
+
+def _publish(final_service, db):
+    final_service.db = db
+    return final_service.rank_and_publish(RankingService(db))
+
+
+def test_failed_fetch_raises_and_publishes_nothing(final_service):
+    db = FakeDB(error=ConnectionError("survey backend down"))
+    with pytest.raises(ConnectionError):
+        _publish(final_service, db)
+    assert final_service.final_api.calls == []
+
+
+def test_empty_bank_publishes_nothing(final_service):
+    result = _publish(final_service, FakeDB(questions=[]))
+    assert result["final"]["status"] == "no_source_questions"
+    assert result["publish_source"] == "memory"
+    assert final_service.final_api.calls == []
@@ -0,0 +1,177 @@
+"""
+RankingDaemon: debounce / max-wait batching, echo suppression of its own writes, and
+retrying questions whose write failed
+"""
+
+import copy
+
+import pytest
+
+from services import ranking_daemon
+from services.ranking_daemon import RankingDaemon, answers_fingerprint
+
+
+def _question(qid, *counts):
+    return {"_id": qid, "questionID": qid, "questionType": "Input",
+            "answers": [{"_id": f"{qid}-a{i}", "answer": f"answer {i}", "isCorrect": True,
+                         "responseCount": c, "rank": 0, "score": 0} for i, c in enumerate(counts)]}
+
+
+class FakeDB:
+    def __init__(self, questions):
+        self.questions = {q["_id"]: q for q in questions}
+        self.fetched_ids = []
+
+    def fetch_all_questions(self):
+        return copy.deepcopy(list(self.questions.values()))
+
+    def fetch_questions_by_ids(self, ids):
+        self.fetched_ids.append(list(ids))
+        return [copy.deepcopy(self.questions[i]) for i in ids if i in self.questions]
+
+
+class FakeRanker:
+    """Ranks by responseCount and 'writes' the result into the fake database"""
+
+    def __init__(self, db, fail=False):
+        self.db = db
+        self.fail = fail
+        self.batches = []
+
+    def rank_questions(self, questions, events=None):
+        self.batches.append(sorted(q["_id"] for q in questions))
+        for q in questions:
+            ordered = sorted(q["answers"], key=lambda a: -a["responseCount"])
+            for rank, a in enumerate(ordered, 1):
+                a["rank"], a["score"] = rank, 100 - 20 * (rank - 1)
+        return {"processed_count": len(questions), "updated_count": 0}, questions
+
+    def upload_ranked(self, to_update, stats, events=None):
+        if not self.fail:
+            for q in to_update:
+                self.db.questions[q["_id"]] = copy.deepcopy(q)
+            stats["updated_count"] = len(to_update)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ranking_daemon.time, "monotonic", clock)
+    return clock
+
+
+def _daemon(db, ranker, debounce=1.0, max_wait=5.0):
+    return RankingDaemon(ranker, db, debounce_seconds=debounce, max_wait_seconds=max_wait,
+                         poll_interval_seconds=1.0)
+
+
+def test_events_are_batched_until_quiet_for_debounce(clock):
+    db = FakeDB([_question("q1", 3, 5), _question("q2", 1, 2)])
+    ranker = FakeRanker(db)
+    daemon = _daemon(db, ranker)
+
+    daemon._mark_pending("q1", None)
+    clock.now = 0.5
+    daemon._mark_pending("q2", None)
+    clock.now = 1.2
+    daemon._maybe_flush()
+    assert ranker.batches == []  # last event only 0.7s ago
+
+    clock.now = 1.6
+    daemon._maybe_flush()
+    assert ranker.batches == [["q1", "q2"]]
+    assert db.fetched_ids == [["q1", "q2"]]
+    assert daemon.totals["batches"] == 1
+
+
+def test_max_wait_flushes_a_continuous_burst(clock):
+    db = FakeDB([_question("q1", 3, 5)])
+    ranker = FakeRanker(db)
+    daemon = _daemon(db, ranker, debounce=1.0, max_wait=2.0)
+
+    while clock.now < 2.0:
+        daemon._mark_pending("q1", None)
+        daemon._maybe_flush()
+        clock.now += 0.5
+    daemon._maybe_flush()
+    assert ranker.batches == [["q1"]]
+
+
+def test_own_writes_are_not_reranked(clock):
+    db = FakeDB([_question("q1", 3, 5), _question("q2", 1, 2)])
+    ranker = FakeRanker(db)
+    daemon = _daemon(db, ranker, debounce=0.0)
+
+    daemon._poll_once()
+    daemon._maybe_flush()
+    assert ranker.batches == [["q1", "q2"]]
+
+    # The written ranks change the documents, but not the submission fields
+    daemon._poll_once()
+    daemon._maybe_flush()
+    assert ranker.batches == [["q1", "q2"]]
+
+    # A change-stream echo of the write is fetched and dropped
+    daemon._mark_pending("q1", None)
+    daemon._maybe_flush()
+    assert ranker.batches == [["q1", "q2"]]
+    assert daemon.totals["echoes_ignored"] == 1
+
+
+def test_new_submission_is_reranked_alone(clock):
+    db = FakeDB([_question("q1", 3, 5), _question("q2", 1, 2)])
+    ranker = FakeRanker(db)
+    daemon = _daemon(db, ranker, debounce=0.0)
+    daemon._poll_once(baseline_only=True)
+
+    db.questions["q2"]["answers"][0]["responseCount"] += 4
+    daemon._poll_once()
+    daemon._maybe_flush()
+    assert ranker.batches == [["q2"]]
+    assert [a["rank"] for a in db.questions["q2"]["answers"]] == [1, 2]
+
+
+def test_baseline_poll_queues_nothing(clock):
+    db = FakeDB([_question("q1", 3, 5)])
+    daemon = _daemon(db, FakeRanker(db), debounce=0.0)
+    daemon._poll_once(baseline_only=True)
+    assert daemon._pending == {}
+    assert daemon._known["q1"] == answers_fingerprint(db.questions["q1"])
+
+
+def test_failed_write_is_retried_on_next_poll(clock):
+    db = FakeDB([_question("q1", 3, 5)])
+    ranker = FakeRanker(db, fail=True)
+    daemon = _daemon(db, ranker, debounce=0.0)
+
+    daemon._poll_once()
+    daemon._maybe_flush()
+    assert "q1" not in daemon._known
+
+    ranker.fail = False
+    daemon._poll_once()
+    daemon._maybe_flush()
+    assert ranker.batches == [["q1"], ["q1"]]
+    assert daemon._known["q1"] == answers_fingerprint(db.questions["q1"])
+
+
+def test_failed_fetch_keeps_the_ids_pending(clock):
+    class FailingDB(FakeDB):
+        def fetch_questions_by_ids(self, ids):
+            raise RuntimeError("backend down")
+
+    db = FailingDB([_question("q1", 3, 5)])
+    ranker = FakeRanker(db)
+    daemon = _daemon(db, ranker, debounce=0.0)
+    daemon._mark_pending("q1", None)
+    daemon._maybe_flush()
+    assert ranker.batches == []
+    assert daemon._pending == {"q1": None}
@@ -0,0 +1,80 @@
+"""
+Cached GET routes: an unchanged bank version is answered from the cache without fetching the
+bank or recomputing the preview; a backend without a cheap version falls back to fingerprinting
+"""
+
+import copy
+
+import pytest
+
+import app as web
+from services.ranking_service import RankingService
+
+
+def _question(qid, count=5):
+    return {"_id": qid, "question": f"question {qid}", "questionType": "Input",
+            "answers": [{"_id": f"{qid}-a0", "answer": "paris", "isCorrect": True,
+                         "responseCount": count, "rank": 0, "score": 0}]}
+
+
+class VersionedDB:
+    """Bank with a cheap version (like the mirror or MongoDB); counts full fetches"""
+
+    def __init__(self, questions, versioned=True):
+        self.questions = questions
+        self.versioned = versioned
+        self.version = 1
+        self.fetches = 0
+
+    def dataset_version(self):
+        return f"v{self.version}" if self.versioned else None
+
+    def fetch_all_questions(self):
+        self.fetches += 1
+        return copy.deepcopy(self.questions)
+
+    def can_push_down_preview(self):
+        return False
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = VersionedDB([_question("q1"), _question("q2", count=12)])
+    monkeypatch.setattr(web, "db_handler", db)
+    monkeypatch.setattr(web, "ranking_service", RankingService(db))
+    monkeypatch.setattr(web, "response_cache", web.ResponseCache(ttl=0))
+    client = web.app.test_client()
+    client.db = db
+    return client
+
+
+@pytest.mark.parametrize("path", ["/api/get-questions", "/api/preview-ranking"])
+def test_unchanged_version_is_served_without_fetching(client, path):
+    first = client.get(path)
+    assert first.status_code == 200 and client.db.fetches == 1
+
+    again = client.get(path)
+    assert again.data == first.data and client.db.fetches == 1
+    assert client.get(path, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert client.db.fetches == 1
+
+
+@pytest.mark.parametrize("path", ["/api/get-questions", "/api/preview-ranking"])
+def test_new_version_fetches_again(client, path):
+    first = client.get(path)
+    client.db.questions.append(_question("q3"))
+    client.db.version += 1
+    second = client.get(path)
+    assert client.db.fetches == 2
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_without_a_version_the_fetched_bank_is_fingerprinted(client):
+    client.db.versioned = False
+    first = client.get("/api/preview-ranking")
+    second = client.get("/api/preview-ranking")
+    assert client.db.fetches == 2  # nothing cheaper than fetching
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+    client.db.questions[1]["answers"][0]["responseCount"] += 1
+    assert client.get("/api/preview-ranking").headers["ETag"] != first.headers["ETag"]
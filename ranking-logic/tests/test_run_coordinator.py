@@ -0,0 +1,161 @@
+"""
+RunCoordinator: one run per key within a process (joiners share its result or its error),
+and across processes through a flock in the lock directory
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from utils import run_coordinator
+from utils.run_coordinator import RunCoordinator
+
+
+def _in_thread(fn):
+    """Start fn on a thread; returns (thread, outcome) where outcome gets 'result' or 'error'"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = fn()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_concurrent_callers_share_one_run():
+    coordinator = RunCoordinator(lock_dir="")
+    release = threading.Event()
+    calls = []
+
+    def slow_run():
+        calls.append(1)
+        release.wait(5)
+        return {"status": "success"}
+
+    leader, leader_outcome = _in_thread(lambda: coordinator.run("rank", slow_run))
+    _wait_until(lambda: coordinator.in_flight("rank"))
+    joiner, joiner_outcome = _in_thread(lambda: coordinator.run("rank", slow_run))
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    joiner.join(5)
+
+    assert calls == [1]
+    assert leader_outcome["result"] == ({"status": "success"}, False)
+    assert joiner_outcome["result"] == ({"status": "success"}, True)
+    assert not coordinator.in_flight("rank")
+
+
+def test_error_is_reraised_in_the_joiner():
+    coordinator = RunCoordinator(lock_dir="")
+    release = threading.Event()
+
+    def failing_run():
+        release.wait(5)
+        raise RuntimeError("backend down")
+
+    leader, leader_outcome = _in_thread(lambda: coordinator.run("publish", failing_run))
+    _wait_until(lambda: coordinator.in_flight("publish"))
+    joiner, joiner_outcome = _in_thread(lambda: coordinator.run("publish", lambda: {"status": "never"}))
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    joiner.join(5)
+
+    assert str(leader_outcome["error"]) == "backend down"
+    assert joiner_outcome["error"] is leader_outcome["error"]
+    # The failed flight is gone: the next caller runs again
+    assert coordinator.run("publish", lambda: {"status": "ok"}) == ({"status": "ok"}, False)
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    coordinator = RunCoordinator(lock_dir="")
+    release = threading.Event()
+    leader, _ = _in_thread(lambda: coordinator.run("rank", lambda: release.wait(5) and {}))
+    _wait_until(lambda: coordinator.in_flight("rank"))
+    assert coordinator.run("publish", lambda: {"status": "ok"}) == ({"status": "ok"}, False)
+    release.set()
+    leader.join(5)
+
+
+needs_flock = pytest.mark.skipif(run_coordinator.fcntl is None, reason="no flock on this platform")
+
+
+class OtherProcess:
+    """Holds the run's flock through its own open file description, as another worker would"""
+
+    def __init__(self, coordinator, key):
+        self.lock_path, self.result_path = coordinator._paths(key)
+        self.handle = open(self.lock_path, "a+")
+        run_coordinator.fcntl.flock(self.handle, run_coordinator.fcntl.LOCK_EX)
+
+    def finish(self, result=None, finished_at=None):
+        if result is not None:
+            with open(self.result_path, "w") as f:
+                json.dump({"started_at": 0, "finished_at": finished_at or time.time() + 60, "result": result}, f)
+        run_coordinator.fcntl.flock(self.handle, run_coordinator.fcntl.LOCK_UN)
+        self.handle.close()
+
+
+def _blocked_run(coordinator, key, calls):
+    def fn():
+        calls.append(1)
+        return {"status": "ran here"}
+    thread, outcome = _in_thread(lambda: coordinator.run(key, fn))
+    time.sleep(0.2)  # let it reach the blocking flock
+    assert thread.is_alive() and calls == []
+    return thread, outcome
+
+
+@needs_flock
+def test_uncontended_run_shares_its_result(tmp_path):
+    coordinator = RunCoordinator(lock_dir=str(tmp_path))
+    assert coordinator.run("rank", lambda: {"status": "ok"}) == ({"status": "ok"}, False)
+    _, result_path = coordinator._paths("rank")
+    with open(result_path) as f:
+        assert json.load(f)["result"] == {"status": "ok"}
+
+
+@needs_flock
+def test_waits_for_the_other_process_and_takes_its_result(tmp_path):
+    coordinator = RunCoordinator(lock_dir=str(tmp_path))
+    other = OtherProcess(coordinator, "rank")
+    calls = []
+    thread, outcome = _blocked_run(coordinator, "rank", calls)
+
+    other.finish({"status": "ran there"})
+    thread.join(5)
+    assert outcome["result"] == ({"status": "ran there"}, True)
+    assert calls == []
+
+
+@needs_flock
+@pytest.mark.parametrize("left_result", [False, True], ids=["holder died", "stale result"])
+def test_runs_itself_when_the_holder_left_no_fresh_result(tmp_path, left_result):
+    coordinator = RunCoordinator(lock_dir=str(tmp_path))
+    other = OtherProcess(coordinator, "rank")
+    calls = []
+    thread, outcome = _blocked_run(coordinator, "rank", calls)
+
+    if left_result:
+        other.finish({"status": "old"}, finished_at=1.0)  # finished before this caller started waiting
+    else:
+        other.finish()
+    thread.join(5)
+    assert outcome["result"] == ({"status": "ran here"}, False)
+    assert calls == [1]
+    with open(other.result_path) as f:
+        assert json.load(f)["result"] == {"status": "ran here"}
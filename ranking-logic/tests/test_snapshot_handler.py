@@ -0,0 +1,127 @@
+"""
+Snapshot dumps: the incremental JSON array reader across chunk boundaries, gzip and NDJSON
+round trips, rejection of malformed arrays, and the update plan written and applied
+"""
+
+import gzip
+import json
+
+import pytest
+
+from database import snapshot_handler
+from database.snapshot_handler import (REMOVED_ANSWER_IDS, SnapshotDatabaseHandler, apply_plan, read_snapshot,
+                                       write_snapshot)
+
+
+def _question(qid, *answers):
+    return {"_id": qid, "question": f"Qué es {qid}? \"quoted\" \\ back", "questionType": "Input",
+            "timesAnswered": 12345678901234,
+            "answers": [{"_id": f"{qid}-{a}", "answer": a, "isCorrect": True, "responseCount": 7 * i,
+                         "rank": i, "score": 1.5} for i, a in enumerate(answers)]}
+
+
+BANK = [_question("q1", "paris", "lyon"), _question("q2"), _question("q3", "日本", "ok")]
+
+
+@pytest.mark.parametrize("name", ["bank.json", "bank.json.gz", "bank.ndjson", "bank.jsonl.gz"])
+def test_round_trip_at_every_chunk_size(tmp_path, monkeypatch, name):
+    path = str(tmp_path / name)
+    assert write_snapshot(path, iter(BANK)) == 3
+    for chunk_chars in range(1, 65):
+        monkeypatch.setattr(snapshot_handler, "READ_CHUNK_CHARS", chunk_chars)
+        assert list(read_snapshot(path)) == BANK, chunk_chars
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("[]", []),
+    ("  [ 1 ,22,\n333 , -4.5e1 ]  \n", [1, 22, 333, -45.0]),
+    ('[{"a": [1, 2]}, "x", null, true]', [{"a": [1, 2]}, "x", None, True]),
+])
+def test_values_split_anywhere(tmp_path, monkeypatch, text, expected):
+    path = tmp_path / "values.json"
+    path.write_text(text)
+    for chunk_chars in range(1, 65):
+        monkeypatch.setattr(snapshot_handler, "READ_CHUNK_CHARS", chunk_chars)
+        assert list(snapshot_handler._iter_json_array(open(path))) == expected
+
+
+def test_mongoexport_ids_are_unwrapped(tmp_path):
+    path = tmp_path / "export.json.gz"
+    with gzip.open(path, "wt") as f:
+        json.dump([{"_id": {"$oid": "abc"}, "answers": [{"_id": {"$oid": "def"}, "answer": "x"}]}], f)
+    question, = read_snapshot(str(path))
+    assert question["_id"] == "abc" and question["answers"][0]["_id"] == "def"
+
+
+def test_saved_api_response_is_read(tmp_path):
+    path = tmp_path / "response.json"
+    path.write_text(json.dumps({"data": BANK}))
+    assert list(read_snapshot(str(path))) == BANK
+
+
+@pytest.mark.parametrize("text", [
+    '[{"a":1} {"b":2}]',
+    '[{"a":1},,{"b":2}]',
+    '[,{"a":1}]',
+    '[{"a":1},]',
+    '[{"a":1}] trailing',
+    '[{"a":1}][{"b":2}]',
+    '[{"a":1}',
+    '[{"a":1},',
+    '[{"a": }]',
+])
+def test_malformed_arrays_are_rejected(tmp_path, monkeypatch, text):
+    path = tmp_path / "broken.json"
+    path.write_text(text)
+    for chunk_chars in (1, 4, 64):
+        monkeypatch.setattr(snapshot_handler, "READ_CHUNK_CHARS", chunk_chars)
+        with pytest.raises(ValueError, match="broken.json"):
+            list(read_snapshot(str(path)))
+
+
+def test_invalid_ndjson_line_is_rejected(tmp_path):
+    path = tmp_path / "bank.ndjson"
+    path.write_text('{"_id": "q1"}\n{"_id": \n')
+    with pytest.raises(ValueError, match="bank.ndjson:2"):
+        list(read_snapshot(str(path)))
+
+
+class RecordingHandler:
+    """Live-backend stand-in for apply_plan: records batches and the answer ids it is told about"""
+
+    def __init__(self):
+        self.batches = []
+        self.remembered = {}
+
+    def _remember_answer_ids(self, questions):
+        for q in questions:
+            self.remembered[q["questionID"]] = [a["_id"] for a in q["answers"]]
+
+    def bulk_update_questions(self, questions, events=None):
+        self.batches.append([q["questionID"] for q in questions])
+        return {"updated": len(questions), "total": len(questions), "chunks": 1, "failed_chunks": 0}
+
+
+def test_plan_written_from_a_snapshot_is_applied(tmp_path):
+    snapshot = str(tmp_path / "bank.json")
+    write_snapshot(snapshot, BANK)
+    handler = SnapshotDatabaseHandler(snapshot)
+    questions = handler.fetch_all_questions()
+
+    q1 = questions[0]
+    q1["answers"] = q1["answers"][:1]  # "lyon" merged into "paris"
+    q1["answers"][0]["rank"] = 1
+    handler.bulk_update_questions([q1, questions[2]])
+
+    plan = str(tmp_path / "plan.ndjson.gz")
+    assert handler.write_plan(plan) == 2
+
+    live = RecordingHandler()
+    totals = apply_plan(live, plan, batch_size=1)
+    assert totals == {"updated": 2, "total": 2, "chunks": 2, "failed_chunks": 0}
+    assert live.batches == [["q1"], ["q3"]]
+    assert live.remembered == {"q1": ["q1-paris", "q1-lyon"], "q3": ["q3-日本", "q3-ok"]}
+
+    entries = list(snapshot_handler.read_plan(plan))
+    assert entries[0][REMOVED_ANSWER_IDS] == ["q1-lyon"]
+    assert entries[0]["answers"][0]["answerID"] == "q1-paris" and entries[0]["answers"][0]["rank"] == 1
@@ -0,0 +1,135 @@
+"""
+SQLiteMirror: fingerprint sync (insert / update / move / delete), our own writes, sync state
+and filtered reads
+"""
+
+import copy
+
+import pytest
+
+from database.sqlite_mirror import SQLiteMirror
+from utils.partition import Partition
+
+
+def _question(qid, category="Food", level="Easy", counts=(3, 1), qtype="Input"):
+    return {"_id": qid, "questionID": qid, "question": f"question {qid}", "questionType": qtype,
+            "questionCategory": category, "questionLevel": level,
+            "answers": [{"_id": f"{qid}-a{i}", "answer": f"answer {i}", "isCorrect": True,
+                         "responseCount": c, "rank": 0, "score": 0} for i, c in enumerate(counts)]}
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = SQLiteMirror(str(tmp_path / "mirror.db"))
+    yield mirror
+    mirror.close()
+
+
+def test_first_sync_inserts_everything_in_bank_order(mirror):
+    bank = [_question(f"q{i}") for i in range(5)]
+    changes = mirror.sync(bank, etag='W/"1"')
+    assert changes == {"inserted": 5, "updated": 0, "moved": 0, "deleted": 0, "unchanged": 0}
+    assert mirror.load() == bank
+    assert mirror.etag == 'W/"1"'
+    assert mirror.stats()["answers"] == 10
+
+
+def test_resync_rewrites_only_what_changed(mirror):
+    bank = [_question(f"q{i}") for i in range(5)]
+    mirror.sync(bank)
+
+    changed = copy.deepcopy(bank)
+    changed[1]["answers"][0]["responseCount"] += 1   # updated
+    changed[3], changed[4] = changed[4], changed[3]  # q4 moves, q3 lands back on position 3
+    del changed[0]                                   # deleted, q2 moves up
+    changed.append(_question("q9"))                  # inserted
+    changes = mirror.sync(changed, etag='W/"2"')
+
+    assert changes == {"inserted": 1, "updated": 1, "moved": 2, "deleted": 1, "unchanged": 1}
+    assert mirror.load() == changed
+    assert mirror.stats()["questions"] == 5
+
+
+def test_unchanged_resync_writes_nothing(mirror):
+    bank = [_question(f"q{i}") for i in range(3)]
+    mirror.sync(bank)
+    assert mirror.sync(copy.deepcopy(bank))["unchanged"] == 3
+
+
+def test_duplicate_and_id_less_questions_are_skipped(mirror):
+    bank = [_question("q1"), _question("q1", counts=(9,)), {"question": "no id"}]
+    changes = mirror.sync(bank)
+    assert changes["inserted"] == 1
+    assert mirror.load() == [bank[0]]
+
+
+def test_apply_updates_keeps_position_and_appends_new(mirror):
+    bank = [_question("q1"), _question("q2")]
+    mirror.sync(bank, etag='W/"1"')
+    ranked = copy.deepcopy(bank[0])
+    ranked["answers"][0]["rank"] = 1
+    assert mirror.apply_updates([ranked, _question("q3")]) == 2
+    assert [q["_id"] for q in mirror.load()] == ["q1", "q2", "q3"]
+    assert mirror.load(question_ids=["q1"])[0]["answers"][0]["rank"] == 1
+    assert mirror.etag == 'W/"1"'  # only a full sync moves the sync state
+
+
+def test_freshness_and_invalidate(mirror):
+    assert not mirror.is_fresh(60)
+    mirror.sync([_question("q1")], etag='W/"1"')
+    assert mirror.is_fresh(60)
+    assert not mirror.is_fresh(0)
+    mirror.invalidate()
+    assert mirror.etag is None and not mirror.is_fresh(60)
+
+
+def test_filters_match_partition_semantics(mirror):
+    bank = [_question("q1", category="Música"), _question("q2", category="MÚSICA", level="Hard"),
+            _question("q3", category=" música"), _question("q4", category="Music")]
+    mirror.sync(bank)
+    for value in ("música", " MÚSICA ", "music"):
+        partition = Partition(category=value)
+        assert mirror.load(category=partition.category) == partition.apply(bank)
+    assert [q["_id"] for q in mirror.load(category="música", level="hard")] == ["q2"]
+    assert [q["_id"] for q in mirror.load(question_ids=["q4", "q1", "nope"])] == ["q1", "q4"]
+
+
+def test_preview_candidates_decode_only_rankable_questions(mirror):
+    bank = [_question("q1", counts=(3, 1)), _question("q2", counts=(40, 30)),
+            _question("q3", counts=(40, 30, 1, 1), qtype="MCQ")]
+    mirror.sync(bank)
+    rows = {row["_id"]: row for row in mirror.preview_candidates(min_responses=10)}
+    assert rows["q1"]["rankable"] is False and "answers" not in rows["q1"]
+    assert rows["q1"]["totalCorrect"] == 4
+    assert rows["q2"]["rankable"] is True and rows["q2"]["answers"] == bank[1]["answers"]
+    assert rows["q3"]["rankable"] is False and rows["q3"]["answerCount"] == 4
+
+
+def test_outdated_schema_is_rebuilt(tmp_path):
+    path = str(tmp_path / "old.db")
+    mirror = SQLiteMirror(path)
+    mirror.sync([_question("q1")])
+    mirror._conn.execute("PRAGMA user_version = 1")
+    mirror.close()
+
+    reopened = SQLiteMirror(path)
+    assert reopened.stats()["questions"] == 0 and reopened.etag is None
+    reopened.close()
+
+
+def test_data_version_changes_only_with_the_bank(mirror):
+    assert mirror.data_version is None
+    bank = [_question("q1"), _question("q2")]
+    mirror.sync(bank)
+    version = mirror.data_version
+    assert version
+
+    mirror.sync(copy.deepcopy(bank))
+    assert mirror.data_version == version
+
+    mirror.apply_updates([_question("q1", counts=(9, 1))])
+    assert mirror.data_version != version
+    version = mirror.data_version
+
+    mirror.sync(bank[:1])
+    assert mirror.data_version != version
@@ -3,10 +3,12 @@ Clean and Enhanced API communication handler
 """
 
 import json
+import time
 import requests
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from constants import HTTPStatus, Defaults, LogMessages, ErrorMessages
+from utils.metrics import HTTP_CLIENT_SECONDS, HTTP_CLIENT_PAYLOAD_BYTES
 
 logger = logging.getLogger('survey_analytics')
 
@@ -266,14 +268,14 @@ class APIHandler:
     def _log_request_details(self, method: str, data: Optional[Dict] = None) -> None:
         """Log request details for debugging - only in debug mode"""
         if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"→ {method} {self.url}")
+            logger.debug("→ %s %s", method, self.url)
             if data:
-                logger.debug(f"→ Data: {list(data.keys()) if isinstance(data, dict) else 'Invalid'}")
+                logger.debug("→ Data: %s", list(data.keys()) if isinstance(data, dict) else 'Invalid')
     
     def _log_response_details(self, response: requests.Response) -> None:
         """Log response details for debugging - only in debug mode"""
         if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"← {response.status_code} ({len(response.text)} chars)")
+            logger.debug("← %s (%d chars)", response.status_code, len(response.text))
     
     def _parse_json_response(self, response: requests.Response) -> Dict:
         """Parse JSON response with minimal logging"""
@@ -284,7 +286,7 @@ class APIHandler:
             if logger.isEnabledFor(logging.DEBUG):
                 analysis = self._analyze_response_for_issues(response_data)
                 if analysis["has_issues"]:
-                    logger.debug(f"⚠️ Response issues: {len(analysis['issues'])} found")
+                    logger.debug("⚠️ Response issues: %d found", len(analysis['issues']))
             
             return response_data
             
@@ -292,21 +294,35 @@ class APIHandler:
             logger.error(f"❌ Invalid JSON response")
             raise APIException(f"Invalid JSON response: {str(e)}")
     
-    def _make_http_request(self, method: str, data: Optional[Dict] = None) -> requests.Response:
+    def _record_call(self, method: str, endpoint: Optional[str], start: float,
+                     response: Optional[requests.Response] = None) -> None:
+        """Record latency and payload size of one outbound call (the body requests already encoded)"""
+        endpoint = endpoint or self.endpoint
+        status = response.status_code if response is not None else "error"
+        HTTP_CLIENT_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=method, status=status)
+        body = getattr(getattr(response, "request", None), "body", None)
+        if body:
+            HTTP_CLIENT_PAYLOAD_BYTES.observe(len(body), endpoint=endpoint, method=method)
+    
+    def _make_http_request(self, method: str, data: Optional[Dict] = None,
+                           extra_headers: Optional[Dict[str, str]] = None) -> requests.Response:
         """Make HTTP request with clean error handling - now supports DELETE"""
+        method_upper = method.upper()
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
+        start = time.perf_counter()
+        response = None
         try:
-            method_upper = method.upper()
-            
             if method_upper == "GET":
-                return requests.get(self.url, headers=self.headers, timeout=self.timeout)
+                response = requests.get(self.url, headers=headers, timeout=self.timeout)
             elif method_upper == "PUT":
-                return requests.put(self.url, headers=self.headers, json=data, timeout=self.timeout)
+                response = requests.put(self.url, headers=headers, json=data, timeout=self.timeout)
             elif method_upper == "POST":
-                return requests.post(self.url, headers=self.headers, json=data, timeout=self.timeout)
+                response = requests.post(self.url, headers=headers, json=data, timeout=self.timeout)
             elif method_upper == "DELETE":
-                return requests.delete(self.url, headers=self.headers, json=data, timeout=self.timeout)
+                response = requests.delete(self.url, headers=headers, json=data, timeout=self.timeout)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
+            return response
         
         except requests.exceptions.Timeout:
             logger.error(f"❌ Request timeout after {self.timeout}s")
@@ -319,6 +335,28 @@ class APIHandler:
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Request failed: {str(e)}")
             raise APIException(f"Request failed: {str(e)}")
+        
+        finally:
+            self._record_call(method_upper, None, start, response)
+    
+    def _handle_response(self, method: str, response: requests.Response) -> Dict:
+        """Turn a response into parsed JSON, an empty-database marker or an APIException"""
+        self._log_response_details(response)
+        
+        # Special handling for 404 on GET requests (likely empty database)
+        if response.status_code == HTTPStatus.NOT_FOUND and method.upper() == "GET":
+            if self._is_likely_empty_database_404(response.text):
+                logger.info("📭 No data found - returning empty result")
+                return self._handle_404_as_empty_database()
+            else:
+                # Real 404 error
+                self._handle_error_status(response.status_code, response.text)
+        
+        # Check for other error status codes
+        elif response.status_code not in [HTTPStatus.OK, HTTPStatus.CREATED]:
+            self._handle_error_status(response.status_code, response.text)
+        
+        return self._parse_json_response(response)
     
     def make_request(self, method: str, data: Optional[Dict] = None) -> Dict:
         """Make HTTP request with clean, minimal logging"""
@@ -326,22 +364,27 @@ class APIHandler:
         
         try:
             response = self._make_http_request(method, data)
-            self._log_response_details(response)
-            
-            # Special handling for 404 on GET requests (likely empty database)
-            if response.status_code == HTTPStatus.NOT_FOUND and method.upper() == "GET":
-                if self._is_likely_empty_database_404(response.text):
-                    logger.info("📭 No data found - returning empty result")
-                    return self._handle_404_as_empty_database()
-                else:
-                    # Real 404 error
-                    self._handle_error_status(response.status_code, response.text)
+            return self._handle_response(method, response)
             
-            # Check for other error status codes
-            elif response.status_code not in [HTTPStatus.OK, HTTPStatus.CREATED]:
-                self._handle_error_status(response.status_code, response.text)
-            
-            return self._parse_json_response(response)
+        except APIException:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Unexpected error: {str(e)}")
+            raise APIException(f"Unexpected error: {str(e)}")
+    
+    def get_if_changed(self, etag: Optional[str]) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Conditional GET (If-None-Match). Returns (None, etag) when the backend answers
+        304 Not Modified, otherwise (parsed body like make_request, the response's ETag).
+        """
+        self._log_request_details("GET")
+        
+        try:
+            response = self._make_http_request("GET", extra_headers={"If-None-Match": etag} if etag else None)
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                self._log_response_details(response)
+                return None, etag
+            return self._handle_response("GET", response), response.headers.get("ETag")
             
         except APIException:
             raise
@@ -407,12 +450,20 @@ class APIHandler:
 
     def _request(self, method: str, json: Optional[Dict] = None, endpoint: Optional[str] = None):
         url = self._full_url(endpoint)
-        logger.debug(f"→ {method} {url}")
-        if isinstance(json, dict):
-            logger.debug(f"→ Data: {list(json.keys())}")
-        resp = requests.request(method, url, headers=self._headers(), json=json, timeout=30)
-        body_len = len(resp.text or "")
-        logger.debug(f"← {resp.status_code} ({body_len} chars)")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("→ %s %s", method, url)
+            if isinstance(json, dict):
+                logger.debug("→ Data: %s", list(json.keys()))
+        start = time.perf_counter()
+        resp = None
+        try:
+            resp = requests.request(method, url, headers=self._headers(), json=json, timeout=30)
+        finally:
+            self._record_call(method, endpoint, start, resp)
+        if debug:
+            # resp.text decodes the whole body; only pay for that when it is logged
+            logger.debug("← %s (%d chars)", resp.status_code, len(resp.text or ""))
         if resp.status_code >= 400:
             preview = resp.text[:2000]
             logger.error(f"[API ERROR] {method} {url} -> {resp.status_code}\n{preview}")
@@ -0,0 +1,94 @@
+"""
+Event Stream - turns a job's run events into a Server-Sent Events or NDJSON response body
+"""
+
+import json
+import logging
+import queue
+from typing import Dict, Iterator
+
+logger = logging.getLogger('survey_analytics')
+
+FORMAT_SSE = "sse"
+FORMAT_NDJSON = "ndjson"
+END_EVENT = "job_finished"
+
+
+class EventStream:
+    """
+    Subscribes to a job's RunEvents and yields each event as it happens. The pipeline thread
+    only does a non-blocking put; when a slow client lets the buffer fill up, further events
+    are dropped (and counted) rather than stalling the run. The final job_finished event is never
+    dropped: it evicts the oldest buffered events instead. A heartbeat is sent while the
+    pipeline is quiet so proxies keep the connection open.
+    """
+
+    def __init__(self, job, fmt: str = FORMAT_SSE, max_buffer: int = 10000, heartbeat: float = 15.0):
+        self.job = job
+        self.fmt = fmt
+        self.heartbeat = heartbeat
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_buffer)
+        self._callback = job.events.subscribe(self._enqueue)
+
+    def _enqueue(self, event: Dict) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                if event["event"] != END_EVENT:
+                    self.dropped += 1
+                    return
+            # The end of the stream must get through: evict the oldest buffered event for it
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    def _end_event(self) -> Dict:
+        """job_finished built from the job itself, for a job that is already over"""
+        return {"event": END_EVENT, "job_id": self.job.id, "state": self.job.state, "error": self.job.error}
+
+    def _encode(self, event: Dict) -> str:
+        body = json.dumps(event, default=str)
+        if self.fmt == FORMAT_NDJSON:
+            return body + "\n"
+        return f"event: {event['event']}\ndata: {body}\n\n"
+
+    def _keepalive(self) -> str:
+        if self.fmt == FORMAT_NDJSON:
+            return self._encode({"event": "heartbeat", **self.job.to_dict(include_result=False)["progress"]})
+        return ": heartbeat\n\n"
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            # Subscribed before this check, so a job finishing now is seen one way or the other
+            finished = not self.job.active
+            yield self._encode({"event": "snapshot", "job": self.job.to_dict(include_result=False)})
+            if finished:
+                yield self._encode(self._end_event())
+                return
+            while True:
+                try:
+                    event = self._queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    if not self.job.active:
+                        # The job ended without its event reaching us: finish from its state
+                        event = self._end_event()
+                    else:
+                        yield self._keepalive()
+                        continue
+                if event["event"] == END_EVENT:
+                    event["dropped"] = self.dropped
+                yield self._encode(event)
+                if event["event"] == END_EVENT:
+                    return
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.job.events.unsubscribe(self._callback)
+        if self.dropped:
+            logger.warning(f"⚠️ Event stream for job {self.job.id} dropped {self.dropped} events (slow client)")
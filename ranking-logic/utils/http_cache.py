@@ -0,0 +1,165 @@
+"""
+HTTP Cache - fingerprint-keyed response cache with ETag / 304 revalidation and gzip / br bodies
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from flask import Response
+
+from config.settings import Config
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+logger = logging.getLogger('survey_analytics')
+
+JSON_MIMETYPE = "application/json"
+
+
+def dataset_fingerprint(items: Iterable) -> str:
+    """Digest of a dataset (e.g. the fetched question bank); equal data gives an equal fingerprint"""
+    h = hashlib.blake2b(digest_size=20)
+    for item in items or []:
+        h.update(repr(item).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    return accepted
+
+
+class CachedBody:
+    """One encoded response body, its ETag and lazily built compressed variants"""
+
+    def __init__(self, body: bytes, etag: str, mimetype: str = JSON_MIMETYPE,
+                 cache_control: str = "no-cache", min_compress_bytes: int = 1024):
+        self.body = body
+        self.etag = etag
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.min_compress_bytes = min_compress_bytes
+        self.created_at = time.time()
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _variant(self, encoding: str) -> bytes:
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == "br":
+                    data = brotli.compress(self.body, quality=5)
+                else:
+                    data = gzip.compress(self.body, compresslevel=6)
+                self._encoded[encoding] = data
+            return data
+
+    def _pick_encoding(self, accept_encoding: str) -> Optional[str]:
+        if len(self.body) < self.min_compress_bytes:
+            return None
+        accepted = _accepted_encodings(accept_encoding)
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def matches(self, if_none_match: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.replace("W/", "", 1) == self.etag for tag in tags)
+
+    def response(self, request, status: int = 200) -> Response:
+        """304 when the client already has this version, else the (compressed) body"""
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if self.matches(request.headers.get("If-None-Match", "")):
+            return Response(status=304, headers=headers)
+
+        encoding = self._pick_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(self._variant(encoding), status=status, mimetype=self.mimetype, headers=headers)
+        return Response(self.body, status=status, mimetype=self.mimetype, headers=headers)
+
+
+class ResponseCache:
+    """
+    Responses keyed by route and dataset fingerprint. A body is serialized (and compressed) once
+    per dataset version; when the fingerprint is unchanged the stored bytes are reused and
+    clients holding the ETag get 304. Within `ttl` seconds of being built, a response is served
+    without even loading the dataset - invalidate() ends that window after our own writes.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, min_compress_bytes: int = 1024):
+        self.ttl = Config.RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.min_compress_bytes = min_compress_bytes
+        self._entries: Dict[str, tuple] = {}  # key -> (fingerprint, generation, CachedBody)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self) -> None:
+        """The dataset was just written: stop serving entries without re-checking the fingerprint"""
+        with self._lock:
+            self._generation += 1
+
+    def fresh(self, key: str) -> Optional[CachedBody]:
+        """Entry still inside its ttl window, servable without loading the dataset"""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] == self._generation and time.time() - entry[2].created_at < self.ttl:
+                self.hits += 1
+                return entry[2]
+        return None
+
+    def get(self, key: str, fingerprint: str) -> Optional[CachedBody]:
+        """Entry built from the same dataset version; restarts its ttl window"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == fingerprint:
+                self.hits += 1
+                entry[2].created_at = time.time()
+                self._entries[key] = (fingerprint, self._generation, entry[2])
+                return entry[2]
+            self.misses += 1
+        return None
+
+    def put(self, key: str, fingerprint: str, payload: Dict) -> CachedBody:
+        body = json.dumps(payload, default=str, separators=(",", ":")).encode()
+        etag = '"' + hashlib.blake2b(f"{key}:{fingerprint}".encode(), digest_size=16).hexdigest() + '"'
+        cached = CachedBody(body, etag, min_compress_bytes=self.min_compress_bytes)
+        with self._lock:
+            self._entries[key] = (fingerprint, self._generation, cached)
+        return cached
+
+
+def static_body(content: str, mimetype: str, max_age: int = 300) -> CachedBody:
+    """A body built once at startup (e.g. the debug UI page), revalidated by content hash"""
+    body = content.encode()
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return CachedBody(body, etag, mimetype=mimetype, cache_control=f"public, max-age={max_age}")
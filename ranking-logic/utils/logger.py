@@ -2,18 +2,66 @@
 Refactored Logger - Clean and consistent logging setup
 """
 
+import atexit
+import copy
+import itertools
+import json
 import logging
+import queue
 import sys
-from typing import Optional
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
 from config.settings import Config
 
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers (LOG_FORMAT=json)"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogQueueHandler(QueueHandler):
+    """
+    Enqueues a picklable copy of the record for the listener thread. Only the message is
+    interpolated here; the traceback stays in exc_text so the listener's formatter (text or
+    JSON) still renders it separately.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
 class LoggerFormatter:
     """Handles log formatting based on configuration"""
     
     @staticmethod
     def get_formatter(log_level: str) -> logging.Formatter:
         """Get appropriate formatter based on log level"""
+        if Config.LOG_FORMAT == 'json':
+            return JsonFormatter()
         if log_level.upper() == 'DEBUG':
             return LoggerFormatter._get_debug_formatter()
         else:
@@ -36,6 +84,108 @@ class LoggerFormatter:
         )
 
 
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keeps the last `capacity` log records in memory for /api/logs.
+
+    Records are stored as-is with a sequence number and only formatted when read, so logging
+    costs one append to a bounded deque. The deque and the counter are safe to use from many
+    threads without the handler lock, so handle() skips it.
+    """
+    
+    def __init__(self, capacity: int = 2000):
+        super().__init__()
+        self.capacity = capacity
+        self._records: deque = deque(maxlen=capacity)
+        self._sequence = itertools.count(1)
+    
+    def handle(self, record: logging.LogRecord) -> bool:
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        self._records.append((next(self._sequence), record))
+    
+    def _snapshot(self) -> List:
+        while True:
+            try:
+                return list(self._records)
+            except RuntimeError:  # appended to while copying; try again
+                continue
+    
+    def read(self, since: Optional[int] = None, level: Optional[int] = None, start: Optional[float] = None,
+             end: Optional[float] = None, limit: int = 200) -> Dict:
+        """
+        Records at or above `level`, created within [start, end], oldest first. Without `since`
+        the latest `limit` records are returned; with it, the first `limit` records after that
+        cursor. Returns the entries, the cursor to poll with next, whether more records are waiting
+        (has_more) and whether records after `since` were already evicted (missed).
+        """
+        snapshot = self._snapshot()
+        oldest = snapshot[0][0] if snapshot else None
+        selected = []
+        for seq, record in snapshot:
+            if since is not None and seq <= since:
+                continue
+            if level is not None and record.levelno < level:
+                continue
+            if start is not None and record.created < start:
+                continue
+            if end is not None and record.created > end:
+                continue
+            selected.append((seq, record))
+        
+        truncated = len(selected) > limit
+        if since is None:
+            # First poll: the most recent records; later polls page forward from the cursor
+            selected = selected[-limit:]
+            cursor = snapshot[-1][0] if snapshot else 0
+            truncated = False
+        else:
+            selected = selected[:limit]
+            cursor = selected[-1][0] if truncated else (snapshot[-1][0] if snapshot else since)
+        return {
+            "logs": [self._to_entry(seq, record) for seq, record in selected],
+            "cursor": cursor,
+            "has_more": truncated,
+            "missed": since is not None and oldest is not None and oldest > since + 1,
+        }
+    
+    def _to_entry(self, seq: int, record: logging.LogRecord) -> Dict:
+        try:
+            message = record.getMessage()
+        except Exception as e:
+            message = f"{record.msg} (unformattable args: {str(e)})"
+        entry = {
+            "id": seq,
+            "timestamp": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+        return entry
+
+
+_log_buffer: Optional[RingBufferHandler] = None
+_listeners: Dict[str, QueueListener] = {}
+
+
+def get_log_buffer() -> RingBufferHandler:
+    """Process-wide ring buffer behind /api/logs; survives setup_logger being called again"""
+    global _log_buffer
+    if _log_buffer is None:
+        _log_buffer = RingBufferHandler(Config.LOG_BUFFER_SIZE)
+    return _log_buffer
+
+
 class LoggerConfig:
     """Handles logger configuration"""
     
@@ -48,15 +198,36 @@ class LoggerConfig:
         # Remove existing handlers to avoid duplicates
         LoggerConfig._remove_existing_handlers(logger)
         
-        # Add new console handler
+        # Add new console handler; with LOG_ASYNC the caller only enqueues the record and a
+        # listener thread formats and writes it
         console_handler = LoggerConfig._create_console_handler(log_level)
-        logger.addHandler(console_handler)
+        if Config.LOG_ASYNC:
+            logger.addHandler(LoggerConfig._start_queue_listener(logger.name, console_handler))
+        else:
+            logger.addHandler(console_handler)
+        
+        # Keep recent records in memory for /api/logs
+        if Config.LOG_BUFFER_SIZE > 0:
+            logger.addHandler(get_log_buffer())
     
     @staticmethod
     def _remove_existing_handlers(logger: logging.Logger) -> None:
         """Remove existing handlers to avoid duplicates"""
         for handler in logger.handlers[:]:
             logger.removeHandler(handler)
+        
+        listener = _listeners.pop(logger.name, None)
+        if listener is not None:
+            listener.stop()
+    
+    @staticmethod
+    def _start_queue_listener(name: str, handler: logging.Handler) -> QueueHandler:
+        """Run `handler` on a background listener thread fed by the returned QueueHandler"""
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        listener = QueueListener(records, handler, respect_handler_level=True)
+        listener.start()
+        _listeners[name] = listener
+        return LogQueueHandler(records)
     
     @staticmethod
     def _create_console_handler(log_level: str) -> logging.StreamHandler:
@@ -93,6 +264,16 @@ class LoggerInitializer:
         logger.debug(f"Scoring values: {Config.SCORING_VALUES}")
 
 
+def stop_log_listeners() -> None:
+    """Flush queued records and stop the listener threads (registered with atexit)"""
+    while _listeners:
+        _, listener = _listeners.popitem()
+        listener.stop()
+
+
+atexit.register(stop_log_listeners)
+
+
 def setup_logger(logger_name: Optional[str] = None) -> logging.Logger:
     """
     Setup console logging with configurable level and enhanced formatting
@@ -0,0 +1,91 @@
+"""
+Partition - the slice of the question bank a scoped run works on (category, level, question ids)
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from constants import QuestionFields
+from utils.data_formatters import QuestionFormatter
+
+
+def match_key(value) -> str:
+    """
+    The form category / level values are compared in: Unicode case-folded. Filter values are
+    also trimmed when the Partition is built; stored values are compared as stored, on every
+    backend (the SQLite mirror indexes this key, Mongo narrows with a case-insensitive
+    collation and re-checks with matches())
+    """
+    return str(value or "").casefold()
+
+
+class Partition:
+    """
+    Filters on questionCategory, questionLevel and a question-id list; a question must match
+    every filter given. Category and level compare case-insensitively (see match_key). An
+    empty partition is the whole bank.
+
+    Handlers that can filter at the source expose fetch_partition(partition); everything
+    else fetches the bank and filters it with apply().
+    """
+
+    def __init__(self, category: Optional[str] = None, level: Optional[str] = None,
+                 question_ids: Optional[Iterable[str]] = None):
+        self.category = (category or "").strip() or None
+        self.level = (level or "").strip() or None
+        ids = [str(i).strip() for i in question_ids or [] if str(i).strip()]
+        self.question_ids: Optional[List[str]] = list(dict.fromkeys(ids)) if question_ids is not None else None
+        self._ids = set(self.question_ids or [])
+
+    @classmethod
+    def from_mapping(cls, values: Dict) -> "Partition":
+        """From query args / a JSON body: category, level and ids (a list or a comma-separated string)"""
+        ids = values.get("ids", values.get("question_ids"))
+        if isinstance(ids, str):
+            ids = ids.split(",") if ids.strip() else None
+        return cls(category=values.get("category"), level=values.get("level"), question_ids=ids)
+
+    @property
+    def empty(self) -> bool:
+        return self.category is None and self.level is None and self.question_ids is None
+
+    def matches(self, question: Dict) -> bool:
+        if self.category is not None and match_key(question.get(QuestionFields.QUESTION_CATEGORY)) != match_key(self.category):
+            return False
+        if self.level is not None and match_key(question.get(QuestionFields.QUESTION_LEVEL)) != match_key(self.level):
+            return False
+        if self.question_ids is not None and QuestionFormatter.get_question_id(question) not in self._ids:
+            return False
+        return True
+
+    def apply(self, questions: Iterable[Dict]) -> List[Dict]:
+        if self.empty:
+            return list(questions)
+        return [q for q in questions if self.matches(q)]
+
+    @property
+    def key(self) -> str:
+        """Stable short form for run / job / cache keys ("" for the whole bank)"""
+        parts = []
+        if self.category is not None:
+            parts.append(f"category={match_key(self.category)}")
+        if self.level is not None:
+            parts.append(f"level={match_key(self.level)}")
+        if self.question_ids is not None:
+            digest = hashlib.blake2b(",".join(sorted(self.question_ids)).encode(), digest_size=4).hexdigest()
+            parts.append(f"ids={len(self.question_ids)}#{digest}")
+        return ",".join(parts)
+
+    def scoped(self, name: str) -> str:
+        """'process_ranking' -> 'process_ranking[category=food]' for a partition, unchanged for the whole bank"""
+        return f"{name}[{self.key}]" if not self.empty else name
+
+    def describe(self) -> Dict:
+        return {"category": self.category, "level": self.level,
+                "question_ids": len(self.question_ids) if self.question_ids is not None else None}
+
+    def __repr__(self) -> str:
+        return f"Partition({self.key or 'all'})"
+
+
+ALL = Partition()
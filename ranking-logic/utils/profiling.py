@@ -0,0 +1,184 @@
+"""
+Profiling - opt-in cProfile + tracemalloc capture of one ranking / publishing run
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from config.settings import Config
+from utils.run_events import RunEvents
+
+logger = logging.getLogger('survey_analytics')
+
+T = TypeVar("T")
+
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+# cProfile and tracemalloc are process-wide hooks: one profiled run at a time
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    """Another profiled run is already in progress"""
+
+
+class _StageMemory:
+    """Peak traced memory per pipeline stage, fed by the run's stage_start / stage_end events"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+        self.peak = 0  # run-wide peak seen before each reset_peak()
+        self._open: List[List] = []  # [name, current at start, peak so far]
+
+    def __call__(self, event: Dict) -> None:
+        kind = event["event"]
+        if kind == "stage_start":
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak() below would lose the enclosing stages' (and the run's) peak: fold it in first
+            for entry in self._open:
+                entry[2] = max(entry[2], peak)
+            self.peak = max(self.peak, peak)
+            tracemalloc.reset_peak()
+            self._open.append([event["stage"], current, current])
+        elif kind == "stage_end" and self._open:
+            current, peak = tracemalloc.get_traced_memory()
+            name, start, stage_peak = self._open.pop()
+            for entry in self._open:
+                entry[2] = max(entry[2], peak)
+            self.stages[name] = {
+                "peak_bytes": max(stage_peak, peak),
+                "peak_above_start_bytes": max(stage_peak, peak) - start,
+                "retained_bytes": current - start,
+                "duration": event.get("duration"),
+            }
+
+
+class RunProfiler:
+    """
+    Runs a pipeline function under cProfile and tracemalloc and reports the top functions,
+    peak memory per stage and the largest allocation sites, optionally writing the pstats dump
+    to `output_dir` (load it with `python -m pstats` or snakeviz).
+
+    Nothing is hooked until profile() is called, so unprofiled runs pay nothing. cProfile only
+    sees the calling thread: work on the publish upload pool shows up as time spent waiting
+    on its futures.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None, top: Optional[int] = None, sort: str = "cumulative"):
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        self.output_dir = Config.PROFILE_DIR if output_dir is None else output_dir
+        self.top = top or Config.PROFILE_TOP
+        self.sort = sort
+
+    def profile(self, label: str, fn: Callable[[RunEvents], T],
+                events: Optional[RunEvents] = None) -> Tuple[T, Dict]:
+        """Call fn(events) under the profilers. Returns (fn's result, report)."""
+        if not _profile_lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profiled run is already in progress")
+        try:
+            return self._profile(label, fn, events or RunEvents())
+        finally:
+            _profile_lock.release()
+
+    def _profile(self, label: str, fn: Callable[[RunEvents], T], events: RunEvents) -> Tuple[T, Dict]:
+        stage_memory = _StageMemory()
+        events.subscribe(stage_memory)
+        owns_tracemalloc = not tracemalloc.is_tracing()
+        if owns_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile()
+
+        logger.info(f"🔬 Profiling {label} run (cProfile + tracemalloc)")
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                result = fn(events)
+            finally:
+                profiler.disable()
+            wall = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, stage_memory.peak)
+            allocations = tracemalloc.take_snapshot().statistics("lineno")[:10]
+        finally:
+            events.unsubscribe(stage_memory)
+            if owns_tracemalloc:
+                tracemalloc.stop()
+
+        report = {
+            "label": label,
+            "wall_seconds": round(wall, 4),
+            "sort": self.sort,
+            "top_functions": self._top_functions(profiler),
+            "memory": {
+                "peak_bytes": peak,
+                "peak_above_start_bytes": peak - baseline,
+                "retained_bytes": current - baseline,
+                "stages": stage_memory.stages,
+                "top_allocations": [
+                    {"site": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+                    for stat in allocations
+                ],
+            },
+            "pstats_path": self._dump(profiler, label),
+        }
+        logger.info(f"🔬 Profiled {label} run in {report['wall_seconds']}s, peak memory {peak / 1048576:.1f} MiB")
+        return result, report
+
+    def _top_functions(self, profiler: cProfile.Profile) -> List[Dict]:
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        field = {"cumulative": 3, "tottime": 2, "ncalls": 1}[self.sort]
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][field], reverse=True)[:self.top]
+        return [
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "ncalls": ncalls,
+                "primitive_calls": primitive,
+                "tottime": round(tottime, 6),
+                "cumtime": round(cumtime, 6),
+            }
+            for (filename, line, name), (primitive, ncalls, tottime, cumtime, _) in rows
+        ]
+
+    def _dump(self, profiler: cProfile.Profile, label: str) -> Optional[str]:
+        if not self.output_dir:
+            return None
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}.pstats")
+            profiler.dump_stats(path)
+            return path
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write profile dump to {self.output_dir}: {str(e)}")
+            return None
+
+
+def format_report(report: Dict) -> str:
+    """Plain-text rendering of a profile report for the CLI"""
+    memory = report["memory"]
+    lines = [
+        f"🔬 Profile of {report['label']} run: {report['wall_seconds']}s, "
+        f"peak memory {memory['peak_bytes'] / 1048576:.1f} MiB",
+        f"Top functions by {report['sort']}:",
+        f"  {'ncalls':>10} {'tottime':>10} {'cumtime':>10}  function",
+    ]
+    for row in report["top_functions"]:
+        lines.append(f"  {row['ncalls']:>10} {row['tottime']:>10.4f} {row['cumtime']:>10.4f}  {row['function']}")
+    if memory["stages"]:
+        lines.append("Peak memory per stage:")
+        for stage, data in memory["stages"].items():
+            lines.append(f"  {stage:<20} peak {data['peak_bytes'] / 1048576:8.1f} MiB  "
+                         f"(+{data['peak_above_start_bytes'] / 1048576:.1f} MiB over stage start)")
+    if report.get("pstats_path"):
+        lines.append(f"pstats dump: {report['pstats_path']}")
+    return "\n".join(lines)
@@ -0,0 +1,153 @@
+"""
+Run Coordinator - single-flight execution of ranking / publishing runs, within one process
+and (with RUN_LOCK_DIR) across worker processes sharing a directory
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from config.settings import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, coordination stays process-local
+    fcntl = None
+
+logger = logging.getLogger('survey_analytics')
+
+
+class _Flight:
+    """One in-flight run that other callers can join"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+        self.error: Optional[BaseException] = None
+
+
+class RunCoordinator:
+    """
+    Makes sure only one run per key executes at a time. A caller that arrives while a run of
+    the same key is in flight waits for it and gets its result instead of starting another.
+
+    Within a process this is an in-memory table of flights. With a lock directory, the run also
+    holds an exclusive flock on `<lock_dir>/<key>.lock` and leaves its result in
+    `<key>.result.json`, so a caller in another worker process blocks on the lock and then reads
+    the result the holder wrote instead of running the pipeline a second time.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        self.lock_dir = Config.RUN_LOCK_DIR if lock_dir is None else lock_dir
+        if self.lock_dir and fcntl is None:
+            logger.warning("⚠️ RUN_LOCK_DIR set but file locks are not supported here - runs are single-flight per process only")
+            self.lock_dir = ""
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._flights
+
+    def run(self, key: str, fn: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        """
+        Run fn() as the only run of `key`, or join the one in flight.
+        Returns (result, joined); an exception raised by the run is re-raised in every joiner.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            logger.info(f"🔗 {key} run already in flight - waiting for its result")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        joined = False
+        try:
+            flight.result, joined = self._run_locked(key, fn)
+            return flight.result, joined
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    # ---- cross-process -----------------------------------------------------
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+        return os.path.join(self.lock_dir, f"{safe}.lock"), os.path.join(self.lock_dir, f"{safe}.result.json")
+
+    def _run_locked(self, key: str, fn: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        if not self.lock_dir:
+            return fn(), False
+
+        lock_path, result_path = self._paths(key)
+        with open(lock_path, "a+") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is running it: wait for that run and take its result
+                waiting_since = time.time()
+                logger.info(f"🔗 {key} run in flight in another process - waiting for its result")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    shared = self._read_result(result_path, waiting_since)
+                    if shared is not None:
+                        return shared, True
+                    # Holder died or left no result: run it ourselves while we hold the lock
+                    return self._run_and_share(fn, result_path), False
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+            try:
+                return self._run_and_share(fn, result_path), False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _run_and_share(self, fn: Callable[[], Dict], result_path: str) -> Dict:
+        started_at = time.time()
+        result = fn()
+        try:
+            self._write_result(result_path, {"started_at": started_at, "finished_at": time.time(), "result": result})
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Could not share run result at {result_path}: {str(e)}")
+        return result
+
+    @staticmethod
+    def _read_result(path: str, waiting_since: float) -> Optional[Dict]:
+        """Result of the run we waited for: one that finished after we started waiting"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("finished_at", 0) < waiting_since:
+            return None
+        return data.get("result")
+
+    @staticmethod
+    def _write_result(path: str, data: Dict) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".run_result_", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
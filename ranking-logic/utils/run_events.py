@@ -0,0 +1,76 @@
+"""
+Run events - lightweight progress and stage-timing hooks for ranking / publishing runs
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from utils.metrics import STAGE_SECONDS
+
+logger = logging.getLogger('survey_analytics')
+
+EventCallback = Callable[[Dict], None]
+
+
+class RunEvents:
+    """
+    Event sink for one run. Services call emit() / stage() / progress() as the pipeline
+    advances; whoever started the run (a background job, a stream) subscribes to them.
+    Emitting with no subscribers returns immediately, so the hooks are free when unused.
+    """
+
+    def __init__(self):
+        self._subscribers: List[EventCallback] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: EventCallback) -> EventCallback:
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+        return callback
+
+    def unsubscribe(self, callback: EventCallback) -> None:
+        with self._lock:
+            self._subscribers = [cb for cb in self._subscribers if cb is not callback]
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    def emit(self, event: str, **data) -> None:
+        subscribers = self._subscribers  # copy-on-write list, safe to iterate without the lock
+        if not subscribers:
+            return
+        payload = {"event": event, "ts": time.time(), **data}
+        for callback in subscribers:
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.debug("Run event subscriber failed on %s: %s", event, e)
+
+    def progress(self, stage: str, done: int, total: int = None, **data) -> None:
+        if self._subscribers:
+            self.emit("progress", stage=stage, done=done, total=total, **data)
+
+    @contextmanager
+    def stage(self, name: str, **data):
+        """
+        Time a pipeline stage, emitting stage_start / stage_end (with duration and ok).
+        The duration is recorded in the ranking_stage_seconds metric whether or not anyone listens.
+        """
+        self.emit("stage_start", stage=name, **data)
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            duration = time.perf_counter() - start
+            STAGE_SECONDS.observe(duration, stage=name)
+            self.emit("stage_end", stage=name, duration=round(duration, 4), ok=ok)
+
+
+# Shared sink for callers that don't listen; never subscribe to it
+NULL_EVENTS = RunEvents()
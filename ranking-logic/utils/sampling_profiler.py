@@ -0,0 +1,183 @@
+"""
+Sampling Profiler - always-on statistical stack sampler exporting collapsed stacks for flame graphs
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from config.settings import Config
+
+logger = logging.getLogger('survey_analytics')
+
+MAX_DEPTH = 64
+TRUNCATED = "[truncated]"
+
+# Leaf frames of threads parked waiting for work - they are idle, not hot
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),          # ThreadPoolExecutor worker waiting for a task
+    ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"),
+    ("handlers.py", "dequeue"),        # logging QueueListener waiting for records
+    ("event_stream.py", "__iter__"),   # SSE stream waiting for the next run event
+}
+
+# thread ident -> what it is doing ("route:/api/preview-ranking", "job:process_ranking")
+_thread_tags: Dict[int, str] = {}
+
+
+def tag_current_thread(label: str) -> None:
+    _thread_tags[threading.get_ident()] = label
+
+
+def clear_current_thread_tag() -> None:
+    _thread_tags.pop(threading.get_ident(), None)
+
+
+@contextmanager
+def thread_tag(label: str):
+    """Label the current thread's samples (the flame graph's root frame) while the block runs"""
+    previous = _thread_tags.get(threading.get_ident())
+    tag_current_thread(label)
+    try:
+        yield
+    finally:
+        if previous is None:
+            clear_current_thread_tag()
+        else:
+            tag_current_thread(previous)
+
+
+def _thread_label(name: str) -> str:
+    """'final-api_3' -> 'thread:final-api', 'Thread-7 (process_request_thread)' -> 'thread:process_request_thread'"""
+    match = re.search(r"\((\w+)\)$", name)
+    if match:
+        return f"thread:{match.group(1)}"
+    return "thread:" + (re.sub(r"[-_]?\d+$", "", name) or name)
+
+
+class SamplingProfiler:
+    """
+    Background thread that wakes up `hz` times per second, grabs the stack of every other
+    thread (sys._current_frames) and counts each distinct stack in collapsed form
+    ("root;file:func;file:func <count>"), the input format of flamegraph.pl and speedscope.
+
+    Threads parked in a known wait (idle pool workers, the server's accept loop) are skipped,
+    so the profile shows busy request and job threads. Each sample's cost is measured and the
+    sleep is stretched when needed to keep the sampler under `max_overhead` of one core.
+    """
+
+    def __init__(self, hz: Optional[float] = None, max_overhead: Optional[float] = None,
+                 max_stacks: Optional[int] = None):
+        self.interval = 1.0 / (hz or Config.SAMPLER_HZ)
+        self.max_overhead = max_overhead or Config.SAMPLER_MAX_OVERHEAD
+        self.max_stacks = max_stacks or Config.SAMPLER_MAX_STACKS
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._since = time.time()
+        self._samples = 0
+        self._busy_time = 0.0
+        self._frame_labels: Dict[object, str] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"🩺 Sampling profiler running at {1 / self.interval:.0f} Hz "
+                    f"(max {self.max_overhead * 100:.1f}% overhead)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                self._sample(own)
+            except Exception as e:  # never let the sampler die on an odd frame
+                logger.debug("Stack sample failed: %s", e)
+            cost = time.perf_counter() - started
+            with self._lock:
+                self._busy_time += cost
+            self._stop.wait(max(self.interval, cost / self.max_overhead) - cost)
+
+    def _sample(self, own: int) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            frames = []
+            while frame is not None and len(frames) < MAX_DEPTH:
+                frames.append(self._label(frame.f_code))
+                frame = frame.f_back
+            root = _thread_tags.get(ident) or _thread_label(names.get(ident, str(ident)))
+            frames.append(root)
+            stacks.append(";".join(reversed(frames)))
+
+        with self._lock:
+            self._samples += 1
+            for stack in stacks:
+                if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                    self._stacks[stack] += 1
+                else:
+                    self._stacks[TRUNCATED] += 1
+
+    def _label(self, code) -> str:
+        label = self._frame_labels.get(code)
+        if label is None:
+            label = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+            if len(self._frame_labels) < 100000:
+                self._frame_labels[code] = label
+        return label
+
+    def snapshot(self, reset: bool = False) -> Tuple[Counter, Dict]:
+        """(collapsed stack counts, sampler stats); reset=True starts a new window"""
+        with self._lock:
+            stacks = Counter(self._stacks)
+            now = time.time()
+            window = now - self._since
+            stats = {
+                "running": self.running,
+                "hz": round(1 / self.interval, 2),
+                "window_seconds": round(window, 3),
+                "samples": self._samples,
+                "stacks": len(stacks),
+                "stack_samples": sum(stacks.values()),
+                "overhead": round(self._busy_time / window, 5) if window > 0 else 0.0,
+            }
+            if reset:
+                self._stacks.clear()
+                self._samples = 0
+                self._busy_time = 0.0
+                self._since = now
+        return stacks, stats
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """Brendan Gregg's collapsed format, hottest stack first"""
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())